@@ -2,7 +2,7 @@ from flask import Flask, jsonify
 from flask_cors import CORS
 from flask_socketio import SocketIO
 from flask_sock import Sock
-from config import config
+from config import config, INSECURE_SECRET_KEYS
 
 sock = Sock()
 
@@ -28,7 +28,17 @@ from widget import widget_bp
 from utils.logger import setup_logger
 from utils.errors import error_handler
 from utils.middleware import setup_request_logging
+from utils.token_cache import token_cache
+from models.routing import init_read_replicas
+from utils.sqlite_tuning import configure_sqlite_engine_options, install_sqlite_pragmas
+from utils.membership import membership_cache
+from utils.response_cache import widget_cache
+from utils.websocket_manager import ws_manager
+from utils.ws_backplane import create_backplane
+from utils.message_frame import frame_json
+from utils.message_writer import message_writer
 import os
+import secrets
 
 # Flask-Migrate
 try:
@@ -57,9 +67,43 @@ def create_app(config_name=None):
     # 初始化日志系统（需要在其他初始化之前）
     app_logger, access_logger = setup_logger(app)
     
+    secret_key = app.config.get('SECRET_KEY')
+    if not secret_key or secret_key in INSECURE_SECRET_KEYS:
+        if app.config.get('REQUIRE_SECRET_KEY'):
+            # 签名token用该密钥防伪造：公开的示例值或每个进程各自生成的随机值都不可用
+            raise RuntimeError('SECRET_KEY 未设置或为示例值，请通过环境变量 SECRET_KEY 设置随机密钥后再启动')
+        app.config['SECRET_KEY'] = secrets.token_hex(32)
+        app.logger.warning('SECRET_KEY 未设置，已生成仅本进程有效的开发密钥（重启后已签发的token失效）')
+    
     # 初始化扩展
+    sqlite_tuned = configure_sqlite_engine_options(app)
+    read_replicas = init_read_replicas(app)
     db.init_app(app)
+    if read_replicas:
+        app.logger.info(f"只读副本已启用: {len(app.config['SQLALCHEMY_READ_BINDS'])} 个")
+    if sqlite_tuned:
+        with app.app_context():
+            install_sqlite_pragmas(db.engine, app.config)
+        app.logger.info('SQLite调优已启用（WAL）')
     bcrypt.init_app(app)
+    token_cache.configure(
+        max_size=app.config.get('TOKEN_CACHE_SIZE'),
+        ttl=app.config.get('TOKEN_CACHE_TTL')
+    )
+    membership_cache.configure(
+        max_size=app.config.get('MEMBERSHIP_CACHE_SIZE'),
+        ttl=app.config.get('MEMBERSHIP_CACHE_TTL')
+    )
+    widget_cache.configure(
+        max_size=app.config.get('WIDGET_CACHE_SIZE'),
+        ttl=app.config.get('WIDGET_CACHE_TTL')
+    )
+    ws_manager.configure(
+        queue_size=app.config.get('WS_SEND_QUEUE_SIZE'),
+        overflow_policy=app.config.get('WS_OVERFLOW_POLICY'),
+        backplane=create_backplane(app.config)
+    )
+    message_writer.configure(app)
     
     # 初始化Flask-Migrate
     global migrate
@@ -96,7 +140,7 @@ def create_app(config_name=None):
             app.logger.info('API限流已禁用')
     
     sock.init_app(app)
-    socketio.init_app(app, cors_allowed_origins="*")
+    socketio.init_app(app, cors_allowed_origins="*", json=frame_json)
     CORS(app)  # 允许跨域请求
     
     # 设置请求日志中间件
@@ -166,6 +210,9 @@ def create_app(config_name=None):
             'message': '服务运行正常',
             'status': health_status,
             'database': db_status,
+            'websocket': ws_manager.stats(),
+            'chat_writer': message_writer.stats(),
+            'widget_cache': widget_cache.stats(),
             'version': '2.0.0'
         }), 200 if health_status == 'healthy' else 503
     
@@ -187,6 +234,9 @@ def create_app(config_name=None):
                     db.session.execute(text('ALTER TABLE group_messages ADD COLUMN task_id TEXT'))
                 if 'updated_time' not in names:
                     db.session.execute(text('ALTER TABLE group_messages ADD COLUMN updated_time INTEGER'))
+                db.session.execute(text('DROP INDEX IF EXISTS idx_group_messages_room_sent'))
+                db.session.execute(text('CREATE INDEX IF NOT EXISTS idx_group_messages_room_latest ON group_messages(group_id, is_deleted, sent_at, id)'))
+                db.session.execute(text('CREATE INDEX IF NOT EXISTS idx_group_messages_room_cursor ON group_messages(group_id, sent_at, id)'))
                 db.session.commit()
                 app.logger.info('group_messages 表结构已校正')
 
@@ -197,6 +247,8 @@ def create_app(config_name=None):
                     db.session.execute(text('ALTER TABLE users ADD COLUMN avatar_url TEXT'))
                 if 'avatar_file_id' not in user_cols:
                     db.session.execute(text('ALTER TABLE users ADD COLUMN avatar_file_id TEXT'))
+                if 'token_version' not in user_cols:
+                    db.session.execute(text('ALTER TABLE users ADD COLUMN token_version INTEGER NOT NULL DEFAULT 0'))
                 db.session.commit()
                 app.logger.info('users 表头像列已校正')
 
@@ -209,9 +261,24 @@ def create_app(config_name=None):
                     db.session.execute(text('ALTER TABLE tasks ADD COLUMN end_date TEXT'))
                 if 'assigned_to' not in task_cols:
                     db.session.execute(text('ALTER TABLE tasks ADD COLUMN assigned_to TEXT'))
+                db.session.execute(text('CREATE INDEX IF NOT EXISTS idx_tasks_project_end ON tasks(project_id, is_deleted, end_date, status)'))
+                # 项目组概览计数索引
+                db.session.execute(text('CREATE INDEX IF NOT EXISTS idx_shared_files_group ON shared_files(group_id, is_deleted)'))
+                db.session.execute(text('CREATE INDEX IF NOT EXISTS idx_calendar_events_user_start ON calendar_events(user_id, is_deleted, start_time)'))
+                db.session.execute(text('CREATE INDEX IF NOT EXISTS idx_user_groups_group ON user_groups(group_id, user_id)'))
                 db.session.commit()
                 app.logger.info('tasks 表新增列已校正')
 
+                # 兼容旧版本数据库：确保 user_groups 表包含聊天已读位置列
+                member_rows = db.session.execute(text('PRAGMA table_info(user_groups)')).fetchall()
+                member_cols = {row[1] for row in member_rows}
+                if 'last_read_at' not in member_cols:
+                    db.session.execute(text('ALTER TABLE user_groups ADD COLUMN last_read_at TEXT'))
+                if 'last_read_message_id' not in member_cols:
+                    db.session.execute(text('ALTER TABLE user_groups ADD COLUMN last_read_message_id TEXT'))
+                db.session.commit()
+                app.logger.info('user_groups 已读位置列已校正')
+
                 # 兼容旧版本数据库：确保 oauth_accounts 唯一约束/索引
                 oauth_rows = db.session.execute(text('PRAGMA table_info(oauth_accounts)')).fetchall()
                 oauth_cols = {row[1] for row in oauth_rows}
@@ -1,7 +1,10 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app, g
 from models import db, User
+from models.routing import use_primary
 from sqlalchemy.exc import IntegrityError
 from functools import wraps
+from utils.token_cache import token_cache
+from utils.session_tokens import issue_session_token, verify_session_token, is_session_token
 
 auth_bp = Blueprint('auth', __name__, url_prefix='/auth')
 
@@ -113,7 +116,7 @@ def login():
             'success': True,
             'message': 'Login successful',
             'user': user.to_dict(),
-            'token': user.id  # 返回用户ID作为认证token
+            'token': issue_token(user)
         }), 200
         
     except Exception as e:
@@ -173,11 +176,109 @@ def status():
     return jsonify({
         'success': True,
         'message': 'Auth service running',
-        'service': 'ToDoList Auth Service'
+        'service': 'ToDoList Auth Service',
+        'token_cache': token_cache.stats()
     }), 200
 
-# 简单的Token认证装饰器：Authorization: Bearer <token>
-# token可为用户id、用户名或邮箱
+def issue_token(user):
+    """为用户签发签名token（HMAC，包含用户ID、token版本和过期时间）"""
+    return issue_session_token(
+        current_app.config['SECRET_KEY'],
+        user.id,
+        user.token_version or 0,
+        current_app.config.get('AUTH_TOKEN_TTL', 30 * 24 * 3600)
+    )
+
+def _token_matches(user, token):
+    """token 是否仍指向该用户（用户名/邮箱可能已被修改）"""
+    return token in (user.id, user.username, user.email)
+
+def resolve_token(token):
+    """
+    将 token 解析为用户，HTTP 接口和 WebSocket 握手共用
+
+    签名token在内存中完成校验（签名、过期时间），伪造或过期的token不会访问数据库；
+    token 中的用户ID和版本与缓存的用户状态一致时直接返回 AuthenticatedUser，不查询用户表；
+    缓存未命中或版本不一致时才从主库加载用户（只读副本可能尚未同步刚修改的 token_version 或刚注册的用户）。
+    旧版token（用户id/用户名/邮箱）仅在 AUTH_ACCEPT_LEGACY_TOKENS 开启时接受：
+    命中缓存时按主键加载用户；未命中时依次按 id、用户名、邮箱做索引查询，
+    避免三路 OR 条件导致 SQLite 无法使用索引。
+    """
+    if is_session_token(token):
+        claims = verify_session_token(current_app.config['SECRET_KEY'], token)
+        if claims is None:
+            return None
+        user_id, token_version = claims
+        state = token_cache.get_user_state(user_id)
+        if state is not None and state[0] == token_version:
+            return AuthenticatedUser(user_id, state[1])
+        with use_primary(db.session):
+            user = db.session.get(User, user_id)
+        if user is None:
+            return None
+        token_cache.set_user_state(user.id, user.token_version or 0, user.is_active)
+        if (user.token_version or 0) != token_version:
+            return None
+        return user
+    
+    if not current_app.config.get('AUTH_ACCEPT_LEGACY_TOKENS', True):
+        return None
+    
+    with use_primary(db.session):
+        user_id = token_cache.get(token)
+        if user_id:
+            user = db.session.get(User, user_id)
+            if user is not None and _token_matches(user, token):
+                return user
+            token_cache.invalidate_token(token)
+        
+        user = db.session.get(User, token)
+        if user is None:
+            user = User.query.filter(User.username == token).first()
+        if user is None:
+            user = User.query.filter(User.email == token).first()
+    if user is not None:
+        token_cache.set(token, user.id)
+    return user
+
+
+class AuthenticatedUser:
+    """
+    签名token校验通过、尚未从数据库加载的当前用户
+
+    id 与 is_active 来自 token 和用户状态缓存；接口访问其他属性（用户名、头像、修改密码等）时
+    才按主键从主库加载 User 并转发，只使用 current_user.id 的接口不会查询用户表。
+    """
+    __slots__ = ('id', 'is_active', '_user')
+
+    def __init__(self, user_id, is_active):
+        object.__setattr__(self, 'id', user_id)
+        object.__setattr__(self, 'is_active', is_active)
+        object.__setattr__(self, '_user', None)
+
+    def _load(self):
+        if self._user is None:
+            with use_primary(db.session):
+                user = db.session.get(User, self.id)
+            if user is None:
+                raise LookupError(f'User {self.id} no longer exists')
+            object.__setattr__(self, '_user', user)
+        return self._user
+
+    def __getattr__(self, name):
+        return getattr(self._load(), name)
+
+    def __setattr__(self, name, value):
+        setattr(self._load(), name, value)
+
+    def __eq__(self, other):
+        return getattr(other, 'id', None) == self.id
+
+    def __hash__(self):
+        return hash(self.id)
+
+# Token认证装饰器：Authorization: Bearer <token>
+# token为登录返回的签名token；迁移期间也接受用户id、用户名或邮箱
 def token_required(f):
     @wraps(f)
     def decorated(*args, **kwargs):
@@ -187,13 +288,13 @@ def token_required(f):
         token = auth_header.split('Bearer ', 1)[1].strip()
         if not token:
             return jsonify({'message': 'Token missing'}), 401
-        user = User.query.filter(
-            (User.id == token) | (User.username == token) | (User.email == token)
-        ).first()
+        user = resolve_token(token)
         if not user:
             return jsonify({'message': 'Invalid token'}), 401
         if not user.is_active:
             return jsonify({'message': 'Account disabled'}), 403
+        # 读己之写按用户记录（见 models/routing.py）
+        g.current_user_id = user.id
         return f(current_user=user, *args, **kwargs)
     return decorated
 
@@ -225,11 +326,15 @@ def change_password(current_user):
             }), 401
             
         current_user.set_password(new_password)
+        # 递增token版本，吊销此前签发的所有token
+        current_user.token_version = (current_user.token_version or 0) + 1
         db.session.commit()
+        token_cache.invalidate_user(current_user.id)
         
         return jsonify({
             'success': True,
-            'message': 'Password changed successfully'
+            'message': 'Password changed successfully',
+            'token': issue_token(current_user)
         }), 200
         
     except Exception as e:
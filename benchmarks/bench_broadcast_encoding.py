@@ -0,0 +1,60 @@
+"""
+广播消息编码（user-014）
+对比每个订阅者各自 json.dumps 与 MessageFrame 只编码一次，并测量 broadcast_to_room 向 N 个订阅者入队的耗时；
+同时确认 Socket.IO 数据包直接拼接帧的已编码文本。
+
+    python benchmarks/bench_broadcast_encoding.py [订阅者数]
+"""
+import contextlib
+import io
+import json
+import sys
+from common import best_of  # 导入时创建应用，Socket.IO 数据包改用 frame_json 编码
+from socketio import packet
+from utils.message_frame import MessageFrame
+from utils.websocket_manager import ConnectionManager
+
+MESSAGE = {
+    'type': 'new_message',
+    'payload': {
+        'id': 'm' * 16,
+        'room_id': 'r' * 16,
+        'sender_id': 's' * 16,
+        'sender_name': '张三',
+        'content': 'hello world ' * 20,
+        'message_type': 'TEXT',
+        'task': {'id': 't' * 16, 'title': '任务', 'assignees': ['a', 'b', 'c']}
+    }
+}
+
+
+class _NullWS:
+    def send(self, frame):
+        pass
+
+
+def main(subscribers):
+    frame = MessageFrame(MESSAGE)
+    encoded = packet.Packet(packet.EVENT, data=['new_message', frame]).encode()
+    assert json.loads(encoded[1:]) == ['new_message', MESSAGE]
+
+    per_subscriber = best_of(lambda: [json.dumps(MESSAGE) for _ in range(subscribers)], number=20)
+    once = best_of(lambda: MessageFrame(MESSAGE).text, number=20)
+    print(f'{subscribers} subscribers')
+    print(f'  encode per subscriber  {per_subscriber:8.3f} ms/broadcast')
+    print(f'  encode once            {once:8.3f} ms/broadcast')
+
+    manager = ConnectionManager(queue_size=100000)
+    with contextlib.redirect_stdout(io.StringIO()):
+        sockets = [_NullWS() for _ in range(subscribers)]
+        for i, ws in enumerate(sockets):
+            manager.connect(ws, f'user-{i}')
+            manager.subscribe(ws, 'room')
+        elapsed = best_of(lambda: manager.broadcast_to_room('room', MessageFrame(MESSAGE)), number=20)
+        for ws in sockets:
+            manager.disconnect(ws)
+    print(f'  broadcast_to_room      {elapsed:8.3f} ms/broadcast')
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 500)
@@ -0,0 +1,65 @@
+"""
+列表接口条件请求（user-025）
+对每个接口比较完整 200 响应与携带 If-None-Match 的 304 响应：耗时、响应字节数与 SQL 语句数；
+并确认其他用户重放同一 ETag 时不会得到 304。
+
+    python benchmarks/bench_conditional_get.py [任务数]
+"""
+import sys
+from common import app, best_of, client, count_queries, db, make_group, make_user
+from models import CalendarEvent, SharedFile, Task
+
+OLD = '2025-01-01 00:00:00'
+
+
+def seed(user_id, group_id, n):
+    """updated_at 早于当前秒，接口才会返回验证器"""
+    with app.app_context():
+        db.session.execute(Task.__table__.insert(), [{
+            'id': f'task{i:012d}', 'user_id': user_id, 'project_id': group_id, 'title': f'task {i}',
+            'description': 'd' * 50, 'status': 'pending', 'start_date': '2025-01-01', 'end_date': '2025-01-05',
+            'is_deleted': False, 'created_at': OLD, 'updated_at': OLD, 'position': i
+        } for i in range(n)])
+        db.session.execute(SharedFile.__table__.insert(), [{
+            'id': f'file{i:012d}', 'user_id': user_id, 'group_id': group_id, 'filename': 'x.txt',
+            'file_path': 'x', 'is_deleted': False, 'created_at': OLD, 'updated_at': OLD
+        } for i in range(n // 2)])
+        db.session.execute(CalendarEvent.__table__.insert(), [{
+            'id': f'event{i:011d}', 'user_id': user_id, 'title': 'event', 'start_time': '2025-01-01 10:00:00',
+            'end_time': '2025-01-01 11:00:00', 'is_deleted': False, 'created_at': OLD, 'updated_at': OLD
+        } for i in range(n // 2)])
+        db.session.execute(db.text('UPDATE users SET updated_at = :old'), {'old': OLD})
+        db.session.execute(db.text('UPDATE user_groups SET joined_at = :old'), {'old': OLD})
+        db.session.commit()
+
+
+def main(n):
+    user_id, headers = make_user('alice')
+    other_id, other_headers = make_user('bob')
+    group_id = make_group(user_id)
+    client.post('/groups/join', json={'user_id': other_id, 'group_id': group_id})
+    seed(user_id, group_id, n)
+
+    paths = ['/tasks', f'/tasks?projectId={group_id}', f'/tasks/tree/{group_id}', '/calendar/events',
+             f'/files/group/{group_id}', f'/groups/{group_id}/members']
+    print(f'{n} tasks, {n // 2} files, {n // 2} events')
+    print(f"  {'endpoint':34s} {'200 ms':>8s} {'bytes':>9s} {'SQL':>4s}   {'304 ms':>7s} {'bytes':>5s} {'SQL':>4s}")
+    for path in paths:
+        response = client.get(path, headers=headers)
+        etag = response.headers.get('ETag')
+        assert etag, path
+        conditional = dict(headers, **{'If-None-Match': etag})
+        with count_queries() as full_queries:
+            client.get(path, headers=headers)
+        with count_queries() as cached_queries:
+            not_modified = client.get(path, headers=conditional)
+        assert not_modified.status_code == 304, path
+        assert client.get(path, headers=dict(other_headers, **{'If-None-Match': etag})).status_code != 304, path
+        full_ms = best_of(lambda: client.get(path, headers=headers), repeat=3)
+        cached_ms = best_of(lambda: client.get(path, headers=conditional), repeat=3)
+        print(f'  {path[:34]:34s} {full_ms:8.2f} {len(response.data):9d} {len(full_queries):4d}   '
+              f'{cached_ms:7.2f} {len(not_modified.data):5d} {len(cached_queries):4d}')
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
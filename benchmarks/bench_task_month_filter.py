@@ -0,0 +1,107 @@
+"""
+GET /tasks?month= 月视图筛选（user-004）
+对比最初的实现（加载范围内全部任务后用 in_month 在 Python 中筛选）与 SQL 筛选的 ORM 查询耗时，
+以及 coalesce(start_date, end_date) 谓词与当前按原始列拆分的 OR 谓词的查询计划与耗时，
+并确认各方案结果一致。
+
+    python benchmarks/bench_task_month_filter.py [任务数]
+"""
+import random
+import sys
+from datetime import date, timedelta
+from common import app, best_of, client, db, explain, make_group, make_user
+from models import Task
+
+OLD_PREDICATE = ('coalesce(start_date, end_date) < :month_end '
+                 'AND coalesce(end_date, start_date) >= :month_start')
+NEW_PREDICATE = ('(start_date < :month_end AND coalesce(end_date, start_date) >= :month_start) '
+                 'OR (start_date IS NULL AND end_date >= :month_start AND end_date < :month_end)')
+
+
+def seed(user_id, group_id, n, users=200):
+    """n 个任务分布在 users 个用户上（第一个为 user_id），日期区间分布在 2020-2030 年，跨度 0-30 天"""
+    rng = random.Random(4)
+    owners = [user_id] + [f'benchuser{i:07d}' for i in range(users - 1)]
+    rows = []
+    for i in range(n):
+        start = date(2020, 1, 1) + timedelta(days=rng.randrange(3650))
+        end = start + timedelta(days=rng.randrange(31))
+        start_date, end_date = start.isoformat(), end.isoformat()
+        if i % 10 == 0:
+            start_date = None
+        elif i % 10 == 1:
+            end_date = None
+        rows.append({
+            'id': f'bench{i:011d}',
+            'user_id': owners[i % users],
+            'project_id': group_id if i % users == 0 else None,
+            'title': f'task {i}',
+            'start_date': start_date,
+            'end_date': end_date,
+            'due_date': end_date,
+            'is_deleted': False
+        })
+    with app.app_context():
+        db.session.execute(Task.__table__.insert(), rows)
+        db.session.commit()
+        db.session.execute(db.text('ANALYZE'))
+        db.session.commit()
+
+
+def in_month(t, start_str, end_str):
+    """最初实现中的 Python 端判定"""
+    sd = t.start_date or t.end_date
+    ed = t.end_date or t.start_date
+    if not sd and not ed:
+        return False
+    sd = sd or ed
+    ed = ed or sd
+    return not (ed < start_str or sd >= end_str)
+
+
+def load_all_then_filter(user_id, start_str, end_str):
+    tasks = Task.query.filter_by(user_id=user_id, is_deleted=False).order_by(Task.created_at.desc()).all()
+    return [t for t in tasks if in_month(t, start_str, end_str)]
+
+
+def filter_in_sql(user_id, start_str, end_str):
+    return Task.query.filter_by(user_id=user_id, is_deleted=False).filter(
+        db.text(f'({NEW_PREDICATE})').bindparams(month_start=start_str, month_end=end_str)
+    ).order_by(Task.created_at.desc()).all()
+
+
+def main(n):
+    user_id, headers = make_user('alice')
+    group_id = make_group(user_id)
+    seed(user_id, group_id, n)
+    params = {'scope': user_id, 'month_start': '2025-02-01', 'month_end': '2025-03-01'}
+    print(f'{n} tasks over 200 users, month=2025-02, scope=user_id')
+
+    with app.app_context():
+        scanned = Task.query.filter_by(user_id=user_id, is_deleted=False).count()
+        print(f'  ORM, {scanned} tasks in scope')
+        loaded = {}
+        for name, func in (('load all + in_month', load_all_then_filter), ('SQL filter', filter_in_sql)):
+            loaded[name] = {t.id for t in func(user_id, '2025-02-01', '2025-03-01')}
+            elapsed = best_of(lambda: func(user_id, '2025-02-01', '2025-03-01'), number=5)
+            db.session.expire_all()
+            print(f'  {name:20s} {elapsed:8.3f} ms  {len(loaded[name])} rows')
+        assert loaded['load all + in_month'] == loaded['SQL filter']
+
+        print('  SQL predicates')
+        results = {}
+        for name, predicate in (('coalesce', OLD_PREDICATE), ('raw columns', NEW_PREDICATE)):
+            sql = f'SELECT id FROM tasks WHERE user_id = :scope AND is_deleted = 0 AND ({predicate})'
+            results[name] = {row[0] for row in db.session.execute(db.text(sql), params)}
+            elapsed = best_of(lambda: db.session.execute(db.text(sql), params).fetchall(), number=10)
+            print(f'  {name:20s} {elapsed:8.3f} ms  {len(results[name])} rows')
+            for step in explain(sql, params):
+                print(f'      {step}')
+        assert results['coalesce'] == results['raw columns'] == loaded['SQL filter']
+
+    elapsed = best_of(lambda: client.get('/tasks?month=2025-02', headers=headers), number=3)
+    print(f'  GET /tasks?month=2025-02: {elapsed:.2f} ms')
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200000)
@@ -0,0 +1,107 @@
+"""
+任务树构建（user-005）
+在写入数据库的真实任务集（默认 1 万、5 万个任务，每种规模一个项目组）上测量 build_task_tree 的单次分桶遍历
+与 GET /tasks/tree/<group_id> 的耗时；原先的递归构建（每个节点扫描一遍全部任务，O(n²)）只在不超过
+RECURSIVE_LIMIT 个任务时对比并校验结果一致。最后用 5 万层的任务链确认不会触发递归深度限制。
+
+    python benchmarks/bench_task_tree.py [任务数 ...]
+"""
+import random
+import sys
+from common import app, best_of, client, db, make_group, make_user
+from models import Task
+from tasks import build_task_tree
+
+RECURSIVE_LIMIT = 10000
+
+
+def recursive_build(tasks, parent_id=None):
+    """原先的实现：对每个父节点遍历全部任务"""
+    tree = []
+    for task in tasks:
+        if task.parent_task_id == parent_id and not task.is_deleted:
+            node = task.to_dict()
+            children = recursive_build(tasks, task.id)
+            if children:
+                node['children'] = children
+            tree.append(node)
+    return tree
+
+
+class _ChainTask:
+    __slots__ = ('id', 'parent_task_id', 'is_deleted')
+
+    def __init__(self, task_id, parent_id):
+        self.id = task_id
+        self.parent_task_id = parent_id
+        self.is_deleted = False
+
+
+def seed(user_id, group_id, n):
+    """随机森林：80% 的任务挂在已有任务下"""
+    rng = random.Random(5)
+    ids = []
+    rows = []
+    for i in range(n):
+        task_id = f'{n:x}-{i:010d}'
+        rows.append({
+            'id': task_id,
+            'user_id': user_id,
+            'project_id': group_id,
+            'parent_task_id': rng.choice(ids) if ids and rng.random() < 0.8 else None,
+            'title': f'task {i}',
+            'position': rng.randint(0, 3),
+            'is_deleted': False
+        })
+        ids.append(task_id)
+    with app.app_context():
+        db.session.execute(Task.__table__.insert(), rows)
+        db.session.commit()
+
+
+def _walk(nodes):
+    stack = list(nodes)
+    while stack:
+        node = stack.pop()
+        yield node
+        stack.extend(node.get('children', ()))
+
+
+def run(user_id, headers, n):
+    group_id = make_group(user_id, name=f'tree{n}')
+    seed(user_id, group_id, n)
+
+    with app.app_context():
+        tasks = Task.query.filter(Task.project_id == group_id, Task.is_deleted == False)\
+            .order_by(Task.position, Task.created_at).all()
+        tree, orphans = build_task_tree(tasks)
+        assert not orphans and sum(1 for _ in _walk(tree)) == n
+        print(f'{n} tasks')
+        if n <= RECURSIVE_LIMIT:
+            assert tree == recursive_build(tasks)
+            print(f'  recursive build    {best_of(lambda: recursive_build(tasks), repeat=1):9.2f} ms')
+        print(f'  build_task_tree    {best_of(lambda: build_task_tree(tasks), repeat=3):9.2f} ms')
+    response = client.get(f'/tasks/tree/{group_id}', headers=headers)
+    assert response.status_code == 200 and len(response.data) > n
+    elapsed = best_of(lambda: client.get(f'/tasks/tree/{group_id}', headers=headers), repeat=3)
+    print(f'  GET /tasks/tree    {elapsed:9.2f} ms  {len(response.data)} bytes')
+
+
+def main(sizes):
+    user_id, headers = make_user('alice')
+    for n in sizes:
+        run(user_id, headers, n)
+
+    # 只测树结构本身：节点序列化换成最小的 dict
+    chain = [_ChainTask(str(i), str(i - 1) if i else None) for i in range(50000)]
+    to_dicts = Task.to_dicts
+    Task.to_dicts = classmethod(lambda cls, items: [{'id': t.id} for t in items])
+    try:
+        elapsed = best_of(lambda: build_task_tree(chain), repeat=1)
+    finally:
+        Task.to_dicts = to_dicts
+    print(f'  50000-level chain  {elapsed:9.2f} ms (no recursion limit)')
+
+
+if __name__ == '__main__':
+    main([int(arg) for arg in sys.argv[1:]] or [10000, 50000])
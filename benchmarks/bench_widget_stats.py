@@ -0,0 +1,95 @@
+"""
+Widget 任务统计（user-020）
+对比原先加载用户全部任务后在 Python 中计数，与 GET /widget/task-stats 的 SQL 聚合（task_counters 计数行缺失时
+回退为 GROUP BY，存在时读取一行；过期任务按 end_date 走 idx_tasks_user_end）：在每种任务数下分别测量耗时与峰值内存，
+并确认统计结果一致。响应缓存在测量期间关闭。
+
+    python benchmarks/bench_widget_stats.py [任务数 ...]
+"""
+import random
+import sys
+import tracemalloc
+from datetime import datetime, timedelta
+from common import app, best_of, client, db, make_user
+from models import Task
+from utils.response_cache import widget_cache
+from utils.task_counters import reconcile_counters
+
+STATUSES = ['pending', 'in_progress', 'completed', 'cancelled']
+
+
+def seed(user_id, n):
+    rng = random.Random(20)
+    today = datetime.utcnow().date()
+    with app.app_context():
+        db.session.execute(Task.__table__.insert(), [{
+            'id': f'{n:x}-{i:010d}',
+            'user_id': user_id,
+            'title': f'task {i}',
+            'description': 'd' * 200,
+            'status': rng.choice(STATUSES),
+            'end_date': rng.choice([None, (today + timedelta(days=rng.randint(-60, 60))).isoformat()]),
+            'is_deleted': rng.random() < 0.1
+        } for i in range(n)])
+        db.session.commit()
+
+
+def load_and_count(user_id):
+    """原先的实现：加载全部任务后逐个判断"""
+    with app.app_context():
+        tasks = Task.query.filter(Task.user_id == user_id, Task.is_deleted == False).all()
+        today = datetime.utcnow().date()
+        overdue = 0
+        for task in tasks:
+            if task.end_date and task.status not in ['completed', 'cancelled']:
+                try:
+                    if datetime.strptime(task.end_date, '%Y-%m-%d').date() < today:
+                        overdue += 1
+                except (ValueError, TypeError):
+                    pass
+        return {
+            'total_tasks': len(tasks),
+            'todo_tasks': sum(t.status == 'pending' for t in tasks),
+            'in_progress_tasks': sum(t.status == 'in_progress' for t in tasks),
+            'completed_tasks': sum(t.status == 'completed' for t in tasks),
+            'overdue_tasks': overdue
+        }
+
+
+def peak_kib(func):
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1] / 1024
+    finally:
+        tracemalloc.stop()
+
+
+def run(n):
+    """每种任务数使用单独的用户，统计只涉及该用户的任务"""
+    user_id, headers = make_user(f'user{n}')
+    seed(user_id, n)
+
+    def endpoint():
+        return client.get('/widget/task-stats', headers=headers).get_json()['stats']
+
+    print(f'{n} tasks')
+    expected = load_and_count(user_id)
+    print(f"  load all tasks        {best_of(lambda: load_and_count(user_id), repeat=3):9.2f} ms  "
+          f"peak {peak_kib(lambda: load_and_count(user_id)):8.0f} KiB")
+    assert endpoint() == expected
+    print(f"  GROUP BY (no counter) {best_of(endpoint, repeat=3):9.2f} ms  peak {peak_kib(endpoint):8.0f} KiB")
+    with app.app_context():
+        reconcile_counters()
+    assert endpoint() == expected
+    print(f"  task_counters row     {best_of(endpoint, repeat=3):9.2f} ms  peak {peak_kib(endpoint):8.0f} KiB")
+
+
+def main(sizes):
+    widget_cache.configure(ttl=0)
+    for n in sizes:
+        run(n)
+
+
+if __name__ == '__main__':
+    main([int(arg) for arg in sys.argv[1:]] or [20000, 100000])
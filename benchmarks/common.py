@@ -0,0 +1,70 @@
+"""
+基准脚本公共部分
+在仓库根目录执行 `python benchmarks/<脚本>.py`。应用使用 TestingConfig（内存 SQLite），
+不依赖正在运行的服务器，也不会写入 todolist.db。
+"""
+import os
+import sys
+import time
+from contextlib import contextmanager
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import event  # noqa: E402
+from app import create_app  # noqa: E402
+from models import db  # noqa: E402
+
+app = create_app('testing')
+client = app.test_client()
+
+
+def make_user(username):
+    """注册并登录用户，返回 (用户ID, 认证头)"""
+    client.post('/auth/register', json={'username': username, 'password': 'password', 'email': f'{username}@example.com'})
+    data = client.post('/auth/login', json={'username': username, 'password': 'password'}).get_json()
+    return data['user']['id'], {'Authorization': f"Bearer {data['token']}"}
+
+
+def make_group(leader_id, name='group'):
+    """创建项目组，返回项目组ID"""
+    response = client.post('/groups/create', json={
+        'leader_id': leader_id,
+        'name': name,
+        'project_title': 'Project',
+        'due_date': '2030-01-01'
+    })
+    return response.get_json()['group']['id']
+
+
+@contextmanager
+def count_queries():
+    """统计 with 块内执行的 SQL 语句，产出语句列表"""
+    with app.app_context():
+        engine = db.engine
+    statements = []
+
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(engine, 'before_cursor_execute', record)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, 'before_cursor_execute', record)
+
+
+def best_of(func, repeat=5, number=1):
+    """func 执行 number 次的最短耗时（毫秒），取 repeat 轮中的最小值"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        timings.append((time.perf_counter() - start) * 1000 / number)
+    return min(timings)
+
+
+def explain(sql, params=None):
+    """EXPLAIN QUERY PLAN 的 detail 列"""
+    with app.app_context():
+        return [row[3] for row in db.session.execute(db.text('EXPLAIN QUERY PLAN ' + sql), params or {})]
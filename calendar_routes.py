@@ -1,13 +1,24 @@
 from flask import Blueprint, request, jsonify
-from models import db, User, Task, CalendarEvent
+from models import db, User, Task, CalendarEvent, user_groups
 from auth import token_required
+from utils.membership import is_project_member
+from utils.response_cache import widget_cache
+from utils.conditional_get import conditional_get, collection_version
 from sqlalchemy.exc import IntegrityError
 from datetime import datetime
 
 calendar_bp = Blueprint('calendar', __name__, url_prefix='/calendar')
 
+def _event_list_version(current_user):
+    """日程列表的版本：用户未删除日程的数量与最大 updated_at（日期范围只筛选子集）"""
+    return collection_version(
+        CalendarEvent.query.filter(CalendarEvent.user_id == current_user.id, CalendarEvent.is_deleted == False),
+        CalendarEvent.updated_at
+    )
+
 @calendar_bp.route('/events', methods=['GET'])
 @token_required
+@conditional_get(_event_list_version)
 def get_events(current_user):
     """获取用户的日历事件列表接口"""
     try:
@@ -117,6 +128,7 @@ def create_event(current_user):
         
         db.session.add(new_event)
         db.session.commit()
+        widget_cache.invalidate(user_ids=[current_user.id])
         
         return jsonify({
             'success': True,
@@ -248,6 +260,7 @@ def update_event(current_user, event_id):
         
         event.updated_at = datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
         db.session.commit()
+        widget_cache.invalidate(user_ids=[event.user_id])
         
         return jsonify({
             'success': True,
@@ -291,6 +304,7 @@ def delete_event(current_user, event_id):
         event.is_deleted = True
         event.updated_at = datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
         db.session.commit()
+        widget_cache.invalidate(user_ids=[event.user_id])
         
         return jsonify({
             'success': True,
@@ -375,6 +389,7 @@ def create_event_from_task(current_user, task_id):
         
         db.session.add(new_event)
         db.session.commit()
+        widget_cache.invalidate(user_ids=[current_user.id])
         
         return jsonify({
             'success': True,
@@ -409,7 +424,7 @@ def calendar_feed(current_user):
         project = ProjectGroup.query.filter_by(id=project_id).first()
         if not project:
             return jsonify({'success': False, 'message': 'Project not found'}), 404
-        if current_user not in project.members and project.leader_id != current_user.id:
+        if project.leader_id != current_user.id and not is_project_member(current_user.id, project.id):
             return jsonify({'success': False, 'message': 'Permission denied'}), 403
 
         # 该月范围
@@ -422,10 +437,10 @@ def calendar_feed(current_user):
         except ValueError:
             return jsonify({'success': False, 'message': 'Invalid month format'}), 400
 
-        # 获取项目内成员的事件
-        member_ids = [m.id for m in project.members] + [project.leader_id]
+        # 获取项目内成员（含负责人）的事件，成员通过 user_groups 子查询确定，不加载成员对象
+        member_ids = db.select(user_groups.c.user_id).where(user_groups.c.group_id == project.id)
         events = CalendarEvent.query.filter(
-            CalendarEvent.user_id.in_(member_ids),
+            db.or_(CalendarEvent.user_id == project.leader_id, CalendarEvent.user_id.in_(member_ids)),
             CalendarEvent.is_deleted == False,
             CalendarEvent.start_time >= start.strftime('%Y-%m-%d %H:%M:%S'),
             CalendarEvent.start_time < end.strftime('%Y-%m-%d %H:%M:%S')
@@ -1,6 +1,13 @@
 from flask import Blueprint, request, jsonify
-from models import db, User, ProjectGroup, GroupMessage, Task, SharedFile
+from models import db, ProjectGroup, GroupMessage, Task, SharedFile, user_groups
 from auth import token_required
+from utils.membership import is_project_member
+from utils.serializers import serialize_message, serialize_messages
+from utils.message_frame import MessageFrame
+from sqlalchemy import select, func, tuple_
+from sqlalchemy.orm import aliased
+from datetime import datetime
+import base64
 
 chat_bp = Blueprint('chat', __name__)
 
@@ -9,39 +16,102 @@ chat_bp = Blueprint('chat', __name__)
 @token_required
 def get_chat_rooms(current_user):
     """获取当前用户的聊天室列表"""
-    # 获取用户所在的所有项目组
-    groups = current_user.project_groups
+    # 一次查询获取用户所在全部项目组的最新消息和未读数：
+    # 最新消息按 (sent_at, id) 倒序取第一条（与分页游标、已读位置的排序一致，同一秒内的消息以 id 决定先后），
+    # 通过 idx_group_messages_room_latest (group_id, is_deleted, sent_at, id) 索引按组定位；
+    # 未读数为已读位置（user_groups.last_read_at/last_read_message_id，未标记过时为加入时间）之后
+    # 他人发送的消息数，沿同一索引只扫描 (sent_at, id) 大于已读位置的消息
+    last_message = aliased(GroupMessage)
+    last_message_id = select(GroupMessage.id).where(
+        GroupMessage.group_id == ProjectGroup.id,
+        GroupMessage.is_deleted == False
+    ).order_by(GroupMessage.sent_at.desc(), GroupMessage.id.desc()).limit(1).correlate(ProjectGroup).scalar_subquery()
 
-    chat_rooms = []
-    for group in groups:
-        # 获取最新的消息
-        last_message = GroupMessage.query.filter_by(group_id=group.id).order_by(GroupMessage.sent_at.desc()).first()
+    unread_message = aliased(GroupMessage)
+    read_position = tuple_(
+        func.coalesce(user_groups.c.last_read_at, user_groups.c.joined_at, ''),
+        func.coalesce(user_groups.c.last_read_message_id, '')
+    )
+    unread_count = select(func.count(unread_message.id)).where(
+        unread_message.group_id == ProjectGroup.id,
+        tuple_(unread_message.sent_at, unread_message.id) > read_position,
+        unread_message.is_deleted == False,
+        unread_message.sender_id != current_user.id
+    ).correlate(ProjectGroup, user_groups).scalar_subquery()
 
-        # 获取未读消息数 (需要 MessageReadStatus 模型支持)
-        # 此处为简化实现，未读消息数暂时为0
-        unread_count = 0
+    rows = db.session.query(
+        ProjectGroup.id,
+        ProjectGroup.name,
+        last_message.content,
+        last_message.sent_at,
+        unread_count
+    ).join(
+        user_groups, user_groups.c.group_id == ProjectGroup.id
+    ).outerjoin(
+        last_message, last_message.id == last_message_id
+    ).filter(user_groups.c.user_id == current_user.id).all()
 
+    chat_rooms = []
+    for group_id, name, content, sent_at, unread in rows:
         chat_rooms.append({
-            'id': group.id,
-            'name': group.name,
-            'lastMessage': last_message.content if last_message else None,
-            'lastMessageTimestamp': last_message.sent_at if last_message else None,
-            'unreadCount': unread_count
+            'id': group_id,
+            'name': name,
+            'lastMessage': content,
+            'lastMessageTimestamp': sent_at,
+            'unreadCount': unread or 0
         })
 
     return jsonify(chat_rooms)
 
 
+@chat_bp.route('/rooms/<room_id>/read', methods=['POST'])
+@token_required
+def mark_room_read(current_user, room_id):
+    """将聊天室标记为已读（到指定消息或最新消息为止），已读位置只前进不后退"""
+    data = request.get_json(silent=True) or {}
+    message_id = data.get('messageId', data.get('message_id'))
+
+    query = db.session.query(GroupMessage.sent_at, GroupMessage.id).filter(GroupMessage.group_id == room_id)
+    if message_id:
+        position = query.filter(GroupMessage.id == message_id).first()
+        if position is None:
+            return jsonify({'success': False, 'message': 'Message not found'}), 404
+    else:
+        position = query.order_by(GroupMessage.sent_at.desc(), GroupMessage.id.desc()).first()
+
+    membership = (user_groups.c.user_id == current_user.id) & (user_groups.c.group_id == room_id)
+    if position is not None:
+        read_position = tuple_(
+            func.coalesce(user_groups.c.last_read_at, ''),
+            func.coalesce(user_groups.c.last_read_message_id, '')
+        )
+        db.session.execute(user_groups.update().where(
+            membership,
+            read_position < tuple_(position.sent_at, position.id)
+        ).values(last_read_at=position.sent_at, last_read_message_id=position.id))
+
+    row = db.session.execute(select(user_groups.c.last_read_message_id).where(membership)).first()
+    if row is None:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': 'Chat room not found or access denied'}), 404
+    db.session.commit()
+    return jsonify({'success': True, 'lastReadMessageId': row.last_read_message_id})
+
+
 @chat_bp.route('/rooms/<room_id>/messages', methods=['GET'])
 @token_required
 def get_messages(current_user, room_id):
     """分页获取指定聊天室的历史消息"""
     # 验证用户是否是该项目组成员
     group = ProjectGroup.query.filter_by(id=room_id).first()
-    if not group or current_user not in group.members:
+    if not group or not is_project_member(current_user.id, group.id):
         return jsonify({'message': 'Chat room not found or access denied'}), 404
 
-    # 分页参数
+    # 游标模式：?before=<cursor>（或 ?before_id=<消息ID>）&limit=，按 (sent_at, id) 索引定位，不统计总数
+    if any(name in request.args for name in ('before', 'before_id', 'limit')):
+        return _get_messages_by_cursor(room_id)
+
+    # 分页参数（偏移模式，保留兼容）
     page = request.args.get('page', 1, type=int)
     per_page = request.args.get('per_page', 20, type=int)
 
@@ -52,65 +122,101 @@ def get_messages(current_user, room_id):
     ).order_by(GroupMessage.sent_at.desc())\
         .paginate(page=page, per_page=per_page, error_out=False)
 
-    response = []
-    for msg in messages.items:
-        sender = User.query.get(msg.sender_id)
-        # 统一返回字段为下划线风格，类型为大写
-        updated_str = None
-        try:
-            # updated_time 可能为Unix时间戳，序列化为字符串时间
-            if getattr(msg, 'updated_time', None) is not None:
-                from datetime import datetime
-                if isinstance(msg.updated_time, (int, float)):
-                    updated_str = datetime.utcfromtimestamp(int(msg.updated_time)).strftime('%Y-%m-%d %H:%M:%S')
-                else:
-                    updated_str = str(msg.updated_time)
-        except Exception:
-            updated_str = None
-
-        message_dict = {
-            'id': msg.id,
-            'room_id': msg.group_id,
-            'sender_id': msg.sender_id,
-            'sender_name': sender.username if sender else 'Unknown',
-            'content': msg.content,
-            'message_type': (msg.message_type or 'text').upper(),
-            'file_url': msg.file_url,
-            'task_id': msg.task_id,
-            'created_at': msg.sent_at,
-            'updated_time': updated_str
-        }
-
-        # 为非文本类型提供 caption 字段，便于客户端统一展示附加文字
-        try:
-            if (msg.message_type or 'text') in ['image', 'video', 'audio', 'file', 'task'] and (msg.content or '').strip():
-                message_dict['caption'] = msg.content
-        except Exception:
-            pass
-        
-        # 添加回复消息ID（如果存在）
-        if msg.reply_to_id:
-            message_dict['reply_to_id'] = msg.reply_to_id
-        
-        # 添加文件URL（如果是文件类型消息）
-        # file_url 已在主字段返回
-        
-        # 添加任务信息（如果是任务类型消息）
-        if msg.task_id:
-            task = Task.query.filter_by(id=msg.task_id, is_deleted=False).first()
-            if task:
-                message_dict['task'] = task.to_dict()
-        
-        response.append(message_dict)
-
     return jsonify({
-        'messages': response,
+        'messages': serialize_messages(messages.items),
         'page': messages.page,
         'pages': messages.pages,
         'total': messages.total
     })
 
 
+MAX_CURSOR_PAGE_SIZE = 100
+
+
+def _encode_cursor(message):
+    """生成不透明游标：base64url(sent_at|id)"""
+    raw = f'{message.sent_at}|{message.id}'.encode('utf-8')
+    return base64.urlsafe_b64encode(raw).rstrip(b'=').decode('ascii')
+
+
+def _decode_cursor(value):
+    """解析 _encode_cursor 生成的游标，返回 (sent_at, id)；格式无效时返回 None"""
+    try:
+        raw = base64.urlsafe_b64decode(value + '=' * (-len(value) % 4)).decode('utf-8')
+        sent_at, message_id = raw.split('|', 1)
+        datetime.strptime(sent_at, '%Y-%m-%d %H:%M:%S')
+    except (ValueError, UnicodeDecodeError):
+        return None
+    return (sent_at, message_id) if message_id else None
+
+
+def _get_messages_by_cursor(room_id):
+    """游标分页获取历史消息（按 sent_at, id 倒序）"""
+    limit = request.args.get('limit', 20, type=int)
+    limit = max(1, min(limit, MAX_CURSOR_PAGE_SIZE))
+
+    query = GroupMessage.query.filter(
+        GroupMessage.group_id == room_id,
+        GroupMessage.is_deleted == False
+    )
+    before = request.args.get('before')
+    before_id = request.args.get('before_id')
+    if before and before_id:
+        return jsonify({'message': 'Use either before or before_id, not both'}), 400
+    position = None
+    if before:
+        position = _decode_cursor(before)
+        if position is None:
+            return jsonify({'message': 'Invalid cursor'}), 400
+    elif before_id:
+        position = db.session.query(GroupMessage.sent_at, GroupMessage.id).filter(
+            GroupMessage.id == before_id,
+            GroupMessage.group_id == room_id
+        ).first()
+        if position is None:
+            return jsonify({'message': 'Message not found'}), 404
+        position = tuple(position)
+    if position is not None:
+        query = query.filter(tuple_(GroupMessage.sent_at, GroupMessage.id) < position)
+
+    # 多取一条用于判断是否还有更早的消息
+    rows = query.order_by(GroupMessage.sent_at.desc(), GroupMessage.id.desc()).limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    result = {
+        'messages': serialize_messages(rows),
+        'next_cursor': _encode_cursor(rows[-1]) if has_more else None,
+        'has_more': has_more
+    }
+    if request.args.get('include_total', '').lower() in ('1', 'true'):
+        result['total'] = GroupMessage.query.filter_by(group_id=room_id, is_deleted=False).count()
+    return jsonify(result)
+
+
+def broadcast_new_message(room_id, message_data):
+    """
+    向聊天室广播新消息（HTTP 与 WebSocket 发送共用）
+    广播帧只编码一次，flask-sock 连接、其他worker进程与 SocketIO 客户端复用同一份编码结果
+    """
+    frame = MessageFrame({'type': 'new_message', 'payload': message_data})
+
+    # 通过WebSocket广播新消息
+    try:
+        from utils.websocket_manager import ws_manager
+        ws_manager.broadcast_to_room(str(room_id), frame)
+    except Exception as e:
+        print(f"WS Broadcast error: {e}")
+
+    # 保留 SocketIO 代码作为备份或向后兼容 (如果需要)
+    try:
+        from app import socketio
+        if socketio:
+            socketio.emit('new_message', frame, room=str(room_id))
+    except (ImportError, AttributeError):
+        pass
+
+
 @chat_bp.route('/rooms/<room_id>/messages', methods=['POST'])
 @token_required
 def send_message(current_user, room_id):
@@ -121,7 +227,7 @@ def send_message(current_user, room_id):
 
     # 验证用户是否是该项目组成员
     group = ProjectGroup.query.filter_by(id=room_id).first()
-    if not group or current_user not in group.members:
+    if not group or not is_project_member(current_user.id, group.id):
         return jsonify({'success': False, 'message': 'Chat room not found or access denied'}), 404
 
     # 获取消息类型，默认为text
@@ -191,72 +297,9 @@ def send_message(current_user, room_id):
     db.session.add(new_message)
     db.session.commit()
 
-    # 构造完整的消息对象用于返回和WebSocket广播
-    sender = User.query.get(new_message.sender_id)
-    # 统一返回字段为下划线风格，类型为大写
-    from datetime import datetime
-    updated_str = None
-    try:
-        if getattr(new_message, 'updated_time', None) is not None:
-            if isinstance(new_message.updated_time, (int, float)):
-                updated_str = datetime.utcfromtimestamp(int(new_message.updated_time)).strftime('%Y-%m-%d %H:%M:%S')
-            else:
-                updated_str = str(new_message.updated_time)
-    except Exception:
-        updated_str = None
-
-    message_data = {
-        'id': new_message.id,
-        'room_id': new_message.group_id,
-        'sender_id': new_message.sender_id,
-        'sender_name': sender.username if sender else 'Unknown',
-        'message_type': (new_message.message_type or 'text').upper(),
-        'content': new_message.content,
-        'created_at': new_message.sent_at,
-        'updated_time': updated_str
-    }
-
-    # 为非文本类型提供 caption 字段，便于客户端统一展示附加文字
-    try:
-        if (new_message.message_type or 'text') in ['image', 'video', 'audio', 'file', 'task'] and (new_message.content or '').strip():
-            message_data['caption'] = new_message.content
-    except Exception:
-        pass
-    
-    # 添加回复消息ID
-    if new_message.reply_to_id:
-        message_data['reply_to_id'] = new_message.reply_to_id
-    
-    # 添加文件URL
-    if new_message.file_url:
-        message_data['file_url'] = new_message.file_url
-    
-    # 添加任务信息
-    if new_message.task_id:
-        task = Task.query.filter_by(id=new_message.task_id, is_deleted=False).first()
-        if task:
-            message_data['task'] = task.to_dict()
-            message_data['task_id'] = new_message.task_id
-
-    # 通过WebSocket广播新消息
-    try:
-        from utils.websocket_manager import ws_manager
-        ws_manager.broadcast_to_room(
-            str(room_id), 
-            {
-                "type": "new_message",
-                "payload": message_data
-            }
-        )
-    except Exception as e:
-        print(f"WS Broadcast error: {e}")
+    # 构造完整的消息对象用于返回和WebSocket广播（与历史消息、WebSocket发送使用同一序列化）
+    message_data = serialize_message(new_message)
 
-    # 保留 SocketIO 代码作为备份或向后兼容 (如果需要)
-    try:
-        from app import socketio
-        if socketio:
-            socketio.emit('new_message', {'type': 'new_message', 'payload': message_data}, room=str(room_id))
-    except (ImportError, AttributeError):
-        pass
+    broadcast_new_message(room_id, message_data)
 
     return jsonify(message_data), 201
@@ -1,11 +1,23 @@
 import os
 
+# 文档/示例中出现过的密钥，不能用于签名token
+INSECURE_SECRET_KEYS = ('your-secret-key-here',)
+
 class Config:
     """应用配置类"""
-    SECRET_KEY = os.environ.get('SECRET_KEY') or 'your-secret-key-here'
+    # 签名会话token的密钥：生产环境必须通过环境变量设置（多进程部署时各进程必须使用同一个密钥），
+    # 未设置时 create_app 拒绝启动；开发环境未设置时生成仅本进程有效的临时密钥
+    SECRET_KEY = os.environ.get('SECRET_KEY')
+    REQUIRE_SECRET_KEY = False
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or 'sqlite:///todolist.db'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     
+    # 只读副本：DATABASE_READ_URLS 为逗号分隔的副本URI，只读请求的查询发往副本
+    SQLALCHEMY_READ_BINDS = [uri.strip() for uri in os.environ.get('DATABASE_READ_URLS', '').split(',') if uri.strip()]
+    # 不使用副本的蓝图（逗号分隔的蓝图名）；写请求后同一用户在该秒数内仍读主库
+    READ_REPLICA_EXCLUDED_BLUEPRINTS = [name.strip() for name in os.environ.get('READ_REPLICA_EXCLUDED_BLUEPRINTS', 'auth').split(',') if name.strip()]
+    READ_YOUR_WRITES_SECONDS = int(os.environ.get('READ_YOUR_WRITES_SECONDS', 5))
+    
     # 密码加密配置
     BCRYPT_LOG_ROUNDS = 12
     
@@ -19,6 +31,39 @@ class Config:
     RATELIMIT_DEFAULT = os.environ.get('RATELIMIT_DEFAULT', '200 per hour')
     RATELIMIT_STRATEGY = 'fixed-window'
     
+    # 会话Token配置：签名token有效期（秒）；迁移期间是否接受旧版token（用户id/用户名/邮箱）
+    AUTH_TOKEN_TTL = int(os.environ.get('AUTH_TOKEN_TTL', 30 * 24 * 3600))
+    AUTH_ACCEPT_LEGACY_TOKENS = os.environ.get('AUTH_ACCEPT_LEGACY_TOKENS', 'true').lower() == 'true'
+    
+    # Token解析缓存配置（LRU + TTL，单位：秒）：旧版token的解析结果，以及签名token校验用的用户状态（token版本、是否启用）
+    # 其他进程修改密码后，本进程缓存的旧版本最多在 TTL 内仍被接受
+    TOKEN_CACHE_SIZE = int(os.environ.get('TOKEN_CACHE_SIZE', 10000))
+    TOKEN_CACHE_TTL = int(os.environ.get('TOKEN_CACHE_TTL', 300))
+    
+    # WebSocket 发送队列：每个连接的待发送帧上限；队列满时的策略 drop_oldest（丢弃最旧帧）或 disconnect（断开慢连接）
+    WS_SEND_QUEUE_SIZE = int(os.environ.get('WS_SEND_QUEUE_SIZE', 256))
+    WS_OVERFLOW_POLICY = os.environ.get('WS_OVERFLOW_POLICY', 'drop_oldest')
+    # WebSocket 广播backplane：inprocess（单进程，默认）或 unix（同机多 worker 进程通过 Unix 套接字目录互相转发）
+    WS_BACKPLANE = os.environ.get('WS_BACKPLANE', 'inprocess')
+    WS_BACKPLANE_DIR = os.environ.get('WS_BACKPLANE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance', 'ws-backplane'))
+    
+    # 聊天室成员关系缓存（WebSocket订阅/发送权限检查，仅缓存"是成员"的结果）（LRU + TTL，单位：秒）
+    MEMBERSHIP_CACHE_SIZE = int(os.environ.get('MEMBERSHIP_CACHE_SIZE', 50000))
+    MEMBERSHIP_CACHE_TTL = int(os.environ.get('MEMBERSHIP_CACHE_TTL', 300))
+    
+    # Widget 接口响应缓存（按用户和查询参数缓存，任务/日程/文件变化时失效；TTL 为 0 时关闭）（LRU + TTL，单位：秒）
+    WIDGET_CACHE_SIZE = int(os.environ.get('WIDGET_CACHE_SIZE', 10000))
+    WIDGET_CACHE_TTL = int(os.environ.get('WIDGET_CACHE_TTL', 30))
+    
+    # WebSocket 聊天消息写入模式：sync（逐条提交，默认）或 batched（先回复accepted，批量提交后广播）
+    # batched 模式下每批最多等待 CHAT_BATCH_MAX_DELAY_MS 毫秒或攒满 CHAT_BATCH_MAX_SIZE 条；等待越长吞吐越高，崩溃时可能丢失的未提交消息也越多
+    CHAT_WRITE_MODE = os.environ.get('CHAT_WRITE_MODE', 'sync')
+    CHAT_BATCH_MAX_SIZE = int(os.environ.get('CHAT_BATCH_MAX_SIZE', 100))
+    CHAT_BATCH_MAX_DELAY_MS = int(os.environ.get('CHAT_BATCH_MAX_DELAY_MS', 5))
+    
+    # 任务层级闭包表（启用前先执行 python manage.py backfill-task-closure）
+    TASK_CLOSURE_ENABLED = os.environ.get('TASK_CLOSURE_ENABLED', 'false').lower() == 'true'
+    
     # 文件上传配置
     MAX_CONTENT_LENGTH = 100 * 1024 * 1024  # 100MB
     UPLOAD_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'uploads')
@@ -38,11 +83,30 @@ class ProductionConfig(Config):
     DEBUG = False
     SQLALCHEMY_ECHO = False
     LOG_LEVEL = 'INFO'
-    # 生产环境应该使用更安全的密钥
-    SECRET_KEY = os.environ.get('SECRET_KEY') or os.urandom(32)
+    REQUIRE_SECRET_KEY = True
+    
+    # SQLite 调优（仅对 SQLite 文件数据库生效）：WAL、busy_timeout、synchronous、mmap、cache、temp_store 及连接池
+    SQLITE_TUNING_ENABLED = os.environ.get('SQLITE_TUNING_ENABLED', 'true').lower() == 'true'
+    SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 5000))
+    SQLITE_SYNCHRONOUS = os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL')
+    SQLITE_MMAP_SIZE = int(os.environ.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024))
+    SQLITE_CACHE_SIZE_KB = int(os.environ.get('SQLITE_CACHE_SIZE_KB', 64 * 1024))
+    SQLITE_POOL_SIZE = int(os.environ.get('SQLITE_POOL_SIZE', 10))
+    SQLITE_POOL_MAX_OVERFLOW = int(os.environ.get('SQLITE_POOL_MAX_OVERFLOW', 20))
+
+class TestingConfig(Config):
+    """测试环境配置（tests/ 使用，内存数据库）"""
+    TESTING = True
+    SECRET_KEY = 'testing-secret-key'
+    SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+    SQLALCHEMY_READ_BINDS = []
+    RATELIMIT_ENABLED = False
+    BCRYPT_LOG_ROUNDS = 4
+    LOG_LEVEL = 'WARNING'
 
 config = {
     'development': DevelopmentConfig,
     'production': ProductionConfig,
+    'testing': TestingConfig,
     'default': DevelopmentConfig
 }
\ No newline at end of file
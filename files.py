@@ -1,6 +1,9 @@
 from flask import Blueprint, request, jsonify, send_file, send_from_directory
 from models import db, User, ProjectGroup, SharedFile
 from auth import token_required
+from utils.membership import is_project_member
+from utils.response_cache import widget_cache
+from utils.conditional_get import conditional_get, collection_version
 from sqlalchemy.exc import IntegrityError
 from werkzeug.utils import secure_filename
 import os
@@ -87,7 +90,7 @@ def upload_file(current_user):
                     'message': 'Project group not found'
                 }), 404
             
-            if current_user not in project.members and project.leader_id != current_user.id:
+            if project.leader_id != current_user.id and not is_project_member(current_user.id, project.id):
                 return jsonify({
                     'success': False,
                     'message': 'Permission denied: Not a member of this project'
@@ -120,6 +123,7 @@ def upload_file(current_user):
         
         db.session.add(new_file)
         db.session.commit()
+        widget_cache.invalidate(user_ids=[current_user.id])
         
         file_data = new_file.to_dict()
         file_data['uploaded_by_name'] = current_user.username
@@ -154,7 +158,7 @@ def get_file(current_user, file_id):
             # 如果是项目文件，检查用户是否是项目组成员
             if file.group_id:
                 project = ProjectGroup.query.filter_by(id=file.group_id).first()
-                if not project or (current_user not in project.members and project.leader_id != current_user.id):
+                if not project or (project.leader_id != current_user.id and not is_project_member(current_user.id, project.id)):
                     return jsonify({
                         'success': False,
                         'message': 'Permission denied'
@@ -204,6 +208,7 @@ def delete_file(current_user, file_id):
         file.is_deleted = True
         file.updated_at = datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
         db.session.commit()
+        widget_cache.invalidate(user_ids=[file.user_id])
         
         # 可选：同时删除物理文件
         # file_path = os.path.join(UPLOAD_FOLDER, file.file_path)
@@ -222,8 +227,22 @@ def delete_file(current_user, file_id):
             'message': f'Failed to delete file: {str(e)}'
         }), 500
 
+def _group_files_version(current_user, group_id):
+    """
+    项目组文件列表的版本：未删除文件的数量、最大 updated_at 与上传者的最大 updated_at
+    （列表中包含 uploaded_by_name，用户改名不会更新文件的 updated_at），一次聚合查询
+    """
+    project = db.session.get(ProjectGroup, group_id)
+    if not project or (project.leader_id != current_user.id and not is_project_member(current_user.id, project.id)):
+        return None
+    files = db.session.query(SharedFile).outerjoin(User, SharedFile.user_id == User.id).filter(
+        SharedFile.group_id == group_id, SharedFile.is_deleted == False
+    )
+    return collection_version(files, SharedFile.updated_at, User.updated_at)
+
 @files_bp.route('/group/<group_id>', methods=['GET'])
 @token_required
+@conditional_get(_group_files_version)
 def get_group_files(current_user, group_id):
     """获取项目组的文件列表接口"""
     try:
@@ -235,7 +254,7 @@ def get_group_files(current_user, group_id):
                 'message': 'Project group not found'
             }), 404
         
-        if current_user not in project.members and project.leader_id != current_user.id:
+        if project.leader_id != current_user.id and not is_project_member(current_user.id, project.id):
             return jsonify({
                 'success': False,
                 'message': 'Permission denied: Not a member of this project'
@@ -284,7 +303,7 @@ def preview_file(current_user, file_id):
             # 如果是项目文件，检查用户是否是项目组成员
             if file.group_id:
                 project = ProjectGroup.query.filter_by(id=file.group_id).first()
-                if not project or (current_user not in project.members and project.leader_id != current_user.id):
+                if not project or (project.leader_id != current_user.id and not is_project_member(current_user.id, project.id)):
                     return jsonify({
                         'success': False,
                         'message': 'Permission denied'
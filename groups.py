@@ -1,7 +1,11 @@
 from flask import Blueprint, request, jsonify
-from models import db, User, ProjectGroup, Task, CalendarEvent, SharedFile
+from models import db, User, ProjectGroup, Task, CalendarEvent, SharedFile, user_groups
 from sqlalchemy.exc import IntegrityError
 from auth import token_required
+from utils.membership import membership_cache, is_project_member
+from utils.task_counters import task_counts, delete_scope, SCOPE_PROJECT
+from utils.response_cache import widget_cache
+from utils.conditional_get import conditional_get
 from datetime import datetime
 import time
 
@@ -91,6 +95,9 @@ def create_group():
             new_group.members.append(leader)
         
         db.session.commit()
+        if leader:
+            membership_cache.add(new_group.id, leader.id)
+            widget_cache.invalidate(user_ids=[leader.id])
         
         return jsonify({
             'success': True,
@@ -156,7 +163,7 @@ def join_group():
             }), 404
         
         # 检查用户是否已经是项目组成员
-        if user in group.members:
+        if is_project_member(user.id, group.id):
             return jsonify({
                 'success': False,
                 'message': 'User is already a member of this group'
@@ -166,6 +173,8 @@ def join_group():
         group.members.append(user)
         
         db.session.commit()
+        membership_cache.add(group.id, user.id)
+        widget_cache.invalidate(user_ids=[user.id])
         
         return jsonify({
             'success': True,
@@ -240,7 +249,7 @@ def join_group_by_invite_code():
             }), 403
         
         # 检查用户是否已经是项目组成员
-        if user in group.members:
+        if is_project_member(user.id, group.id):
             return jsonify({
                 'success': False,
                 'message': 'User is already a member of this group'
@@ -250,6 +259,8 @@ def join_group_by_invite_code():
         group.members.append(user)
         
         db.session.commit()
+        membership_cache.add(group.id, user.id)
+        widget_cache.invalidate(user_ids=[user.id])
         
         return jsonify({
             'success': True,
@@ -398,6 +409,7 @@ def update_group(group_id):
             group.is_active = bool(data['is_active'])
         
         db.session.commit()
+        widget_cache.invalidate(project_ids=[group.id])
         
         return jsonify({
             'success': True,
@@ -426,7 +438,10 @@ def delete_group(group_id):
         
         # 删除项目组（会自动处理关联关系）
         db.session.delete(group)
+        delete_scope(SCOPE_PROJECT, group_id)
         db.session.commit()
+        membership_cache.invalidate_room(group_id)
+        widget_cache.invalidate(project_ids=[group_id])
         
         return jsonify({
             'success': True,
@@ -440,8 +455,26 @@ def delete_group(group_id):
             'message': f'Failed to delete group: {str(e)}'
         }), 500
 
+def _group_members_version(current_user, group_id):
+    """
+    成员列表的版本：负责人，加上负责人与成员的数量、最大 updated_at 和成员的最大 joined_at，
+    一次聚合查询（成员退出后再加入会更新 joined_at，改名等资料变化会更新 users.updated_at）
+    """
+    group = db.session.get(ProjectGroup, group_id)
+    if not group or (group.leader_id != current_user.id and not is_project_member(current_user.id, group.id)):
+        return None
+    member_ids = db.select(user_groups.c.user_id).where(user_groups.c.group_id == group_id)
+    last_joined = db.select(db.func.max(user_groups.c.joined_at)).where(
+        user_groups.c.group_id == group_id
+    ).scalar_subquery()
+    count, updated, joined = db.session.query(
+        db.func.count(), db.func.max(User.updated_at), last_joined
+    ).filter(db.or_(User.id == group.leader_id, User.id.in_(member_ids))).one()
+    return (group.leader_id, count, updated, joined), max(filter(None, (updated, joined)), default=None)
+
 @groups_bp.route('/<group_id>/members', methods=['GET'])
 @token_required
+@conditional_get(_group_members_version)
 def get_group_members(current_user, group_id):
     """获取项目组成员列表接口"""
     try:
@@ -454,7 +487,7 @@ def get_group_members(current_user, group_id):
             }), 404
         
         # 验证用户是否是项目组成员
-        if current_user not in group.members and group.leader_id != current_user.id:
+        if group.leader_id != current_user.id and not is_project_member(current_user.id, group.id):
             return jsonify({
                 'success': False,
                 'message': 'Permission denied: Not a member of this group'
@@ -513,7 +546,7 @@ def get_group_overview(current_user, group_id):
             }), 404
         
         # 验证用户是否是项目组成员
-        if current_user not in group.members and group.leader_id != current_user.id:
+        if group.leader_id != current_user.id and not is_project_member(current_user.id, group.id):
             return jsonify({
                 'success': False,
                 'message': 'Permission denied: Not a member of this group'
@@ -522,42 +555,42 @@ def get_group_overview(current_user, group_id):
         # 获取基本信息
         group_dict = group.to_dict()
         
-        # 获取成员统计
+        # 获取成员统计（COUNT 查询，不加载成员对象）
         members_count = group.members.count()
         
-        # 获取任务统计
-        tasks = Task.query.filter(
-            Task.project_id == group_id,
-            Task.is_deleted == False
-        ).all()
+        # 获取任务统计（读取 task_counters 计数行）
+        counts = task_counts(SCOPE_PROJECT, group_id)
+        tasks_total = sum(counts.values())
+        tasks_completed = counts.get('completed', 0)
+        tasks_pending = counts.get('pending', 0)
+        tasks_in_progress = counts.get('in_progress', 0)
         
-        tasks_total = len(tasks)
-        tasks_completed = len([t for t in tasks if t.status == 'completed'])
-        tasks_pending = len([t for t in tasks if t.status == 'pending'])
-        tasks_in_progress = len([t for t in tasks if t.status == 'in_progress'])
-        
-        # 获取今日任务
+        # 获取今日任务（end_date 为今天，due_date 已废弃），走 idx_tasks_project_end 覆盖索引
         today = datetime.utcnow().strftime('%Y-%m-%d')
-        today_tasks = [t for t in tasks if t.due_date == today and t.status not in ['completed', 'cancelled']]
+        today_tasks_count = db.session.query(db.func.count()).select_from(Task).filter(
+            Task.project_id == group_id,
+            Task.is_deleted == False,
+            Task.end_date == today,
+            db.or_(Task.status.is_(None), Task.status.notin_(['completed', 'cancelled']))
+        ).scalar()
         
         # 获取文件统计
-        files = SharedFile.query.filter(
+        files_count = db.session.query(db.func.count(SharedFile.id)).filter(
             SharedFile.group_id == group_id,
             SharedFile.is_deleted == False
-        ).all()
-        files_count = len(files)
+        ).scalar()
         
         # 获取最近的日历事件（如果有项目组的日历事件）
-        # 这里简化处理，只统计项目组中成员的任务相关的日历事件
+        # 这里简化处理，只统计项目组中成员（含负责人）的日历事件，成员通过 user_groups 子查询确定
         today_start = f'{today} 00:00:00'
         today_end = f'{today} 23:59:59'
-        member_ids = [m.id for m in group.members] + [group.leader_id]
-        today_events = CalendarEvent.query.filter(
-            CalendarEvent.user_id.in_(member_ids),
+        member_ids = db.select(user_groups.c.user_id).where(user_groups.c.group_id == group_id)
+        today_events = db.session.query(db.func.count(CalendarEvent.id)).filter(
+            db.or_(CalendarEvent.user_id == group.leader_id, CalendarEvent.user_id.in_(member_ids)),
             CalendarEvent.is_deleted == False,
             CalendarEvent.start_time >= today_start,
             CalendarEvent.start_time <= today_end
-        ).count()
+        ).scalar()
         
         overview = {
             'group': group_dict,
@@ -568,7 +601,7 @@ def get_group_overview(current_user, group_id):
                     'completed': tasks_completed,
                     'pending': tasks_pending,
                     'in_progress': tasks_in_progress,
-                    'today': len(today_tasks)
+                    'today': today_tasks_count
                 },
                 'files': files_count,
                 'events_today': today_events
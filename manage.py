@@ -9,9 +9,12 @@ Flask CLI管理脚本
     python manage.py db upgrade       # 执行迁移
     python manage.py db downgrade     # 回退迁移
     python manage.py run              # 运行开发服务器
+    python manage.py backfill-task-closure  # 回填任务层级闭包表
+    python manage.py reconcile-task-counters [--dry-run]  # 重新计算任务计数表并报告偏差
 """
 
 import os
+import click
 from flask.cli import FlaskGroup
 from app import create_app
 
@@ -44,6 +47,31 @@ def run():
     
     app.run(host=host, port=port, debug=True)
 
+@cli.command('backfill-task-closure')
+def backfill_task_closure():
+    """根据 parent_task_id 重建任务层级闭包表"""
+    from utils.task_hierarchy import rebuild_closure
+    
+    rows, cyclic = rebuild_closure()
+    print(f"闭包表已重建: 写入 {rows} 行")
+    if cyclic:
+        print(f"警告: {len(cyclic)} 个任务处于循环引用中，已跳过: {', '.join(cyclic[:20])}")
+
+@cli.command('reconcile-task-counters')
+@click.option('--dry-run', is_flag=True, help='只报告偏差，不写入')
+def reconcile_task_counters(dry_run):
+    """根据任务表重新计算 task_counters 计数，报告并修正偏差"""
+    from utils.task_counters import reconcile_counters
+    
+    drift = reconcile_counters(dry_run=dry_run)
+    for scope_type, scope_id, diff in drift[:50]:
+        detail = ', '.join(f'{column}: {stored} -> {actual}' for column, (stored, actual) in diff.items())
+        print(f"  {scope_type}:{scope_id}  {detail}")
+    if len(drift) > 50:
+        print(f"  ... 另有 {len(drift) - 50} 个计数行存在偏差")
+    action = '发现' if dry_run else '已修正'
+    print(f"计数校正完成: {action} {len(drift)} 个计数行的偏差")
+
 if __name__ == '__main__':
     cli()
 
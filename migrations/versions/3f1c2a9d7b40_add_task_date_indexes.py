@@ -0,0 +1,30 @@
+"""add task date range indexes
+
+Revision ID: 3f1c2a9d7b40
+Revises: 
+Create Date: 2026-10-17 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f1c2a9d7b40'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # 月视图按日期区间筛选（GET /tasks?month=）使用的复合索引；
+    # 新库由 db.create_all() 按模型建索引，这里只为已有数据库补建
+    op.create_index('idx_tasks_project_dates', 'tasks',
+                    ['project_id', 'is_deleted', 'start_date', 'end_date'], if_not_exists=True)
+    op.create_index('idx_tasks_user_dates', 'tasks',
+                    ['user_id', 'is_deleted', 'start_date', 'end_date'], if_not_exists=True)
+
+
+def downgrade():
+    op.drop_index('idx_tasks_user_dates', table_name='tasks', if_exists=True)
+    op.drop_index('idx_tasks_project_dates', table_name='tasks', if_exists=True)
@@ -0,0 +1,27 @@
+"""add users.updated_at
+
+Revision ID: 8b2e5d0c4a17
+Revises: 3f1c2a9d7b40
+Create Date: 2026-10-17 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8b2e5d0c4a17'
+down_revision = '3f1c2a9d7b40'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # 项目组成员/文件列表的条件请求版本使用；已有用户保持 NULL，下次修改资料时写入
+    with op.batch_alter_table('users') as batch_op:
+        batch_op.add_column(sa.Column('updated_at', sa.String(length=19), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('users') as batch_op:
+        batch_op.drop_column('updated_at')
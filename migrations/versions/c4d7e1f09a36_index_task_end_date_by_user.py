@@ -0,0 +1,30 @@
+"""index task end_date by user, drop due_date indexes
+
+Revision ID: c4d7e1f09a36
+Revises: 8b2e5d0c4a17
+Create Date: 2026-10-17 18:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4d7e1f09a36'
+down_revision = '8b2e5d0c4a17'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # 过期/今日任务改按 end_date 统计（due_date 已废弃），旧的 due_date 索引不再使用
+    op.create_index('idx_tasks_user_end', 'tasks',
+                    ['user_id', 'is_deleted', 'end_date', 'status'], if_not_exists=True)
+    op.drop_index('idx_tasks_user_due', table_name='tasks', if_exists=True)
+    op.drop_index('idx_tasks_project_due', table_name='tasks', if_exists=True)
+
+
+def downgrade():
+    op.create_index('idx_tasks_project_due', 'tasks', ['project_id', 'is_deleted', 'due_date'], if_not_exists=True)
+    op.create_index('idx_tasks_user_due', 'tasks', ['user_id', 'is_deleted', 'due_date'], if_not_exists=True)
+    op.drop_index('idx_tasks_user_end', table_name='tasks', if_exists=True)
@@ -8,7 +8,7 @@ from .base import db, bcrypt
 from .user import User, OAuthAccount
 from .group import ProjectGroup, user_groups
 from .chat import GroupMessage, MessageReadStatus
-from .task import Task, TaskFile, TaskAssignee
+from .task import Task, TaskFile, TaskAssignee, TaskClosure, TaskCounter, TaskDailyCount
 from .file import SharedFile
 from .settings import UserSettings
 from .calendar import CalendarEvent
@@ -30,6 +30,9 @@ __all__ = [
     'Task',
     'TaskFile',
     'TaskAssignee',
+    'TaskClosure',
+    'TaskCounter',
+    'TaskDailyCount',
     # 文件相关模型
     'SharedFile',
     'UserSettings',
@@ -1,6 +1,8 @@
 from flask_sqlalchemy import SQLAlchemy
 from flask_bcrypt import Bcrypt
+from .routing import RoutingSession
 
-db = SQLAlchemy()
+# 会话支持只读副本路由（配置 SQLALCHEMY_READ_BINDS 后生效，见 models/routing.py）
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 bcrypt = Bcrypt()
 
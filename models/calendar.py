@@ -18,6 +18,11 @@ class CalendarEvent(db.Model):
     updated_at = db.Column(db.String(19), default=lambda: datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S'))
     is_deleted = db.Column(db.Boolean, default=False)
     
+    # 按用户和开始时间筛选日程使用
+    __table_args__ = (
+        db.Index('idx_calendar_events_user_start', 'user_id', 'is_deleted', 'start_time'),
+    )
+    
     def __init__(self, user_id, title, start_time, end_time, task_id=None, description=None, location=None):
         """初始化日历事件对象"""
         self.id = str(uuid.uuid4()).replace('-', '')[:16]
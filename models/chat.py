@@ -19,6 +19,13 @@ class GroupMessage(db.Model):
     updated_time = db.Column(db.Integer, default=lambda: int(time.time()))
     is_deleted = db.Column(db.Boolean, default=False)
     
+    # 聊天室列表取每个房间最新消息、历史消息游标分页使用的复合索引
+    __table_args__ = (
+        # 聊天室列表取各组最新消息：ORDER BY sent_at DESC, id DESC 直接沿索引倒序取第一行
+        db.Index('idx_group_messages_room_latest', 'group_id', 'is_deleted', 'sent_at', 'id'),
+        db.Index('idx_group_messages_room_cursor', 'group_id', 'sent_at', 'id'),
+    )
+    
     def __init__(self, group_id, sender_id, content, message_type='text', file_url=None, task_id=None, reply_to_id=None):
         """初始化消息对象"""
         self.id = str(uuid.uuid4()).replace('-', '')[:16]
@@ -51,7 +58,12 @@ class GroupMessage(db.Model):
 
 
 class MessageReadStatus(db.Model):
-    """消息已读状态模型"""
+    """
+    消息已读状态模型（已弃用）
+
+    未读数改为按 user_groups.last_read_at/last_read_message_id 记录的每成员已读位置计算，
+    接口不再读写本表；保留模型只为兼容已有数据库中的表，新代码不要使用。
+    """
     __tablename__ = 'message_read_status'
     
     id = db.Column(db.String(16), primary_key=True, default=lambda: str(uuid.uuid4()).replace('-', '')[:16])
@@ -19,6 +19,11 @@ class SharedFile(db.Model):
     updated_at = db.Column(db.String(19), default=lambda: datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S'))
     is_deleted = db.Column(db.Boolean, default=False)
     
+    # 项目组文件列表/计数使用
+    __table_args__ = (
+        db.Index('idx_shared_files_group', 'group_id', 'is_deleted'),
+    )
+    
     def __init__(self, user_id, filename, file_path, group_id=None, file_type=None, 
                  file_size=None, mime_type=None, thumbnail_path=None):
         """初始化共享文件对象"""
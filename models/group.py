@@ -8,7 +8,12 @@ import string
 user_groups = db.Table('user_groups',
     db.Column('user_id', db.String(16), db.ForeignKey('users.id'), primary_key=True),
     db.Column('group_id', db.String(16), db.ForeignKey('project_groups.id'), primary_key=True),
-    db.Column('joined_at', db.String(19), default=lambda: datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S'))
+    db.Column('joined_at', db.String(19), default=lambda: datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')),
+    # 聊天已读位置：最后一条已读消息的 (sent_at, id)，之后他人发送的消息计为未读
+    db.Column('last_read_at', db.String(19)),
+    db.Column('last_read_message_id', db.String(16)),
+    # 主键以 user_id 开头，按项目组查成员需要单独的索引
+    db.Index('idx_user_groups_group', 'group_id', 'user_id')
 )
 
 class ProjectGroup(db.Model):
@@ -0,0 +1,145 @@
+"""
+读写分离路由模块
+配置 SQLALCHEMY_READ_BINDS（只读副本URI列表）后，只读请求（GET/HEAD/OPTIONS）中的 SELECT
+发往副本，以下情况仍使用主库：
+- 写操作（flush、INSERT/UPDATE/DELETE、原生SQL）以及同一会话中写操作之后的查询
+- READ_REPLICA_EXCLUDED_BLUEPRINTS 中的蓝图
+- 认证时加载用户（use_primary），保证刚修改密码/刚注册登录的 token 能通过 token_version 校验
+- 同一用户在写请求（POST/PUT/DELETE 等）之后 READ_YOUR_WRITES_SECONDS 秒内的请求，
+  保证客户端能读到自己刚写入的数据。写请求的响应设置 READ_YOUR_WRITES_COOKIE（到期时间戳），
+  任意 worker 收到带该 cookie 的请求都使用主库；不保存 cookie 的客户端按用户ID在本进程内记录
+未配置副本时行为与原先完全一致。
+"""
+from contextlib import contextmanager
+from threading import Lock
+import random
+import time
+from flask import current_app, g, has_request_context, request
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+from sqlalchemy.sql.dml import UpdateBase
+from sqlalchemy.sql.elements import TextClause
+
+READ_BIND_PREFIX = 'read_replica_'
+READ_ONLY_METHODS = ('GET', 'HEAD', 'OPTIONS')
+READ_YOUR_WRITES_COOKIE = 'rw_until'
+
+
+class RecentWriters:
+    """记录最近发起过写请求的用户（TTL，进程内）"""
+    def __init__(self):
+        self._entries = {}
+        self._lock = Lock()
+
+    def mark(self, user_id, ttl):
+        now = time.monotonic()
+        with self._lock:
+            self._entries[user_id] = now + ttl
+            # 顺带清理过期项，避免无限增长
+            if len(self._entries) > 10000:
+                self._entries = {k: v for k, v in self._entries.items() if v > now}
+
+    def contains(self, user_id):
+        with self._lock:
+            expires_at = self._entries.get(user_id)
+        return expires_at is not None and expires_at > time.monotonic()
+
+
+recent_writers = RecentWriters()
+
+
+def _wrote_recently():
+    """当前请求的客户端/用户是否在 READ_YOUR_WRITES_SECONDS 内发起过写请求"""
+    try:
+        if float(request.cookies.get(READ_YOUR_WRITES_COOKIE, 0)) > time.time():
+            return True
+    except ValueError:
+        pass
+    user_id = g.get('current_user_id')
+    return bool(user_id) and recent_writers.contains(user_id)
+
+
+@contextmanager
+def use_primary(session):
+    """范围内的查询固定使用主库（例如认证时加载用户，需要读到最新的 token_version）"""
+    session.info['primary_depth'] = session.info.get('primary_depth', 0) + 1
+    try:
+        yield
+    finally:
+        session.info['primary_depth'] -= 1
+
+
+def _replica_bind_key():
+    """
+    当前请求使用的副本 bind key；不应使用副本时返回 None（每个请求只计算一次）
+    认证在 use_primary 中完成，因此计算时已知当前用户（g.current_user_id）
+    """
+    if not has_request_context():
+        return None
+    if '_read_replica_key' not in g:
+        keys = current_app.config.get('_READ_REPLICA_KEYS') or []
+        use_replica = (
+            bool(keys)
+            and request.method in READ_ONLY_METHODS
+            and request.blueprint not in current_app.config.get('READ_REPLICA_EXCLUDED_BLUEPRINTS', ())
+            and not _wrote_recently()
+        )
+        g._read_replica_key = random.choice(keys) if use_replica else None
+    return g._read_replica_key
+
+
+class RoutingSession(Session):
+    """在 Flask-SQLAlchemy 会话的基础上，把只读请求中的查询路由到只读副本"""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        engine = super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+        if bind is not None or self.info.get('wrote') or self.info.get('primary_depth'):
+            return engine
+        if isinstance(clause, UpdateBase):
+            self.info['wrote'] = True
+            return engine
+        if isinstance(clause, TextClause):
+            return engine
+        replica_key = _replica_bind_key()
+        if replica_key is None or engine is not self._db.engines.get(None):
+            return engine
+        return self._db.engines[replica_key]
+
+
+@event.listens_for(RoutingSession, 'before_flush')
+def _mark_session_wrote(session, flush_context, instances):
+    # 写入之后同一会话（即本次请求）的查询都走主库，包括提交之后
+    if session.new or session.dirty or session.deleted:
+        session.info['wrote'] = True
+
+
+def init_read_replicas(app):
+    """
+    在 db.init_app 之前调用：把 SQLALCHEMY_READ_BINDS 注册为额外的 bind，
+    并在写请求结束后记录用户并设置 cookie（读己之写）
+    """
+    read_binds = app.config.get('SQLALCHEMY_READ_BINDS') or []
+    if not read_binds:
+        app.config['_READ_REPLICA_KEYS'] = []
+        return False
+    binds = dict(app.config.get('SQLALCHEMY_BINDS') or {})
+    keys = []
+    for index, uri in enumerate(read_binds):
+        key = f'{READ_BIND_PREFIX}{index}'
+        binds[key] = uri
+        keys.append(key)
+    app.config['SQLALCHEMY_BINDS'] = binds
+    app.config['_READ_REPLICA_KEYS'] = keys
+
+    @app.after_request
+    def _remember_writer(response):
+        if request.method not in READ_ONLY_METHODS:
+            ttl = app.config.get('READ_YOUR_WRITES_SECONDS', 5)
+            user_id = g.get('current_user_id')
+            if user_id:
+                recent_writers.mark(user_id, ttl)
+            response.set_cookie(READ_YOUR_WRITES_COOKIE, str(int(time.time()) + ttl + 1),
+                                max_age=ttl + 1, httponly=True, samesite='Lax')
+        return response
+
+    return True
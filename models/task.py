@@ -27,6 +27,16 @@ class Task(db.Model):
     # 自引用关系：子任务
     subtasks = db.relationship('Task', backref=db.backref('parent_task', remote_side=[id]), lazy='dynamic')
     
+    # 月视图按日期区间筛选使用的复合索引
+    __table_args__ = (
+        db.Index('idx_tasks_project_dates', 'project_id', 'is_deleted', 'start_date', 'end_date'),
+        db.Index('idx_tasks_user_dates', 'user_id', 'is_deleted', 'start_date', 'end_date'),
+        # Widget 统计过期任务、今日任务使用（覆盖索引）
+        db.Index('idx_tasks_user_end', 'user_id', 'is_deleted', 'end_date', 'status'),
+        # 项目统计按 end_date 汇总每日分布、项目组概览统计今日任务使用（覆盖索引）
+        db.Index('idx_tasks_project_end', 'project_id', 'is_deleted', 'end_date', 'status'),
+    )
+    
     def __init__(self, user_id, title, project_id=None, parent_task_id=None, description=None, 
                  status='pending', priority='medium', start_date=None, end_date=None, due_date=None, assigned_to=None):
         """初始化任务对象"""
@@ -51,8 +61,13 @@ class Task(db.Model):
         # due_date 已废弃，不再写入
         self.assigned_to = assigned_to
     
-    def to_dict(self):
-        """转换为字典格式"""
+    def to_dict(self, assignees=None):
+        """转换为字典格式
+
+        assignees 为预先批量加载的指派用户ID列表；未提供时单独查询（见 to_dicts）
+        """
+        if assignees is None:
+            assignees = [a.user_id for a in TaskAssignee.query.filter_by(task_id=self.id).all()]
         return {
             'id': self.id,
             'user_id': self.user_id,
@@ -71,13 +86,138 @@ class Task(db.Model):
             'completed_at': self.completed_at,
             'is_deleted': self.is_deleted,
             'position': self.position,
-            'assignees': [a.user_id for a in TaskAssignee.query.filter_by(task_id=self.id).all()]
+            'assignees': assignees
         }
     
+    @classmethod
+    def status_counts(cls, *criteria):
+        """按状态统计未删除的任务数（一次 GROUP BY 查询），返回 {status: count}"""
+        rows = db.session.query(cls.status, db.func.count(cls.id))\
+            .filter(cls.is_deleted == False, *criteria)\
+            .group_by(cls.status).all()
+        return {status: count for status, count in rows}
+
+    @classmethod
+    def overdue_count(cls, *criteria, today=None):
+        """
+        统计过期任务数：end_date 早于今天且状态不是 completed/cancelled（due_date 已废弃）
+
+        数据库按 end_date 分组计数，再在 Python 中逐个解析不同的 end_date 值，
+        与逐条 strptime 的判断结果一致（无法解析的日期不计入）。规范的 YYYY-MM-DD
+        日期可以直接按字符串比较，不早于今天的在 SQL 中即被排除。
+        """
+        today = today or datetime.utcnow().date()
+        today_str = today.strftime('%Y-%m-%d')
+        rows = db.session.query(cls.end_date, db.func.count()).filter(
+            cls.is_deleted == False,
+            *criteria,
+            cls.end_date.isnot(None),
+            cls.end_date != '',
+            db.or_(cls.end_date < today_str, db.not_(cls.end_date.like('____-__-__'))),
+            db.or_(cls.status.is_(None), cls.status.notin_(['completed', 'cancelled']))
+        ).group_by(cls.end_date).all()
+
+        overdue = 0
+        for end_date, count in rows:
+            try:
+                if datetime.strptime(end_date, '%Y-%m-%d').date() < today:
+                    overdue += count
+            except (ValueError, TypeError):
+                # 如果日期格式不正确，跳过
+                pass
+        return overdue
+
+    @classmethod
+    def to_dicts(cls, tasks):
+        """批量转换为字典格式，指派关系通过一次 IN 查询加载，避免逐个任务查询"""
+        tasks = list(tasks)
+        assignee_map = TaskAssignee.user_ids_by_task([t.id for t in tasks])
+        return [t.to_dict(assignees=assignee_map.get(t.id, [])) for t in tasks]
+    
     def __repr__(self):
         return f'<Task {self.title}>'
 
 
+class TaskClosure(db.Model):
+    """任务层级闭包表：每个任务与其所有祖先（含自身，depth=0）各占一行"""
+    __tablename__ = 'task_closure'
+    
+    ancestor_id = db.Column(db.String(16), db.ForeignKey('tasks.id'), primary_key=True)
+    descendant_id = db.Column(db.String(16), db.ForeignKey('tasks.id'), primary_key=True, index=True)
+    depth = db.Column(db.Integer, nullable=False)
+    
+    def __init__(self, ancestor_id, descendant_id, depth):
+        self.ancestor_id = ancestor_id
+        self.descendant_id = descendant_id
+        self.depth = depth
+    
+    def __repr__(self):
+        return f'<TaskClosure {self.ancestor_id}->{self.descendant_id}>'
+
+
+class TaskCounter(db.Model):
+    """任务计数表：按项目组/用户（任务创建者）维护未删除任务的状态计数"""
+    __tablename__ = 'task_counters'
+
+    # 计数的状态桶，其他状态（含空值）计入 other
+    STATUS_BUCKETS = ('pending', 'in_progress', 'completed', 'cancelled')
+
+    scope_type = db.Column(db.String(10), primary_key=True)  # project, user
+    scope_id = db.Column(db.String(16), primary_key=True)
+    total = db.Column(db.Integer, nullable=False, default=0)
+    pending = db.Column(db.Integer, nullable=False, default=0)
+    in_progress = db.Column(db.Integer, nullable=False, default=0)
+    completed = db.Column(db.Integer, nullable=False, default=0)
+    cancelled = db.Column(db.Integer, nullable=False, default=0)
+    other = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.String(19), default=lambda: datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S'))
+
+    def __init__(self, scope_type, scope_id, counts=None):
+        self.scope_type = scope_type
+        self.scope_id = scope_id
+        self.set_counts(counts or {})
+
+    @classmethod
+    def bucket(cls, status):
+        """任务状态对应的计数列"""
+        return status if status in cls.STATUS_BUCKETS else 'other'
+
+    def set_counts(self, counts):
+        """按 {status: count}（Task.status_counts 的结果）设置各列"""
+        values = dict.fromkeys(self.STATUS_BUCKETS + ('other',), 0)
+        for status, count in counts.items():
+            values[self.bucket(status)] += count
+        for column, value in values.items():
+            setattr(self, column, value)
+        self.total = sum(values.values())
+
+    def counts(self):
+        """返回 {status: count}，与 Task.status_counts 的用法一致（other 为其他状态之和）"""
+        return {column: getattr(self, column) or 0 for column in self.STATUS_BUCKETS + ('other',)}
+
+    def __repr__(self):
+        return f'<TaskCounter {self.scope_type}:{self.scope_id}>'
+
+
+class TaskDailyCount(db.Model):
+    """项目组按 end_date 汇总的每日任务数/完成数（项目统计的每日分布与燃尽图使用）"""
+    __tablename__ = 'task_daily_counts'
+
+    project_id = db.Column(db.String(16), primary_key=True)
+    day = db.Column(db.String(10), primary_key=True)  # 任务的 end_date
+    total = db.Column(db.Integer, nullable=False, default=0)
+    completed = db.Column(db.Integer, nullable=False, default=0)
+
+    def __init__(self, project_id, day, total=0, completed=0):
+        self.project_id = project_id
+        self.day = day
+        self.total = total
+        self.completed = completed
+
+    def __repr__(self):
+        return f'<TaskDailyCount {self.project_id}:{self.day}>'
+
+
 class TaskFile(db.Model):
     """任务附件关联模型"""
     __tablename__ = 'task_files'
@@ -125,6 +265,21 @@ class TaskAssignee(db.Model):
         self.task_id = task_id
         self.user_id = user_id
     
+    # SQLite 旧版本单条语句最多 999 个绑定参数，IN 查询按批次拆分
+    IN_BATCH_SIZE = 500
+    
+    @classmethod
+    def user_ids_by_task(cls, task_ids):
+        """批量获取任务的指派用户ID：{task_id: [user_id, ...]}"""
+        result = {}
+        task_ids = list(dict.fromkeys(task_ids))
+        for i in range(0, len(task_ids), cls.IN_BATCH_SIZE):
+            batch = task_ids[i:i + cls.IN_BATCH_SIZE]
+            rows = db.session.query(cls.task_id, cls.user_id).filter(cls.task_id.in_(batch)).all()
+            for task_id, user_id in rows:
+                result.setdefault(task_id, []).append(user_id)
+        return result
+    
     def to_dict(self):
         return {
             'id': self.id,
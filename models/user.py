@@ -13,6 +13,10 @@ class User(db.Model):
     is_active = db.Column(db.Boolean, default=True)
     avatar_url = db.Column(db.String(500))
     avatar_file_id = db.Column(db.String(16), db.ForeignKey('shared_files.id'), index=True)
+    token_version = db.Column(db.Integer, nullable=False, default=0, server_default='0')  # 修改密码时递增，吊销已签发的token
+    # 任一列修改时更新，列表接口（如项目组成员）的条件请求版本使用
+    updated_at = db.Column(db.String(19), default=lambda: datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S'),
+                           onupdate=lambda: datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S'))
     
     def __init__(self, username, password, email=None):
         """初始化用户对象"""
@@ -1,6 +1,6 @@
 from flask import Blueprint, request, jsonify, redirect, url_for
 from models import db, User, OAuthAccount
-from auth import token_required
+from auth import token_required, issue_token
 from sqlalchemy.exc import IntegrityError
 from datetime import datetime
 import requests
@@ -116,7 +116,7 @@ def google_login():
                     'success': True,
                     'message': 'Login successful',
                     'user': user.to_dict(),
-                    'token': user.id
+                    'token': issue_token(user)
                 }), 200
             else:
                 # 创建新账户（使用邮箱或Google ID作为用户名）；如邮箱已存在则复用该用户并绑定
@@ -155,7 +155,7 @@ def google_login():
                     'success': True,
                     'message': 'Account created and logged in successfully',
                     'user': new_user.to_dict(),
-                    'token': new_user.id
+                    'token': issue_token(new_user)
                 }), 201
         
     except IntegrityError:
@@ -308,7 +308,7 @@ def github_login():
                     'success': True,
                     'message': 'Login successful',
                     'user': user.to_dict(),
-                    'token': user.id
+                    'token': issue_token(user)
                 }), 200
             else:
                 # 创建新账户；如邮箱已存在则复用该用户并绑定
@@ -344,7 +344,7 @@ def github_login():
                     'success': True,
                     'message': 'Account created and logged in successfully',
                     'user': new_user.to_dict(),
-                    'token': new_user.id
+                    'token': issue_token(new_user)
                 }), 201
         
     except IntegrityError:
@@ -1,6 +1,8 @@
 from flask import Blueprint, request, jsonify
-from models import db, ProjectGroup, Task
+from models import db, ProjectGroup
 from auth import token_required
+from utils.membership import is_project_member
+from utils.task_counters import task_counts, daily_distribution, SCOPE_PROJECT
 from datetime import datetime
 
 projects_bp = Blueprint('projects', __name__, url_prefix='/projects')
@@ -12,25 +14,26 @@ def project_stats(current_user, project_id):
         project = ProjectGroup.query.filter_by(id=project_id).first()
         if not project:
             return jsonify({'success': False, 'message': 'Project not found'}), 404
-        if current_user not in project.members and project.leader_id != current_user.id:
+        if project.leader_id != current_user.id and not is_project_member(current_user.id, project.id):
             return jsonify({'success': False, 'message': 'Permission denied'}), 403
 
-        tasks = Task.query.filter(Task.project_id == project_id, Task.is_deleted == False).all()
-        total = len(tasks)
-        completed = len([t for t in tasks if t.status == 'completed'])
+        # 可选的日期区间（按 end_date 截取每日分布）
+        date_from = request.args.get('from')
+        date_to = request.args.get('to')
+        for value in (date_from, date_to):
+            if value:
+                try:
+                    datetime.strptime(value, '%Y-%m-%d')
+                except ValueError:
+                    return jsonify({'success': False, 'message': 'Invalid date format, please use YYYY-MM-DD'}), 400
+
+        counts = task_counts(SCOPE_PROJECT, project_id)
+        total = sum(counts.values())
+        completed = counts.get('completed', 0)
         rate = round((completed / total * 100) if total > 0 else 0, 2)
 
-        # 每日分布：按 end_date 统计完成/未完成数量
-        daily = {}
-        for t in tasks:
-            day = t.end_date
-            if not day:
-                continue
-            if day not in daily:
-                daily[day] = {'total': 0, 'completed': 0}
-            daily[day]['total'] += 1
-            if t.status == 'completed':
-                daily[day]['completed'] += 1
+        # 每日分布：按 end_date 统计完成/未完成数量（读取每日汇总，或一次 GROUP BY 查询）
+        daily = daily_distribution(project_id, date_from, date_to)
 
         return jsonify({
             'success': True,
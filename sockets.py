@@ -1,12 +1,17 @@
 import json
 import time
+from datetime import datetime
 from flask import request
 from simple_websocket import ConnectionClosed
 from app import sock
 from utils.websocket_manager import ws_manager
-from models import User, ProjectGroup, GroupMessage, Task
+from models import GroupMessage, Task
 from models import db
 from utils.serializers import serialize_message
+from auth import resolve_token
+from chat import broadcast_new_message
+from utils.membership import is_room_member
+from utils.message_writer import message_writer
 
 @sock.route('/chat/ws')
 def chat_socket(ws):
@@ -31,10 +36,8 @@ def chat_socket(ws):
         ws.close()
         return
 
-    # Validate token (Logic from auth.token_required)
-    user = User.query.filter(
-        (User.id == token) | (User.username == token) | (User.email == token)
-    ).first()
+    # Validate token (shared with auth.token_required)
+    user = resolve_token(token)
 
     if not user or not user.is_active:
         ws.send(json.dumps({
@@ -45,16 +48,21 @@ def chat_socket(ws):
         ws.close()
         return
 
+    # Detach the user so commits made by this long-lived connection don't
+    # expire it and reload it on every message
+    if user in db.session:
+        db.session.expunge(user)
+
     # 2. Register connection
     ws_manager.connect(ws, user.id)
     
     # Send connected confirmation
     try:
-        ws.send(json.dumps({
+        ws_manager.send(ws, {
             "type": "connected",
             "message": "Connected successfully",
             "server_time": datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%SZ')
-        }))
+        })
     except:
         pass
 
@@ -87,18 +95,18 @@ def chat_socket(ws):
                     pass
                     
             except json.JSONDecodeError:
-                ws.send(json.dumps({
+                ws_manager.send(ws, {
                     "type": "error",
                     "message": "Invalid JSON format",
                     "code": 400
-                }))
+                })
             except Exception as e:
                 print(f"Error processing message: {e}")
-                ws.send(json.dumps({
+                ws_manager.send(ws, {
                     "type": "error",
                     "message": "Internal server error",
                     "code": 500
-                }))
+                })
 
     except ConnectionClosed:
         pass
@@ -113,22 +121,21 @@ def handle_subscribe(ws, user, data):
         return
 
     # Verify permission (User must be member of the group)
-    group = ProjectGroup.query.filter_by(id=room_id).first()
-    if not group or user not in group.members:
-        ws.send(json.dumps({
+    if not is_room_member(room_id, user.id):
+        ws_manager.send(ws, {
             "type": "error",
             "message": "Room not found or access denied",
             "code": 404
-        }))
+        })
         return
 
     ws_manager.subscribe(ws, room_id)
     
-    ws.send(json.dumps({
+    ws_manager.send(ws, {
         "type": "subscribed",
         "room_id": room_id,
         "message": "Successfully subscribed to room"
-    }))
+    })
 
 def handle_unsubscribe(ws, user, data):
     room_id = data.get('room_id')
@@ -137,10 +144,10 @@ def handle_unsubscribe(ws, user, data):
 
 def handle_ping(ws, data):
     timestamp = data.get('timestamp')
-    ws.send(json.dumps({
+    ws_manager.send(ws, {
         "type": "pong",
         "timestamp": timestamp
-    }))
+    })
 
 def handle_send_message(ws, user, data):
     """
@@ -157,14 +164,13 @@ def handle_send_message(ws, user, data):
     if not room_id:
         return
         
-    # Permission check
-    group = ProjectGroup.query.filter_by(id=room_id).first()
-    if not group or user not in group.members:
-        ws.send(json.dumps({
+    # Permission check (cached; a steady-state send does no SELECT)
+    if not is_room_member(room_id, user.id):
+        ws_manager.send(ws, {
             "type": "error",
             "message": "Access denied",
             "code": 403
-        }))
+        })
         return
 
     # Create message
@@ -178,38 +184,46 @@ def handle_send_message(ws, user, data):
         reply_to_id=reply_to_id
     )
     
+    # Group commit: ack as accepted now; the writer broadcasts after the batch commits
+    if message_writer.enabled:
+        message_writer.submit(ws, user, new_message)
+        ws_manager.send(ws, {
+            "type": "message_sent",
+            "message_id": new_message.id,
+            "success": True,
+            "status": "accepted",
+            "error": None
+        })
+        return
+
     try:
         db.session.add(new_message)
-        db.session.commit()
+        db.session.flush()
         
-        # Serialize
-        payload = serialize_message(new_message)
+        # Serialize before commit expires the new row; the sender is already loaded
+        payload = serialize_message(new_message, senders=[user])
+        db.session.commit()
         
         # Confirmation to sender
-        ws.send(json.dumps({
+        ws_manager.send(ws, {
             "type": "message_sent",
-            "message_id": new_message.id,
+            "message_id": payload['id'],
             "success": True,
+            "status": "committed",
             "error": None
-        }))
+        })
         
-        # Broadcast to room
-        ws_manager.broadcast_to_room(
-            room_id, 
-            {
-                "type": "new_message",
-                "payload": payload
-            }
-        )
+        # Broadcast to room (same single-encoded frame as the HTTP endpoint)
+        broadcast_new_message(room_id, payload)
         
     except Exception as e:
         db.session.rollback()
-        ws.send(json.dumps({
+        ws_manager.send(ws, {
             "type": "message_sent",
             "message_id": None,
             "success": False,
             "error": str(e)
-        }))
+        })
 
 # Re-export socketio for backward compatibility if needed, though we don't use it here
 from app import socketio
@@ -10,7 +10,7 @@ PID_FILE="server.pid"
 LOG_FILE="server.log"
 PORT=5000
 HOST="0.0.0.0"
-WORKERS=1
+WORKERS=1  # 多于1个worker时需设置 WS_BACKPLANE=unix，WebSocket广播才能到达其他worker上的连接
 WS_WORKER="gevent"
 
 # 颜色输出
@@ -60,6 +60,11 @@ start_server() {
     
     check_app_file
     
+    if [ -z "$SECRET_KEY" ]; then
+        print_message $RED "错误: 未设置环境变量 SECRET_KEY（用于签名会话token）"
+        return 1
+    fi
+    
     if is_running; then
         print_message $YELLOW "服务器已经在运行中 (PID: $(get_pid))"
         return 0
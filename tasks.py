@@ -1,26 +1,81 @@
 from flask import Blueprint, request, jsonify
 from models import db, User, ProjectGroup, Task, TaskFile, SharedFile, TaskAssignee
 from auth import token_required
+from utils.membership import is_project_member, project_member_ids
+from utils.task_hierarchy import creates_cycle, closure_add_task, closure_move_task, subtree_query
+from utils.task_counters import counter_state, apply_task_change, apply_task_changes
+from utils.response_cache import widget_cache
+from utils.conditional_get import conditional_get, collection_version
+from sqlalchemy import and_, func, or_
 from sqlalchemy.exc import IntegrityError
 from datetime import datetime
 
 tasks_bp = Blueprint('tasks', __name__, url_prefix='/tasks')
 
-def build_task_tree(tasks, parent_id=None):
-    """构建任务树结构"""
-    tree = []
+def build_task_tree(tasks, root_id=None):
+    """
+    构建任务树结构（单次遍历，非递归）
+
+    子任务按 parent_task_id 分桶，保持传入列表的顺序（position, created_at）。
+    父任务不在列表中（已删除或不属于该项目）的任务不会被丢弃，而是作为孤儿子树返回。
+    指定 root_id 时以该任务为唯一的根（tasks 为其子树）。
+
+    Returns:
+        (tree, orphans)：根任务列表与孤儿任务列表，节点的子任务位于 'children'
+    """
+    tasks = [t for t in tasks if not t.is_deleted]
+    nodes = {d['id']: d for d in Task.to_dicts(tasks)}
+    
+    children = {}
     for task in tasks:
-        if task.parent_task_id == parent_id and not task.is_deleted:
-            task_dict = task.to_dict()
-            # 递归获取子任务
-            children = build_task_tree(tasks, task.id)
-            if children:
-                task_dict['children'] = children
-            tree.append(task_dict)
-    return tree
+        children.setdefault(task.parent_task_id, []).append(task.id)
+    
+    if root_id is None:
+        root_ids = children.get(None, [])
+    else:
+        root_ids = [root_id] if root_id in nodes else []
+    tree = [nodes[task_id] for task_id in root_ids]
+    orphans = []
+    visited = set()
+    
+    def attach(root_ids):
+        stack = [task_id for task_id in root_ids if task_id not in visited]
+        visited.update(stack)
+        while stack:
+            task_id = stack.pop()
+            kids = [k for k in children.get(task_id, []) if k not in visited]
+            if kids:
+                nodes[task_id]['children'] = [nodes[k] for k in kids]
+                visited.update(kids)
+                stack.extend(kids)
+    
+    attach(root_ids)
+    # 父任务缺失的孤儿任务；其后仍未挂载的只可能是异常数据中成环的任务，同样作为孤儿返回
+    missing_parent = [t for t in tasks if t.parent_task_id is not None and t.parent_task_id not in nodes]
+    for task in missing_parent + tasks:
+        if task.id not in visited:
+            orphans.append(nodes[task.id])
+            attach([task.id])
+    return tree, orphans
+
+def _task_list_version(current_user):
+    """任务列表的版本：查询范围内未删除任务的数量与最大 updated_at（month 只筛选子集，使用整个范围的版本）"""
+    project_id = request.args.get('projectId')
+    user_id = request.args.get('userId')
+    if project_id:
+        project = db.session.get(ProjectGroup, project_id)
+        if not project or (project.leader_id != current_user.id and not is_project_member(current_user.id, project.id)):
+            return None
+        scope = Task.project_id == project_id
+    elif user_id and user_id != current_user.id:
+        return None
+    else:
+        scope = Task.user_id == current_user.id
+    return collection_version(Task.query.filter(Task.is_deleted == False, scope), Task.updated_at)
 
 @tasks_bp.route('', methods=['GET'])
 @token_required
+@conditional_get(_task_list_version)
 def get_tasks(current_user):
     """获取任务列表接口"""
     try:
@@ -33,7 +88,7 @@ def get_tasks(current_user):
             project = ProjectGroup.query.filter_by(id=project_id).first()
             if not project:
                 return jsonify({'success': False, 'message': 'Project not found'}), 404
-            if current_user not in project.members and project.leader_id != current_user.id:
+            if project.leader_id != current_user.id and not is_project_member(current_user.id, project.id):
                 return jsonify({'success': False, 'message': 'Permission denied: Not a member of this project'}), 403
             query = query.filter(Task.project_id == project_id)
         elif user_id:
@@ -58,24 +113,28 @@ def get_tasks(current_user):
                 end_str = end.strftime('%Y-%m-%d')
             except ValueError:
                 return jsonify({'success': False, 'message': 'Invalid month format'}), 400
-            # 任务在月视图内的判定：仅使用 start_date/end_date 区间
+            # 任务在月视图内的判定：仅使用 start_date/end_date 区间（缺失一端时以另一端代替）
+            # 区间重叠判定在SQL中完成。条件直接写在原始列上（分为有 start_date 和只有 end_date 两支），
+            # 两支分别在 (project_id/user_id, is_deleted, start_date, end_date) 索引上按范围查找（MULTI-INDEX OR）
+            query = query.filter(or_(
+                and_(
+                    Task.start_date < end_str,
+                    func.coalesce(Task.end_date, Task.start_date) >= start_str
+                ),
+                and_(
+                    Task.start_date.is_(None),
+                    Task.end_date >= start_str,
+                    Task.end_date < end_str
+                )
+            ))
             tasks = query.order_by(Task.created_at.desc()).all()
-            def in_month(t):
-                sd = t.start_date or t.end_date
-                ed = t.end_date or t.start_date
-                if not sd and not ed:
-                    return False
-                sd = sd or ed
-                ed = ed or sd
-                return not (ed < start_str or sd >= end_str)
-            tasks = [t for t in tasks if in_month(t)]
         else:
             tasks = query.order_by(Task.created_at.desc()).all()
         
         return jsonify({
             'success': True,
             'message': 'Tasks retrieved successfully',
-            'tasks': [task.to_dict() for task in tasks]
+            'tasks': Task.to_dicts(tasks)
         }), 200
         
     except Exception as e:
@@ -113,7 +172,7 @@ def create_task(current_user):
                     'message': 'Project not found'
                 }), 404
             
-            if current_user not in project.members and project.leader_id != current_user.id:
+            if project.leader_id != current_user.id and not is_project_member(current_user.id, project.id):
                 return jsonify({
                     'success': False,
                     'message': 'Permission denied: Not a member of this project'
@@ -132,7 +191,7 @@ def create_task(current_user):
             if parent_task.user_id != current_user.id:
                 if parent_task.project_id:
                     project = ProjectGroup.query.filter_by(id=parent_task.project_id).first()
-                    if not project or (current_user not in project.members and project.leader_id != current_user.id):
+                    if not project or (project.leader_id != current_user.id and not is_project_member(current_user.id, project.id)):
                         return jsonify({'success': False, 'message': 'Permission denied'}), 403
                 else:
                     return jsonify({'success': False, 'message': 'Permission denied'}), 403
@@ -168,7 +227,11 @@ def create_task(current_user):
         )
         
         db.session.add(new_task)
+        db.session.flush()
+        closure_add_task(new_task)
+        apply_task_change(None, counter_state(new_task))
         db.session.commit()
+        widget_cache.invalidate(user_ids=[new_task.user_id], project_ids=[new_task.project_id])
         
         return jsonify({
             'success': True,
@@ -205,7 +268,7 @@ def get_task(current_user, task_id):
         if task.user_id != current_user.id:
             if task.project_id:
                 project = ProjectGroup.query.filter_by(id=task.project_id).first()
-                if not project or (current_user not in project.members and project.leader_id != current_user.id):
+                if not project or (project.leader_id != current_user.id and not is_project_member(current_user.id, project.id)):
                     return jsonify({'success': False, 'message': 'Permission denied'}), 403
             else:
                 return jsonify({'success': False, 'message': 'Permission denied'}), 403
@@ -237,7 +300,7 @@ def update_task(current_user, task_id):
         if task.user_id != current_user.id:
             if task.project_id:
                 project = ProjectGroup.query.filter_by(id=task.project_id).first()
-                if not project or (current_user not in project.members and project.leader_id != current_user.id):
+                if not project or (project.leader_id != current_user.id and not is_project_member(current_user.id, project.id)):
                     return jsonify({'success': False, 'message': 'Permission denied'}), 403
             else:
                 return jsonify({'success': False, 'message': 'Permission denied'}), 403
@@ -249,6 +312,9 @@ def update_task(current_user, task_id):
                 'message': 'Invalid request data'
             }), 400
         
+        counted_before = counter_state(task)
+        old_project_id = task.project_id
+        
         # 更新任务字段
         if 'title' in data:
             title = data['title'].strip()
@@ -313,7 +379,7 @@ def update_task(current_user, task_id):
                         'message': 'Project not found'
                     }), 404
                 
-                if current_user not in project.members and project.leader_id != current_user.id:
+                if project.leader_id != current_user.id and not is_project_member(current_user.id, project.id):
                     return jsonify({
                         'success': False,
                         'message': 'Permission denied: Not a member of this project'
@@ -339,31 +405,29 @@ def update_task(current_user, task_id):
                         'message': 'Parent task not found'
                     }), 404
                 
-                # 检查父任务是否在任务的后代中（防止循环）
-                def is_descendant(check_task_id, ancestor_id):
-                    check_task = Task.query.filter_by(id=check_task_id, is_deleted=False).first()
-                    if not check_task or not check_task.parent_task_id:
-                        return False
-                    if check_task.parent_task_id == ancestor_id:
-                        return True
-                    return is_descendant(check_task.parent_task_id, ancestor_id)
-                
-                if is_descendant(parent_task_id, task_id):
-                    return jsonify({
-                        'success': False,
-                        'message': 'Cannot create circular reference'
-                    }), 400
-                
                 if parent.user_id != current_user.id:
                     return jsonify({
                         'success': False,
                         'message': 'Permission denied: Cannot set parent to other user\'s task'
                     }), 403
             
+            old_parent_id = task.parent_task_id
             task.parent_task_id = parent_task_id
+            # 写入后在同一事务中检查父任务链（防止循环，并发移动时由写锁串行化）
+            db.session.flush()
+            if creates_cycle(task_id, parent_task_id):
+                db.session.rollback()
+                return jsonify({
+                    'success': False,
+                    'message': 'Cannot create circular reference'
+                }), 400
+            if old_parent_id != parent_task_id:
+                closure_move_task(task_id, parent_task_id)
         
         task.updated_at = datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
+        apply_task_change(counted_before, counter_state(task))
         db.session.commit()
+        widget_cache.invalidate(user_ids=[task.user_id], project_ids=[old_project_id, task.project_id])
         
         return jsonify({
             'success': True,
@@ -403,10 +467,20 @@ def delete_task(current_user, task_id):
                 'message': 'Permission denied'
             }), 403
         
-        # 软删除：标记为已删除
-        task.is_deleted = True
-        task.updated_at = datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
+        # 软删除：任务及其全部未删除的后代一起标记为已删除（启用闭包表时子树为一次索引查询）
+        subtree = Task.query.filter(Task.id.in_(subtree_query(task.id))).all()
+        now = datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
+        changes = []
+        for item in subtree:
+            changes.append((counter_state(item), None))
+            item.is_deleted = True
+            item.updated_at = now
+        apply_task_changes(changes)
         db.session.commit()
+        widget_cache.invalidate(
+            user_ids={item.user_id for item in subtree},
+            project_ids={item.project_id for item in subtree}
+        )
         
         return jsonify({
             'success': True,
@@ -420,8 +494,16 @@ def delete_task(current_user, task_id):
             'message': f'Failed to delete task: {str(e)}'
         }), 500
 
+def _task_tree_version(current_user, group_id):
+    """任务树的版本：项目组内未删除任务的数量与最大 updated_at"""
+    project = db.session.get(ProjectGroup, group_id)
+    if not project or (project.leader_id != current_user.id and not is_project_member(current_user.id, project.id)):
+        return None
+    return collection_version(Task.query.filter(Task.project_id == group_id, Task.is_deleted == False), Task.updated_at)
+
 @tasks_bp.route('/tree/<group_id>', methods=['GET'])
 @token_required
+@conditional_get(_task_tree_version)
 def get_task_tree(current_user, group_id):
     """获取项目组的任务树接口"""
     try:
@@ -433,25 +515,36 @@ def get_task_tree(current_user, group_id):
                 'message': 'Project group not found'
             }), 404
         
-        if current_user not in project.members and project.leader_id != current_user.id:
+        if project.leader_id != current_user.id and not is_project_member(current_user.id, project.id):
             return jsonify({
                 'success': False,
                 'message': 'Permission denied: Not a member of this project'
             }), 403
         
-        # 获取该项目组的所有任务（包括所有成员的任务）
-        tasks = Task.query.filter(
+        # 获取该项目组的所有任务（包括所有成员的任务）；指定 root 时只读取该任务的子树
+        # （启用 TASK_CLOSURE_ENABLED 时为一次闭包表索引查询）
+        query = Task.query.filter(
             Task.project_id == group_id,
             Task.is_deleted == False
-        ).order_by(Task.position, Task.created_at).all()
+        )
+        root_id = request.args.get('root')
+        if root_id:
+            if not query.filter(Task.id == root_id).first():
+                return jsonify({
+                    'success': False,
+                    'message': 'Root task not found in this project'
+                }), 404
+            query = query.filter(Task.id.in_(subtree_query(root_id, include_deleted=True)))
+        tasks = query.order_by(Task.position, Task.created_at).all()
         
         # 构建任务树
-        task_tree = build_task_tree(tasks)
+        task_tree, orphans = build_task_tree(tasks, root_id=root_id or None)
         
         return jsonify({
             'success': True,
             'message': 'Task tree retrieved successfully',
-            'tree': task_tree
+            'tree': task_tree,
+            'orphans': orphans
         }), 200
         
     except Exception as e:
@@ -486,6 +579,9 @@ def move_task(current_user, task_id):
                 'message': 'Invalid request data'
             }), 400
         
+        counted_before = counter_state(task)
+        old_project_id = task.project_id
+        
         # 更新父任务
         if 'parent_task_id' in data:
             parent_task_id = data['parent_task_id']  # 可以是null
@@ -504,22 +600,18 @@ def move_task(current_user, task_id):
                         'message': 'Parent task not found'
                     }), 404
                 
-                # 检查是否会产生循环引用
-                def is_descendant(check_task_id, ancestor_id):
-                    check_task = Task.query.filter_by(id=check_task_id, is_deleted=False).first()
-                    if not check_task or not check_task.parent_task_id:
-                        return False
-                    if check_task.parent_task_id == ancestor_id:
-                        return True
-                    return is_descendant(check_task.parent_task_id, ancestor_id)
-                
-                if is_descendant(parent_task_id, task_id):
-                    return jsonify({
-                        'success': False,
-                        'message': 'Cannot create circular reference'
-                    }), 400
-            
+            old_parent_id = task.parent_task_id
             task.parent_task_id = parent_task_id
+            # 写入后在同一事务中检查父任务链（防止循环，并发移动时由写锁串行化）
+            db.session.flush()
+            if creates_cycle(task_id, parent_task_id):
+                db.session.rollback()
+                return jsonify({
+                    'success': False,
+                    'message': 'Cannot create circular reference'
+                }), 400
+            if old_parent_id != parent_task_id:
+                closure_move_task(task_id, parent_task_id)
         
         # 更新项目
         if 'project_id' in data:
@@ -532,7 +624,7 @@ def move_task(current_user, task_id):
                         'message': 'Project not found'
                     }), 404
                 
-                if current_user not in project.members and project.leader_id != current_user.id:
+                if project.leader_id != current_user.id and not is_project_member(current_user.id, project.id):
                     return jsonify({
                         'success': False,
                         'message': 'Permission denied: Not a member of this project'
@@ -546,7 +638,9 @@ def move_task(current_user, task_id):
             task.position = position
         
         task.updated_at = datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
+        apply_task_change(counted_before, counter_state(task))
         db.session.commit()
+        widget_cache.invalidate(user_ids=[task.user_id], project_ids=[old_project_id, task.project_id])
         
         return jsonify({
             'success': True,
@@ -613,7 +707,7 @@ def add_task_attachment(current_user, task_id):
             # 如果是项目文件，检查用户是否是项目组成员
             if file.group_id:
                 project = ProjectGroup.query.filter_by(id=file.group_id).first()
-                if not project or (current_user not in project.members and project.leader_id != current_user.id):
+                if not project or (project.leader_id != current_user.id and not is_project_member(current_user.id, project.id)):
                     return jsonify({
                         'success': False,
                         'message': 'Permission denied: Cannot attach file you do not have access to'
@@ -758,9 +852,10 @@ def assign_task(current_user, task_id):
         if assigned_to:
             task.assigned_to = assigned_to
         if isinstance(assignees, list):
+            member_ids = project_member_ids(project.id, assignees) if project else set()
             for uid in assignees:
                 # 必须是项目成员
-                if project and (uid not in [m.id for m in project.members] and uid != project.leader_id):
+                if project and (uid not in member_ids and uid != project.leader_id):
                     continue
                 existing = TaskAssignee.query.filter_by(task_id=task_id, user_id=uid).first()
                 if not existing:
@@ -769,6 +864,7 @@ def assign_task(current_user, task_id):
 
         task.updated_at = datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
         db.session.commit()
+        widget_cache.invalidate(user_ids=[task.user_id])
         return jsonify({'success': True, 'message': 'Task assigned', 'assigned_to': task.assigned_to, 'assignees_added': updated, 'task': task.to_dict()}), 200
     except Exception as e:
         db.session.rollback()
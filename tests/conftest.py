@@ -0,0 +1,90 @@
+"""
+测试夹具
+应用使用 TestingConfig（内存 SQLite），整个测试会话共用一个应用实例；
+每个测试结束后清空所有表和进程内缓存。
+"""
+import pytest
+from sqlalchemy import event
+from app import create_app
+from models import db
+from models.routing import recent_writers
+from utils.membership import membership_cache
+from utils.response_cache import widget_cache
+from utils.token_cache import token_cache
+
+
+@pytest.fixture(scope='session')
+def app():
+    return create_app('testing')
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture(autouse=True)
+def _reset_state(app):
+    yield
+    with app.app_context():
+        db.session.rollback()
+        # SQLite 默认不检查外键，删除顺序无关
+        for table in db.metadata.tables.values():
+            db.session.execute(table.delete())
+        db.session.commit()
+    token_cache.clear()
+    membership_cache.clear()
+    widget_cache.clear()
+    recent_writers._entries.clear()
+
+
+class QueryCounter:
+    """统计 with 块内执行的 SQL 语句数"""
+    def __init__(self, engine):
+        self.engine = engine
+        self.statements = []
+
+    def __enter__(self):
+        event.listen(self.engine, 'before_cursor_execute', self._record)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.engine, 'before_cursor_execute', self._record)
+
+    def _record(self, conn, cursor, statement, *args):
+        self.statements.append(statement)
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+
+@pytest.fixture
+def count_queries(app):
+    with app.app_context():
+        engine = db.engine
+    return lambda: QueryCounter(engine)
+
+
+@pytest.fixture
+def make_user(client):
+    """注册并登录用户，返回 (用户ID, 认证头)"""
+    def make(username):
+        client.post('/auth/register', json={'username': username, 'password': 'password', 'email': f'{username}@example.com'})
+        data = client.post('/auth/login', json={'username': username, 'password': 'password'}).get_json()
+        return data['user']['id'], {'Authorization': f"Bearer {data['token']}"}
+    return make
+
+
+@pytest.fixture
+def make_group(client):
+    """创建项目组，返回项目组ID"""
+    def make(leader_id, name='group'):
+        response = client.post('/groups/create', json={
+            'leader_id': leader_id,
+            'name': name,
+            'project_title': 'Project',
+            'due_date': '2030-01-01'
+        })
+        return response.get_json()['group']['id']
+    return make
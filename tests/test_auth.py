@@ -0,0 +1,38 @@
+"""签名token校验：用户状态缓存命中时不查询用户表，修改密码后旧token失效"""
+
+
+def _user_queries(statements):
+    return [s for s in statements if 'FROM users' in s]
+
+
+def test_signed_token_skips_user_lookup_when_cached(client, make_user, count_queries):
+    user_id, headers = make_user('alice')
+    client.get('/tasks', headers=headers)
+    with count_queries() as queries:
+        response = client.get('/tasks', headers=headers)
+    assert response.status_code == 200
+    assert _user_queries(queries.statements) == []
+
+
+def test_profile_fields_load_lazily(client, make_user):
+    user_id, headers = make_user('alice')
+    client.get('/tasks', headers=headers)
+    response = client.get('/user/profile', headers=headers)
+    assert response.status_code == 200
+    assert response.get_json()['user']['username'] == 'alice'
+
+
+def test_change_password_revokes_old_token(client, make_user):
+    user_id, headers = make_user('alice')
+    assert client.get('/tasks', headers=headers).status_code == 200
+    response = client.post('/auth/change-password', json={'old_password': 'password', 'new_password': 'secret2'}, headers=headers)
+    assert response.status_code == 200
+    new_headers = {'Authorization': f"Bearer {response.get_json()['token']}"}
+    assert client.get('/tasks', headers=headers).status_code == 401
+    assert client.get('/tasks', headers=new_headers).status_code == 200
+
+
+def test_forged_token_is_rejected(client, make_user):
+    user_id, headers = make_user('alice')
+    forged = headers['Authorization'][:-2] + ('AA' if not headers['Authorization'].endswith('AA') else 'BB')
+    assert client.get('/tasks', headers={'Authorization': forged}).status_code == 401
@@ -0,0 +1,56 @@
+"""聊天历史消息游标分页：before 为不透明游标，before_id 为消息ID"""
+import base64
+import pytest
+from models import db, GroupMessage
+
+
+@pytest.fixture
+def room(app, make_user, make_group):
+    """5 条同一秒发送的消息，返回 (认证头, 聊天室ID, 按 (sent_at, id) 倒序的消息ID)"""
+    user_id, headers = make_user('alice')
+    group_id = make_group(user_id)
+    ids = [f'msg{i:013d}' for i in range(5)]
+    with app.app_context():
+        db.session.execute(GroupMessage.__table__.insert(), [
+            {'id': message_id, 'group_id': group_id, 'sender_id': user_id, 'content': message_id,
+             'message_type': 'text', 'sent_at': '2025-01-01 12:00:00', 'is_deleted': False}
+            for message_id in ids
+        ])
+        db.session.commit()
+    return headers, group_id, ids[::-1]
+
+
+def _page(client, headers, group_id, **params):
+    return client.get(f'/chat/rooms/{group_id}/messages', query_string=params, headers=headers)
+
+
+def test_cursor_pages_through_messages_in_same_second(client, room):
+    headers, group_id, ids = room
+    seen, cursor = [], None
+    while True:
+        params = {'limit': 2, 'before': cursor} if cursor else {'limit': 2}
+        data = _page(client, headers, group_id, **params).get_json()
+        seen += [message['id'] for message in data['messages']]
+        cursor = data['next_cursor']
+        if not data['has_more']:
+            break
+    assert seen == ids
+
+
+def test_before_id_starts_after_message(client, room):
+    headers, group_id, ids = room
+    response = _page(client, headers, group_id, before_id=ids[1], limit=10)
+    assert [message['id'] for message in response.get_json()['messages']] == ids[2:]
+    assert _page(client, headers, group_id, before_id='missing').status_code == 404
+
+
+@pytest.mark.parametrize('cursor', [
+    'not-a-cursor',
+    base64.urlsafe_b64encode(b'yesterday|msg0000000000001').decode(),
+    base64.urlsafe_b64encode(b'2025-01-01 12:00:00|').decode(),
+])
+def test_invalid_cursor_is_rejected(client, room, cursor):
+    headers, group_id, ids = room
+    # 消息ID不再被当作游标
+    assert _page(client, headers, group_id, before=ids[0]).status_code == 400
+    assert _page(client, headers, group_id, before=cursor).status_code == 400
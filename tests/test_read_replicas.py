@@ -0,0 +1,103 @@
+"""读写分离路由：主库与只读副本各为一个临时 SQLite 文件，副本是主库的快照，之后只在主库上写入"""
+import sqlite3
+import pytest
+from app import create_app
+from config import TestingConfig, config
+from models import db, Task
+from models.routing import READ_YOUR_WRITES_COOKIE, recent_writers, use_primary
+
+
+@pytest.fixture
+def replica_app(tmp_path):
+    primary, replica = tmp_path / 'primary.db', tmp_path / 'replica.db'
+
+    class ReplicaTestingConfig(TestingConfig):
+        SQLALCHEMY_DATABASE_URI = f'sqlite:///{primary}'
+        SQLALCHEMY_READ_BINDS = [f'sqlite:///{replica}']
+
+    config['replica-testing'] = ReplicaTestingConfig
+    try:
+        app = create_app('replica-testing')
+    finally:
+        del config['replica-testing']
+    yield app
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose()
+
+
+def _snapshot(app):
+    """把主库当前内容复制到副本"""
+    with app.app_context():
+        primary = sqlite3.connect(db.engine.url.database)
+        replica = sqlite3.connect(db.engines['read_replica_0'].url.database)
+        try:
+            primary.backup(replica)
+        finally:
+            primary.close()
+            replica.close()
+
+
+def _rename_on_primary(app, task_id, title):
+    with app.app_context():
+        db.session.get(Task, task_id).title = title
+        db.session.commit()
+
+
+@pytest.fixture
+def seeded(replica_app):
+    """注册用户并创建一个任务后生成副本快照，再只在主库上改名，返回 (app, 认证头, 任务ID)"""
+    client = replica_app.test_client()
+    client.post('/auth/register', json={'username': 'alice', 'password': 'password', 'email': 'alice@example.com'})
+    token = client.post('/auth/login', json={'username': 'alice', 'password': 'password'}).get_json()['token']
+    headers = {'Authorization': f'Bearer {token}'}
+    task_id = client.post('/tasks', json={'title': 'replica'}, headers=headers).get_json()['task']['id']
+    _snapshot(replica_app)
+    _rename_on_primary(replica_app, task_id, 'primary')
+    recent_writers._entries.clear()
+    return replica_app, headers, task_id
+
+
+def _titles(client, headers):
+    return [task['title'] for task in client.get('/tasks', headers=headers).get_json()['tasks']]
+
+
+def test_reads_go_to_replica(seeded):
+    app, headers, _ = seeded
+    assert _titles(app.test_client(), headers) == ['replica']
+
+
+def test_writes_go_to_primary(seeded):
+    app, headers, _ = seeded
+    client = app.test_client()
+    response = client.post('/tasks', json={'title': 'new'}, headers=headers)
+    assert response.status_code == 201
+    task_id = response.get_json()['task']['id']
+    with app.app_context():
+        with sqlite3.connect(db.engines['read_replica_0'].url.database) as replica:
+            assert replica.execute('SELECT 1 FROM tasks WHERE id = ?', (task_id,)).fetchone() is None
+        with sqlite3.connect(db.engine.url.database) as primary:
+            assert primary.execute('SELECT title FROM tasks WHERE id = ?', (task_id,)).fetchone() == ('new',)
+
+
+def test_read_your_writes_uses_primary(seeded):
+    app, headers, task_id = seeded
+    client = app.test_client()
+    response = client.put(f'/tasks/{task_id}', json={'description': 'edited'}, headers=headers)
+    assert READ_YOUR_WRITES_COOKIE in response.headers.get('Set-Cookie', '')
+    # 同一客户端带 rw_until cookie：走主库
+    assert _titles(client, headers) == ['primary']
+    # 不保存 cookie 的客户端：按用户ID在本进程内记录，同样走主库
+    assert _titles(app.test_client(), headers) == ['primary']
+    # 记录过期后恢复读副本
+    recent_writers._entries.clear()
+    assert _titles(app.test_client(), headers) == ['replica']
+
+
+def test_use_primary_overrides_routing(seeded):
+    app, _, task_id = seeded
+    with app.test_request_context('/tasks', method='GET'):
+        assert db.session.get(Task, task_id).title == 'replica'
+        db.session.expunge_all()
+        with use_primary(db.session):
+            assert db.session.get(Task, task_id).title == 'primary'
@@ -0,0 +1,140 @@
+"""更新/移动任务时的循环引用检查（递归 CTE 与闭包表两种实现）"""
+import pytest
+from models import db, Task
+from utils.task_counters import SCOPE_PROJECT, reconcile_counters, task_counts
+from utils.task_hierarchy import rebuild_closure
+
+CHAIN_LENGTH = 1000
+
+
+@pytest.fixture
+def chain(app, make_user, make_group):
+    """一条 1000 层的父子任务链，返回 (认证头, 任务ID列表（从根到叶）)"""
+    user_id, headers = make_user('alice')
+    group_id = make_group(user_id)
+    ids = [f'chain{i:011d}' for i in range(CHAIN_LENGTH)]
+    with app.app_context():
+        db.session.execute(Task.__table__.insert(), [
+            {'id': task_id, 'user_id': user_id, 'title': task_id, 'project_id': group_id,
+             'parent_task_id': ids[i - 1] if i else None, 'is_deleted': False}
+            for i, task_id in enumerate(ids)
+        ])
+        db.session.commit()
+    return headers, ids
+
+
+@pytest.fixture
+def closure(app):
+    """启用闭包表并按当前数据回填"""
+    app.config['TASK_CLOSURE_ENABLED'] = True
+    with app.app_context():
+        rebuild_closure()
+    yield
+    app.config['TASK_CLOSURE_ENABLED'] = False
+
+
+def test_move_root_under_leaf_is_rejected(client, count_queries, chain):
+    headers, ids = chain
+    with count_queries() as queries:
+        response = client.put(f'/tasks/{ids[0]}/move', json={'parent_task_id': ids[-1]}, headers=headers)
+    assert response.status_code == 400
+    assert 'circular' in response.get_json()['message'].lower()
+    # 祖先链只用一条查询判断，与层数无关
+    assert queries.count < 10
+
+
+def test_update_parent_to_descendant_is_rejected(client, chain):
+    headers, ids = chain
+    response = client.put(f'/tasks/{ids[0]}', json={'parent_task_id': ids[CHAIN_LENGTH // 2]}, headers=headers)
+    assert response.status_code == 400
+
+
+def test_self_parent_is_rejected(client, chain):
+    headers, ids = chain
+    response = client.put(f'/tasks/{ids[10]}', json={'parent_task_id': ids[10]}, headers=headers)
+    assert response.status_code == 400
+
+
+def test_valid_moves_are_accepted(app, client, chain):
+    headers, ids = chain
+    response = client.put(f'/tasks/{ids[-1]}', json={'parent_task_id': ids[0]}, headers=headers)
+    assert response.status_code == 200
+    response = client.put(f'/tasks/{ids[-1]}/move', json={'parent_task_id': None}, headers=headers)
+    assert response.status_code == 200
+    assert response.get_json()['task']['parent_task_id'] is None
+    # 移到根级后，原来的根可以挂到它下面
+    response = client.put(f'/tasks/{ids[0]}/move', json={'parent_task_id': ids[-1]}, headers=headers)
+    assert response.status_code == 200
+    with app.app_context():
+        assert db.session.get(Task, ids[0]).parent_task_id == ids[-1]
+
+
+def test_cycle_check_terminates_on_cyclic_data(app, client, chain):
+    """异常数据中已经存在环时，检查仍然能结束"""
+    headers, ids = chain
+    with app.app_context():
+        db.session.get(Task, ids[0]).parent_task_id = ids[-1]
+        db.session.commit()
+    response = client.put(f'/tasks/{ids[5]}', json={'parent_task_id': ids[3]}, headers=headers)
+    assert response.status_code == 400
+    with app.app_context():
+        assert db.session.get(Task, ids[5]).parent_task_id == ids[4]
+
+
+@pytest.mark.parametrize('use_closure', [False, True])
+def test_cycle_check_walks_through_deleted_tasks(app, client, chain, use_closure):
+    """父任务链中间的任务已软删除时，两种实现都沿原始父任务链判断"""
+    headers, ids = chain
+    with app.app_context():
+        db.session.get(Task, ids[CHAIN_LENGTH // 2]).is_deleted = True
+        db.session.commit()
+    if use_closure:
+        app.config['TASK_CLOSURE_ENABLED'] = True
+        with app.app_context():
+            rebuild_closure()
+    try:
+        response = client.put(f'/tasks/{ids[0]}/move', json={'parent_task_id': ids[-1]}, headers=headers)
+    finally:
+        app.config['TASK_CLOSURE_ENABLED'] = False
+    assert response.status_code == 400
+    with app.app_context():
+        assert db.session.get(Task, ids[0]).parent_task_id is None
+
+
+def test_closure_table_rejects_cycles(app, client, count_queries, chain, closure):
+    headers, ids = chain
+    with count_queries() as queries:
+        response = client.put(f'/tasks/{ids[0]}/move', json={'parent_task_id': ids[-1]}, headers=headers)
+    assert response.status_code == 400
+    assert queries.count < 10
+    response = client.put(f'/tasks/{ids[0]}', json={'parent_task_id': ids[CHAIN_LENGTH // 2]}, headers=headers)
+    assert response.status_code == 400
+    # 闭包表随合法移动一起维护
+    response = client.put(f'/tasks/{ids[-1]}/move', json={'parent_task_id': None}, headers=headers)
+    assert response.status_code == 200
+    response = client.put(f'/tasks/{ids[0]}/move', json={'parent_task_id': ids[-1]}, headers=headers)
+    assert response.status_code == 200
+
+
+@pytest.mark.parametrize('use_closure', [False, True])
+def test_delete_cascades_to_subtree(app, client, chain, use_closure):
+    """删除任务时其全部后代一起软删除，计数随之更新"""
+    headers, ids = chain
+    with app.app_context():
+        reconcile_counters()
+    if use_closure:
+        app.config['TASK_CLOSURE_ENABLED'] = True
+        with app.app_context():
+            rebuild_closure()
+    try:
+        response = client.delete(f'/tasks/{ids[CHAIN_LENGTH // 2]}', headers=headers)
+    finally:
+        app.config['TASK_CLOSURE_ENABLED'] = False
+    assert response.status_code == 200
+    with app.app_context():
+        deleted = {task_id for (task_id,) in db.session.query(Task.id).filter(Task.is_deleted == True)}
+        assert deleted == set(ids[CHAIN_LENGTH // 2:])
+        group_id = db.session.get(Task, ids[0]).project_id
+        assert sum(task_counts(SCOPE_PROJECT, group_id).values()) == CHAIN_LENGTH // 2
+    response = client.get(f'/tasks/{ids[-1]}', headers=headers)
+    assert response.status_code == 404
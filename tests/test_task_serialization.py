@@ -0,0 +1,35 @@
+"""Task.to_dicts 批量加载负责人，列表接口查询数不随任务数增长"""
+import pytest
+from models import Task
+
+
+def _create_assigned_tasks(client, headers, user_id, group_id, n):
+    for i in range(n):
+        task_id = client.post('/tasks', json={'title': f'task {i}', 'project_id': group_id}, headers=headers).get_json()['task']['id']
+        client.post(f'/tasks/{task_id}/assign', json={'assignees': [user_id]}, headers=headers)
+
+
+@pytest.mark.parametrize('path', ['/tasks?projectId={group_id}', '/tasks/tree/{group_id}', '/user/tasks'])
+def test_task_list_query_count_is_constant(client, make_user, make_group, count_queries, path):
+    user_id, headers = make_user('alice')
+    group_id = make_group(user_id)
+    url = path.format(group_id=group_id)
+
+    counts = []
+    for n in (5, 50):
+        _create_assigned_tasks(client, headers, user_id, group_id, n)
+        with count_queries() as queries:
+            response = client.get(url, headers=headers)
+        assert response.status_code == 200
+        counts.append(queries.count)
+    assert counts[0] == counts[1]
+
+
+def test_to_dicts_matches_to_dict(app, client, make_user, make_group):
+    user_id, headers = make_user('alice')
+    group_id = make_group(user_id)
+    _create_assigned_tasks(client, headers, user_id, group_id, 10)
+    with app.app_context():
+        tasks = Task.query.all()
+        assert Task.to_dicts(tasks) == [task.to_dict() for task in tasks]
+        assert all(d['assignees'] for d in Task.to_dicts(tasks))
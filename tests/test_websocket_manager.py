@@ -0,0 +1,121 @@
+"""ConnectionManager 连接/订阅簿记：高并发连接抖动后不残留状态，断开只触及已加入的房间"""
+import random
+import threading
+from utils.websocket_manager import ConnectionManager
+
+CHURN_THREADS = 8
+CHURN_PER_THREAD = 1250
+ROOMS = [f'room-{i}' for i in range(5000)]
+
+
+class FakeWS:
+    def __init__(self):
+        self.frames = []
+
+    def send(self, frame):
+        self.frames.append(frame)
+
+    def close(self):
+        pass
+
+
+def _assert_empty(manager):
+    assert manager.active_connections == {}
+    assert manager.user_connections == {}
+    assert manager.connection_rooms == {}
+    assert manager.outboxes == {}
+    assert manager.room_subscriptions == {}
+    assert manager.stats()['connections'] == 0
+
+
+def test_connection_churn_leaves_no_state():
+    """10k 个连接在多个线程中并发连接、订阅、广播、退订、断开"""
+    manager = ConnectionManager()
+    errors = []
+
+    def churn(worker):
+        rng = random.Random(worker)
+        try:
+            for i in range(CHURN_PER_THREAD):
+                ws = FakeWS()
+                manager.connect(ws, f'user-{worker}-{i % 50}')
+                joined = rng.sample(ROOMS, 3)
+                for room_id in joined:
+                    assert manager.subscribe(ws, room_id)
+                manager.broadcast_to_room(rng.choice(joined), {'type': 'ping'})
+                if i % 2:
+                    manager.unsubscribe(ws, joined[0])
+                manager.disconnect(ws)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=churn, args=(k,)) for k in range(CHURN_THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    _assert_empty(manager)
+
+
+def test_subscribe_racing_disconnect_leaves_no_state():
+    manager = ConnectionManager()
+    sockets = [FakeWS() for _ in range(2000)]
+    for i, ws in enumerate(sockets):
+        manager.connect(ws, f'user-{i}')
+
+    def subscribe_all():
+        for ws in sockets:
+            manager.subscribe(ws, 'shared')
+
+    def disconnect_all():
+        for ws in sockets:
+            manager.disconnect(ws)
+
+    threads = [threading.Thread(target=subscribe_all), threading.Thread(target=disconnect_all)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    _assert_empty(manager)
+    assert manager.subscribe(sockets[0], 'shared') is False
+
+
+def test_disconnect_touches_only_joined_rooms(monkeypatch):
+    manager = ConnectionManager()
+    for i, room_id in enumerate(ROOMS):
+        other = FakeWS()
+        manager.connect(other, f'other-{i}')
+        manager.subscribe(other, room_id)
+
+    ws = FakeWS()
+    manager.connect(ws, 'alice')
+    for room_id in ROOMS[:3]:
+        manager.subscribe(ws, room_id)
+
+    touched = []
+    original = manager._remove_from_room
+    monkeypatch.setattr(manager, '_remove_from_room', lambda w, room_id: (touched.append(room_id), original(w, room_id)))
+    manager.disconnect(ws)
+
+    assert sorted(touched) == sorted(ROOMS[:3])
+    assert all(ws not in manager.room_connections(room_id) for room_id in ROOMS[:3])
+    assert len(manager.room_subscriptions) == len(ROOMS)
+
+
+def test_broadcast_does_not_take_connection_lock():
+    """房间广播只持有房间分段锁，连接锁被占用时也能完成"""
+    manager = ConnectionManager()
+    ws = FakeWS()
+    manager.connect(ws, 'alice')
+    manager.subscribe(ws, 'room')
+    result = []
+    with manager.lock:
+        thread = threading.Thread(target=lambda: result.append(manager.broadcast_to_room('room', {'type': 'ping'})))
+        thread.start()
+        thread.join(timeout=5)
+        assert not thread.is_alive()
+    assert result == [1]
+    manager.disconnect(ws)
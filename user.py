@@ -1,6 +1,8 @@
 from flask import Blueprint, request, jsonify, current_app
 from models import db, User, Task, SharedFile, UserSettings
-from auth import token_required
+from auth import token_required, issue_token
+from utils.token_cache import token_cache
+from utils.response_cache import widget_cache
 from sqlalchemy.exc import IntegrityError
 from werkzeug.utils import secure_filename
 import os
@@ -77,18 +79,27 @@ def update_profile(current_user):
                 current_user.email = new_email
         
         # 更新密码（如果提供）
+        password_changed = False
         if 'password' in data:
             new_password = data['password']
             if new_password:
                 current_user.set_password(new_password)
+                # 递增token版本，吊销此前签发的所有token
+                current_user.token_version = (current_user.token_version or 0) + 1
+                password_changed = True
         
         db.session.commit()
+        # 用户名/邮箱/密码变更后，旧的 token 解析结果失效
+        token_cache.invalidate_user(current_user.id)
         
-        return jsonify({
+        response = {
             'success': True,
             'message': 'Profile updated successfully',
             'user': current_user.to_dict()
-        }), 200
+        }
+        if password_changed:
+            response['token'] = issue_token(current_user)
+        return jsonify(response), 200
         
     except IntegrityError:
         db.session.rollback()
@@ -134,7 +145,7 @@ def get_my_tasks(current_user):
         return jsonify({
             'success': True,
             'message': 'Tasks retrieved successfully',
-            'tasks': [t.to_dict() for t in tasks]
+            'tasks': Task.to_dicts(tasks)
         }), 200
     except Exception as e:
         return jsonify({
@@ -211,6 +222,7 @@ def upload_avatar(current_user):
         current_user.avatar_url = f"/files/{new_file.id}/preview"
 
         db.session.commit()
+        widget_cache.invalidate(user_ids=[current_user.id])
 
         return jsonify({
             'success': True,
@@ -237,6 +249,7 @@ def delete_avatar(current_user):
         current_user.avatar_file_id = None
         current_user.avatar_url = None
         db.session.commit()
+        widget_cache.invalidate(user_ids=[current_user.id])
 
         return jsonify({'success': True, 'message': 'Avatar deleted successfully', 'avatar_url': None}), 200
     except Exception as e:
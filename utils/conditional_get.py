@@ -0,0 +1,71 @@
+"""
+条件请求模块（ETag / If-None-Match / Last-Modified）
+列表接口用 @conditional_get(version_func) 装饰（放在 @token_required 下方）。
+version_func(current_user, **view_kwargs) 用一次聚合查询计算集合的版本（例如行数 + 最大 updated_at），
+不加载、不序列化任何行；客户端携带的 If-None-Match 与版本一致时直接返回 304，否则执行原接口并附上验证器。
+
+- version_func 返回 (token, last_modified)；无法判断（资源不存在、无权限、参数异常）时返回 None，
+  交给原接口按原逻辑返回 404/403/400
+- ETag 由当前用户、请求路径、查询参数和 token 生成（弱 ETag），其他用户携带同一 ETag 不会得到 304；只按 ETag 判断是否返回 304：
+  移出集合的行不会改变剩余行的最大 updated_at，仅凭 If-Modified-Since 无法发现
+- updated_at 精确到秒：最新修改发生在当前这一秒内时不返回验证器，避免同一秒内的后续修改被 304 掩盖
+"""
+from datetime import datetime
+from functools import wraps
+import hashlib
+from flask import current_app, request
+from sqlalchemy import func
+
+
+def collection_version(query, *updated_columns):
+    """
+    集合的版本：(行数, 各列的最大更新时间...)，一次聚合查询
+    传入多个时间列时（例如行自身与关联行的 updated_at），Last-Modified 取其中最新的一个
+    """
+    row = tuple(query.with_entities(
+        func.count(), *(func.max(column) for column in updated_columns)
+    ).order_by(None).one())
+    return row, max(filter(None, row[1:]), default=None)
+
+
+def _parse_timestamp(value):
+    try:
+        return datetime.strptime(value, '%Y-%m-%d %H:%M:%S') if value else None
+    except (TypeError, ValueError):
+        return None
+
+
+def conditional_get(version_func):
+    """为 GET 列表接口增加 ETag/Last-Modified 验证器，版本未变化时返回 304"""
+    def decorator(view):
+        @wraps(view)
+        def decorated(*args, current_user, **kwargs):
+            version = None
+            if request.method == 'GET':
+                try:
+                    version = version_func(current_user, **kwargs)
+                except Exception as e:
+                    current_app.logger.warning(f'计算资源版本失败，按普通请求处理: {str(e)}')
+            if version is None:
+                return view(*args, current_user=current_user, **kwargs)
+
+            token, last_modified = version
+            last_modified = _parse_timestamp(last_modified)
+            if last_modified and last_modified >= datetime.utcnow().replace(microsecond=0):
+                return view(*args, current_user=current_user, **kwargs)
+
+            etag = hashlib.sha1(f'{current_user.id}|{request.full_path}|{token!r}'.encode('utf-8')).hexdigest()
+            if request.if_none_match.contains_weak(etag):
+                response = current_app.response_class(status=304)
+            else:
+                response = current_app.make_response(view(*args, current_user=current_user, **kwargs))
+                if response.status_code != 200:
+                    return response
+            response.set_etag(etag, weak=True)
+            if last_modified:
+                response.last_modified = last_modified
+            response.cache_control.private = True
+            response.cache_control.no_cache = True
+            return response
+        return decorated
+    return decorator
@@ -0,0 +1,162 @@
+"""
+成员关系模块
+- is_project_member: HTTP 接口的项目组成员检查，对 user_groups 主键做一次 EXISTS 查询，
+  结果在当前请求内复用（替代遍历 lazy='dynamic' 的 members 关系）
+- 聊天室成员关系缓存：缓存 (room_id, user_id) 的成员关系（仅缓存"是成员"的结果，LRU + TTL），
+  WebSocket 订阅和发送消息时的权限检查在稳定状态下无需查询数据库。
+
+成员关系变化时需要失效缓存：加入项目组时写入，删除项目组时按房间失效；
+以后新增移除成员的接口时需调用 membership_cache.invalidate。
+多进程部署时其他进程的缓存最多在 TTL 内保持旧结果。
+"""
+from collections import OrderedDict
+from threading import Lock
+import time
+from flask import g, has_app_context
+from sqlalchemy import select, exists
+from models import db, user_groups
+
+
+class MembershipCache:
+    """进程内成员关系缓存"""
+    def __init__(self, max_size=50000, ttl=300):
+        self.max_size = max_size
+        self.ttl = ttl
+        # {(room_id, user_id): expires_at}，按最近使用排序
+        self._entries = OrderedDict()
+        # {room_id: {user_id, ...}}，用于按房间失效
+        self._room_users = {}
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def configure(self, max_size=None, ttl=None):
+        """根据应用配置调整容量和过期时间"""
+        with self._lock:
+            if max_size is not None:
+                self.max_size = max_size
+            if ttl is not None:
+                self.ttl = ttl
+            while len(self._entries) > self.max_size:
+                self._remove(next(iter(self._entries)))
+
+    def contains(self, room_id, user_id):
+        """缓存中是否有未过期的成员关系"""
+        key = (room_id, user_id)
+        with self._lock:
+            expires_at = self._entries.get(key)
+            if expires_at is None or expires_at <= time.monotonic():
+                if expires_at is not None:
+                    self._remove(key)
+                self.misses += 1
+                return False
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return True
+
+    def add(self, room_id, user_id):
+        """记录成员关系（数据库确认或刚加入后调用）"""
+        if self.max_size <= 0:
+            return
+        key = (room_id, user_id)
+        with self._lock:
+            self._entries[key] = time.monotonic() + self.ttl
+            self._entries.move_to_end(key)
+            self._room_users.setdefault(room_id, set()).add(user_id)
+            while len(self._entries) > self.max_size:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate(self, room_id, user_id):
+        """移除单个成员关系（成员离开或被移除时调用）"""
+        with self._lock:
+            self._remove((room_id, user_id))
+
+    def invalidate_room(self, room_id):
+        """移除某个房间的全部成员关系（项目组删除时调用）"""
+        with self._lock:
+            for user_id in self._room_users.pop(room_id, set()):
+                self._entries.pop((room_id, user_id), None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._room_users.clear()
+
+    def stats(self):
+        """命中统计"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / total, 4) if total else 0.0
+            }
+
+    def _remove(self, key):
+        if self._entries.pop(key, None) is None:
+            return
+        users = self._room_users.get(key[0])
+        if users is not None:
+            users.discard(key[1])
+            if not users:
+                del self._room_users[key[0]]
+
+
+# Global instance
+membership_cache = MembershipCache()
+
+
+def _member_exists(project_id, user_id):
+    """对 user_groups 的 (user_id, group_id) 主键做一次 EXISTS 查询"""
+    return bool(db.session.execute(
+        select(exists().where(
+            user_groups.c.group_id == project_id,
+            user_groups.c.user_id == user_id
+        ))
+    ).scalar())
+
+
+def is_project_member(user_id, project_id):
+    """
+    用户是否为项目组成员（不含负责人判断，负责人检查由调用方在前面完成）
+    同一请求内对相同 (user_id, project_id) 只查询一次
+    """
+    if not user_id or not project_id:
+        return False
+    if not has_app_context():
+        return _member_exists(project_id, user_id)
+    memo = g.setdefault('_project_membership', {})
+    key = (project_id, user_id)
+    if key not in memo:
+        memo[key] = _member_exists(project_id, user_id)
+    return memo[key]
+
+
+def project_member_ids(project_id, user_ids):
+    """返回 user_ids 中属于项目组成员的用户ID集合（一次查询）"""
+    user_ids = [uid for uid in set(user_ids) if uid]
+    if not project_id or not user_ids:
+        return set()
+    rows = db.session.execute(
+        select(user_groups.c.user_id).where(
+            user_groups.c.group_id == project_id,
+            user_groups.c.user_id.in_(user_ids)
+        )
+    )
+    return {row[0] for row in rows}
+
+
+def is_room_member(room_id, user_id):
+    """
+    用户是否为聊天室（项目组）成员
+    先查缓存，未命中时对 user_groups 做一次主键 EXISTS 查询，确认是成员后写入缓存
+    """
+    if membership_cache.contains(room_id, user_id):
+        return True
+    found = _member_exists(room_id, user_id)
+    if found:
+        membership_cache.add(room_id, user_id)
+    return found
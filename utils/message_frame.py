@@ -0,0 +1,70 @@
+"""
+消息帧模块
+广播消息只编码一次，编码结果在所有订阅连接、进程间转发以及 flask-sock / Socket.IO
+两种传输之间复用。安装了 orjson 时使用 orjson 编码。
+"""
+import json
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    orjson = None
+    ORJSON_AVAILABLE = False
+
+
+def encode_json(obj):
+    """紧凑JSON编码（返回str）"""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(obj).decode('utf-8')
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':'))
+
+
+class MessageFrame:
+    """
+    已编码的消息帧
+
+    首次访问 text 时编码并缓存，之后所有发送都复用同一个字符串。
+    """
+    __slots__ = ('message', '_text')
+
+    def __init__(self, message):
+        self.message = message
+        self._text = None
+
+    @classmethod
+    def of(cls, message):
+        """dict 包装为帧，已经是帧的直接返回"""
+        return message if isinstance(message, cls) else cls(message)
+
+    @property
+    def text(self):
+        if self._text is None:
+            self._text = encode_json(self.message)
+        return self._text
+
+
+class FrameJSON:
+    """
+    供 Socket.IO 使用的 json 模块（SocketIO(json=frame_json)）
+
+    数据包中的 MessageFrame 直接拼接其已编码文本，不再重新编码；
+    其他数据按标准 json 处理。
+    """
+    @staticmethod
+    def dumps(obj, *args, **kwargs):
+        if isinstance(obj, MessageFrame):
+            return obj.text
+        if isinstance(obj, list) and any(isinstance(item, MessageFrame) for item in obj):
+            return '[' + ','.join(
+                item.text if isinstance(item, MessageFrame) else json.dumps(item, *args, **kwargs)
+                for item in obj
+            ) + ']'
+        return json.dumps(obj, *args, **kwargs)
+
+    @staticmethod
+    def loads(*args, **kwargs):
+        return json.loads(*args, **kwargs)
+
+
+frame_json = FrameJSON()
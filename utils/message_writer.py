@@ -0,0 +1,185 @@
+"""
+聊天消息批量写入模块（group commit）
+
+CHAT_WRITE_MODE=batched 时，WebSocket 发送的消息先回复 "accepted"，进入队列，
+由后台写线程每 CHAT_BATCH_MAX_DELAY_MS 毫秒或攒满 CHAT_BATCH_MAX_SIZE 条时
+在一个事务中提交，提交成功后再广播。每批只产生一次提交（SQLite 上即一次 fsync）。
+
+延迟/持久性取舍：已 accepted 但尚未提交的消息在进程崩溃时会丢失，
+等待时间越长批次越大、吞吐越高，丢失窗口也越大。默认 sync 模式保持逐条提交。
+"""
+from collections import deque
+from threading import Condition, Lock, Thread
+import atexit
+import os
+import time
+from models import db
+from utils.serializers import serialize_messages
+from utils.websocket_manager import ws_manager
+
+WRITE_MODE_SYNC = 'sync'
+WRITE_MODE_BATCHED = 'batched'
+
+
+class _PendingMessage:
+    __slots__ = ('ws', 'sender', 'message')
+
+    def __init__(self, ws, sender, message):
+        self.ws = ws
+        self.sender = sender
+        self.message = message
+
+
+class MessageWriter:
+    """后台批量提交聊天消息，提交后广播"""
+    def __init__(self, max_batch_size=100, max_delay_ms=5):
+        self.mode = WRITE_MODE_SYNC
+        self.max_batch_size = max_batch_size
+        self.max_delay_ms = max_delay_ms
+        self.app = None
+        self._queue = deque()
+        self._cond = Condition(Lock())
+        self._pid = None
+        self._stats = {'accepted': 0, 'batches': 0, 'committed': 0, 'failed': 0}
+
+    def configure(self, app):
+        """根据应用配置设置写入模式和批次参数"""
+        mode = (app.config.get('CHAT_WRITE_MODE') or WRITE_MODE_SYNC).lower()
+        if mode not in (WRITE_MODE_SYNC, WRITE_MODE_BATCHED):
+            raise ValueError(f"Unknown chat write mode: {mode}")
+        self.mode = mode
+        self.max_batch_size = max(1, int(app.config.get('CHAT_BATCH_MAX_SIZE', self.max_batch_size)))
+        self.max_delay_ms = max(0, int(app.config.get('CHAT_BATCH_MAX_DELAY_MS', self.max_delay_ms)))
+        self.app = app
+
+    @property
+    def enabled(self):
+        return self.mode == WRITE_MODE_BATCHED and self.app is not None
+
+    def submit(self, ws, sender, message):
+        """
+        将消息加入写入队列（调用方随后回复 accepted）
+
+        Args:
+            ws: 发送者连接，写入失败时通知
+            sender: 已加载的发送者 User 对象
+            message: 未加入会话的 GroupMessage 对象（ID 已生成）
+        """
+        self._ensure_started()
+        with self._cond:
+            self._queue.append(_PendingMessage(ws, sender, message))
+            self._stats['accepted'] += 1
+            self._cond.notify()
+
+    def flush(self, timeout=5.0):
+        """等待队列中的消息写完（进程退出时调用）"""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            with self._cond:
+                if not self._queue:
+                    return True
+            time.sleep(0.01)
+        return False
+
+    def stats(self):
+        with self._cond:
+            stats = dict(self._stats)
+            stats['queued'] = len(self._queue)
+        stats.update({
+            'mode': self.mode,
+            'max_batch_size': self.max_batch_size,
+            'max_delay_ms': self.max_delay_ms,
+            'avg_batch_size': round(stats['committed'] / stats['batches'], 2) if stats['batches'] else 0.0
+        })
+        return stats
+
+    def _ensure_started(self):
+        # 每个进程各自启动写线程（gunicorn fork 之后）
+        if self._pid == os.getpid():
+            return
+        with self._cond:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            Thread(target=self._run, name='chat-writer', daemon=True).start()
+            atexit.register(self.flush)
+
+    def _next_batch(self):
+        with self._cond:
+            while not self._queue:
+                self._cond.wait()
+            deadline = time.monotonic() + self.max_delay_ms / 1000.0
+            while len(self._queue) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            count = min(self.max_batch_size, len(self._queue))
+            return [self._queue.popleft() for _ in range(count)]
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            try:
+                with self.app.app_context():
+                    committed = self._write(batch)
+                    self._broadcast(committed)
+            except Exception as e:
+                print(f"Chat writer error: {e}")
+
+    def _write(self, batch):
+        """整批一个事务提交；失败时逐条重试，只丢弃出错的消息"""
+        try:
+            payloads = self._commit(batch)
+            self._count(batches=1, committed=len(batch))
+            return list(zip(batch, payloads))
+        except Exception:
+            db.session.rollback()
+
+        committed = []
+        for entry in batch:
+            try:
+                payload = self._commit([entry])[0]
+                committed.append((entry, payload))
+                self._count(batches=1, committed=1)
+            except Exception as e:
+                db.session.rollback()
+                self._report_failures([entry], str(e))
+        return committed
+
+    def _commit(self, batch):
+        messages = [entry.message for entry in batch]
+        db.session.add_all(messages)
+        db.session.flush()
+        # 提交前序列化，避免提交后访问过期对象再次查询
+        payloads = serialize_messages(messages, senders={entry.sender.id: entry.sender for entry in batch}.values())
+        db.session.commit()
+        return payloads
+
+    def _broadcast(self, committed):
+        from chat import broadcast_new_message
+        for entry, payload in committed:
+            try:
+                broadcast_new_message(payload['room_id'], payload)
+            except Exception as e:
+                print(f"Chat writer broadcast error: {e}")
+
+    def _report_failures(self, batch, error):
+        self._count(failed=len(batch))
+        for entry in batch:
+            ws_manager.send(entry.ws, {
+                "type": "message_sent",
+                "message_id": entry.message.id,
+                "success": False,
+                "status": "failed",
+                "error": error
+            })
+
+    def _count(self, **deltas):
+        with self._cond:
+            for key, value in deltas.items():
+                self._stats[key] += value
+
+
+# Global instance
+message_writer = MessageWriter()
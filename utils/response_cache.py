@@ -0,0 +1,169 @@
+"""
+响应缓存模块
+Widget 接口由系统桌面小组件定时轮询，结果很少变化。widget_cache 按 (endpoint, user_id, 查询参数)
+缓存完整的 200 响应（LRU + 短 TTL），并带上 ETag / Cache-Control，If-None-Match 命中时返回 304。
+
+失效按作用域的版本号进行：缓存项记录生成时所依赖作用域（当前用户，以及接口中通过 track 声明的项目组）
+的版本号，任务/日程/文件/成员关系变化后在提交之后调用 invalidate 递增版本号，旧缓存项随即失效。
+多进程部署时其他进程的缓存最多在 TTL 内保持旧结果。
+"""
+from collections import OrderedDict
+from functools import wraps
+from threading import Lock
+import hashlib
+import time
+from flask import current_app, g, has_request_context, request
+
+SCOPE_USER = 'user'
+SCOPE_PROJECT = 'project'
+
+
+class _CacheEntry:
+    __slots__ = ('expires_at', 'deps', 'body', 'mimetype', 'etag')
+
+    def __init__(self, expires_at, deps, body, mimetype, etag):
+        self.expires_at = expires_at
+        self.deps = deps
+        self.body = body
+        self.mimetype = mimetype
+        self.etag = etag
+
+
+class ResponseCache:
+    """进程内 GET 响应缓存"""
+    def __init__(self, max_size=10000, ttl=30):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        # {(scope, scope_id): version}，未出现的作用域版本号为 0
+        self._versions = {}
+        self._lock = Lock()
+        # {endpoint: {'hits': n, 'misses': n, 'not_modified': n}}
+        self._stats = {}
+
+    def configure(self, max_size=None, ttl=None):
+        """根据应用配置调整容量和过期时间（ttl 或 max_size 为 0 时不缓存）"""
+        with self._lock:
+            if max_size is not None:
+                self.max_size = max_size
+            if ttl is not None:
+                self.ttl = ttl
+            while len(self._entries) > max(self.max_size, 0):
+                self._entries.popitem(last=False)
+
+    @property
+    def enabled(self):
+        return self.ttl > 0 and self.max_size > 0
+
+    def track(self, scope, scope_id):
+        """声明当前请求的响应依赖某个作用域（在读取该作用域数据之前调用）"""
+        if not scope_id or not has_request_context():
+            return
+        deps = g.get('_response_cache_deps')
+        if deps is not None and (scope, scope_id) not in deps:
+            with self._lock:
+                deps[(scope, scope_id)] = self._versions.get((scope, scope_id), 0)
+
+    def invalidate(self, user_ids=(), project_ids=()):
+        """数据变化后（提交之后）使相关用户/项目组的缓存失效"""
+        keys = [(SCOPE_USER, uid) for uid in user_ids if uid] + [(SCOPE_PROJECT, pid) for pid in project_ids if pid]
+        with self._lock:
+            for key in keys:
+                self._versions[key] = self._versions.get(key, 0) + 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._versions.clear()
+            self._stats.clear()
+
+    def cached(self, view):
+        """
+        缓存 token_required 之后的 GET 视图函数的 200 响应（放在 @token_required 下方）
+        """
+        @wraps(view)
+        def decorated(*args, current_user, **kwargs):
+            if not self.enabled or request.method != 'GET':
+                return view(*args, current_user=current_user, **kwargs)
+            endpoint = request.endpoint
+            key = (endpoint, current_user.id, tuple(sorted(request.args.items(multi=True))))
+
+            entry = self._get(key)
+            self._count(endpoint, 'hits' if entry is not None else 'misses')
+            if entry is None:
+                with self._lock:
+                    g._response_cache_deps = {
+                        (SCOPE_USER, current_user.id): self._versions.get((SCOPE_USER, current_user.id), 0)
+                    }
+                response = current_app.make_response(view(*args, current_user=current_user, **kwargs))
+                if response.status_code != 200 or response.direct_passthrough:
+                    return response
+                body = response.get_data()
+                entry = _CacheEntry(
+                    time.monotonic() + self.ttl,
+                    tuple(g.pop('_response_cache_deps').items()),
+                    body,
+                    response.mimetype,
+                    hashlib.sha1(body).hexdigest()
+                )
+                self._put(key, entry)
+            else:
+                response = current_app.response_class(entry.body, mimetype=entry.mimetype)
+
+            response.set_etag(entry.etag)
+            response.cache_control.private = True
+            response.cache_control.max_age = self.ttl
+            response.make_conditional(request)
+            if response.status_code == 304:
+                self._count(endpoint, 'not_modified')
+            return response
+        return decorated
+
+    def stats(self):
+        """各接口的命中统计"""
+        with self._lock:
+            endpoints = {}
+            hits = misses = 0
+            for endpoint, counts in self._stats.items():
+                total = counts['hits'] + counts['misses']
+                endpoints[endpoint] = dict(counts, hit_ratio=round(counts['hits'] / total, 4) if total else 0.0)
+                hits += counts['hits']
+                misses += counts['misses']
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'ttl': self.ttl,
+                'hits': hits,
+                'misses': misses,
+                'hit_ratio': round(hits / (hits + misses), 4) if hits + misses else 0.0,
+                'endpoints': endpoints
+            }
+
+    def _get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry.expires_at <= time.monotonic() or any(
+                self._versions.get(dep, 0) != version for dep, version in entry.deps
+            ):
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def _put(self, key, entry):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def _count(self, endpoint, field):
+        with self._lock:
+            counts = self._stats.setdefault(endpoint, {'hits': 0, 'misses': 0, 'not_modified': 0})
+            counts[field] += 1
+
+
+# Global instance
+widget_cache = ResponseCache()
@@ -1,51 +1,79 @@
 from datetime import datetime
-from models import Task, User
+from models import db, Task, User
 
-def serialize_message(message_obj):
-    """
-    Serialize a GroupMessage object to a dictionary compatible with ChatMessageDto.
-    Ensures consistency between HTTP API and WebSocket payloads.
-    """
-    
-    # Fetch sender info
-    sender = User.query.get(message_obj.sender_id)
-    sender_name = sender.username if sender else 'Unknown'
-    sender_avatar = sender.avatar_url if sender else None
-    
-    # Format updated_time
-    updated_str = None
+
+def _format_updated_time(message_obj):
+    """updated_time 可能为Unix时间戳，序列化为字符串时间"""
     try:
         if getattr(message_obj, 'updated_time', None) is not None:
             if isinstance(message_obj.updated_time, (int, float)):
-                updated_str = datetime.utcfromtimestamp(int(message_obj.updated_time)).strftime('%Y-%m-%d %H:%M:%S')
-            else:
-                updated_str = str(message_obj.updated_time)
+                return datetime.utcfromtimestamp(int(message_obj.updated_time)).strftime('%Y-%m-%d %H:%M:%S')
+            return str(message_obj.updated_time)
     except Exception:
-        updated_str = None
-
-    # Base dictionary
-    message_dict = {
-        'id': message_obj.id,
-        'room_id': message_obj.group_id,
-        'sender_id': message_obj.sender_id,
-        'sender_name': sender_name,
-        'sender_avatar': sender_avatar,
-        'content': message_obj.content,
-        'message_type': (message_obj.message_type or 'text').upper(),
-        'file_url': message_obj.file_url,
-        'task_id': message_obj.task_id,
-        'created_at': message_obj.sent_at,
-        'updated_time': updated_str
-    }
-    
-    # Add reply_to_id
-    if message_obj.reply_to_id:
-        message_dict['reply_to_id'] = message_obj.reply_to_id
-        
-    # Add task info if exists
-    if message_obj.task_id:
-        task = Task.query.filter_by(id=message_obj.task_id, is_deleted=False).first()
-        if task:
-            message_dict['task'] = task.to_dict()
-
-    return message_dict
+        pass
+    return None
+
+
+def serialize_messages(messages, senders=None):
+    """
+    Serialize a list of GroupMessage objects to ChatMessageDto dictionaries.
+
+    Senders and tasks for the whole page are loaded with one IN query each
+    (plus one for task assignees), so the query count does not grow with
+    the page size. Used by both the HTTP API and WebSocket payloads.
+    Already-loaded User objects can be passed in ``senders`` to skip their lookup.
+    """
+    known = {sender.id: sender for sender in (senders or [])}
+    sender_ids = {msg.sender_id for msg in messages if msg.sender_id} - known.keys()
+    senders = known
+    if sender_ids:
+        rows = db.session.query(User.id, User.username, User.avatar_url)\
+            .filter(User.id.in_(sender_ids)).all()
+        senders.update({row.id: row for row in rows})
+
+    task_ids = {msg.task_id for msg in messages if msg.task_id}
+    task_dicts = {}
+    if task_ids:
+        tasks = Task.query.filter(Task.id.in_(task_ids), Task.is_deleted == False).all()
+        task_dicts = {t['id']: t for t in Task.to_dicts(tasks)}
+
+    result = []
+    for message_obj in messages:
+        sender = senders.get(message_obj.sender_id)
+        message_type = message_obj.message_type or 'text'
+        message_dict = {
+            'id': message_obj.id,
+            'room_id': message_obj.group_id,
+            'sender_id': message_obj.sender_id,
+            'sender_name': sender.username if sender else 'Unknown',
+            'sender_avatar': sender.avatar_url if sender else None,
+            'content': message_obj.content,
+            'message_type': message_type.upper(),
+            'file_url': message_obj.file_url,
+            'task_id': message_obj.task_id,
+            'created_at': message_obj.sent_at,
+            'updated_time': _format_updated_time(message_obj)
+        }
+
+        # 为非文本类型提供 caption 字段，便于客户端统一展示附加文字
+        if message_type in ['image', 'video', 'audio', 'file', 'task'] and (message_obj.content or '').strip():
+            message_dict['caption'] = message_obj.content
+
+        # Add reply_to_id
+        if message_obj.reply_to_id:
+            message_dict['reply_to_id'] = message_obj.reply_to_id
+
+        # Add task info if exists
+        if message_obj.task_id and message_obj.task_id in task_dicts:
+            message_dict['task'] = task_dicts[message_obj.task_id]
+
+        result.append(message_dict)
+    return result
+
+
+def serialize_message(message_obj, senders=None):
+    """
+    Serialize a GroupMessage object to a dictionary compatible with ChatMessageDto.
+    Ensures consistency between HTTP API and WebSocket payloads.
+    """
+    return serialize_messages([message_obj], senders=senders)[0]
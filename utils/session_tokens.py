@@ -0,0 +1,71 @@
+"""
+会话Token模块
+签名格式：st1.<base64url(user_id:token_version:expires_at)>.<base64url(HMAC-SHA256)>
+校验只涉及HMAC计算和过期时间比较，不需要访问数据库
+"""
+import base64
+import hashlib
+import hmac
+import time
+
+TOKEN_PREFIX = 'st1'
+
+
+def _b64encode(raw):
+    return base64.urlsafe_b64encode(raw).rstrip(b'=').decode('ascii')
+
+
+def _b64decode(text):
+    return base64.urlsafe_b64decode(text + '=' * (-len(text) % 4))
+
+
+def _signature(secret_key, signing_input):
+    if isinstance(secret_key, str):
+        secret_key = secret_key.encode('utf-8')
+    digest = hmac.new(secret_key, signing_input.encode('ascii'), hashlib.sha256).digest()
+    return _b64encode(digest)
+
+
+def issue_session_token(secret_key, user_id, token_version, ttl):
+    """
+    生成签名token
+
+    Args:
+        secret_key: 签名密钥（SECRET_KEY）
+        user_id: 用户ID
+        token_version: 用户当前的token版本（修改密码时递增以吊销旧token）
+        ttl: 有效期（秒）
+    """
+    expires_at = int(time.time()) + int(ttl)
+    payload = _b64encode(f'{user_id}:{int(token_version)}:{expires_at}'.encode('utf-8'))
+    signing_input = f'{TOKEN_PREFIX}.{payload}'
+    return f'{signing_input}.{_signature(secret_key, signing_input)}'
+
+
+def verify_session_token(secret_key, token):
+    """
+    校验签名token
+
+    Returns:
+        (user_id, token_version)；格式错误、签名不符或已过期时返回 None
+    """
+    parts = token.split('.')
+    if len(parts) != 3 or parts[0] != TOKEN_PREFIX:
+        return None
+    signing_input = f'{parts[0]}.{parts[1]}'
+    if not hmac.compare_digest(_signature(secret_key, signing_input), parts[2]):
+        return None
+    try:
+        user_id, token_version, expires_at = _b64decode(parts[1]).decode('utf-8').split(':')
+        token_version = int(token_version)
+        expires_at = int(expires_at)
+    except (ValueError, UnicodeDecodeError):
+        return None
+    if expires_at <= time.time():
+        return None
+    return user_id, token_version
+
+
+def is_session_token(token):
+    """是否为签名token格式（用于区分旧版的用户ID/用户名token）"""
+    return token.startswith(TOKEN_PREFIX + '.')
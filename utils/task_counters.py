@@ -0,0 +1,270 @@
+"""
+任务计数模块
+task_counters 表按项目组（project_id）和用户（任务创建者 user_id）记录未删除任务的状态计数，
+由创建/更新/删除/移动任务接口在同一事务中增量更新，Dashboard/Widget 读取一行即可得到统计，
+不再随任务数增长。task_daily_counts 表同样增量维护项目组按 end_date 的每日任务数/完成数，
+项目统计的每日分布（燃尽图）只读取所选日期区间内的汇总行。
+
+- 某个作用域第一次有任务变化时，按当前数据计算一次写入计数行；之后每次变化只执行一条 UPDATE
+- 项目组的计数行存在即表示其每日汇总完整：写入项目组计数行时一并重建该项目组的每日汇总
+- 读取时计数行不存在（尚未回填的旧数据）则回退为一次 GROUP BY 查询
+- 过期任务数依赖当天日期，无法增量维护，仍由 Task.overdue_count 索引查询
+- 绕过接口直接修改 tasks 表后执行 `python manage.py reconcile-task-counters` 重新校正
+"""
+from collections import defaultdict
+from datetime import datetime
+from sqlalchemy import update
+from sqlalchemy.exc import IntegrityError
+from models import db, Task, TaskCounter, TaskDailyCount
+
+SCOPE_PROJECT = 'project'
+SCOPE_USER = 'user'
+
+
+def _scope_criterion(scope_type, scope_id):
+    column = Task.project_id if scope_type == SCOPE_PROJECT else Task.user_id
+    return column == scope_id
+
+
+def counter_state(task):
+    """
+    任务当前计入的位置：(user_id, project_id, 状态桶, end_date)，已删除任务返回 None
+    修改任务前后各取一次，交给 apply_task_change 计算增量
+    """
+    if task is None or task.is_deleted:
+        return None
+    return (task.user_id, task.project_id, TaskCounter.bucket(task.status), task.end_date or None)
+
+
+def apply_task_change(before, after):
+    """
+    按任务修改前后的位置调整计数，在调用方的事务中执行，随业务数据一起提交或回滚
+
+    Args:
+        before: 修改前的 counter_state（新建任务时为 None）
+        after: 修改后的 counter_state（删除任务时为 None）
+    """
+    apply_task_changes([(before, after)])
+
+
+def apply_task_changes(changes):
+    """
+    一次调整多个任务的计数（如级联删除子树），同一作用域只执行一条 UPDATE
+    调用前须已把所有任务修改写入会话，计数行不存在时按包含全部修改的数据计算
+
+    Args:
+        changes: (before, after) 二元组的可迭代对象，含义同 apply_task_change
+    """
+    deltas = defaultdict(lambda: defaultdict(int))
+    daily = defaultdict(lambda: [0, 0])
+    for before, after in changes:
+        if before == after:
+            continue
+        for state, sign in ((before, -1), (after, 1)):
+            if state is None:
+                continue
+            user_id, project_id, bucket, day = state
+            deltas[(SCOPE_USER, user_id)][bucket] += sign
+            if project_id:
+                deltas[(SCOPE_PROJECT, project_id)][bucket] += sign
+                if day:
+                    daily[(project_id, day)][0] += sign
+                    daily[(project_id, day)][1] += sign if bucket == 'completed' else 0
+
+    rebuilt = set()
+    for (scope_type, scope_id), bucket_deltas in deltas.items():
+        bucket_deltas = {bucket: delta for bucket, delta in bucket_deltas.items() if delta}
+        if bucket_deltas and not _apply_delta(scope_type, scope_id, bucket_deltas) and scope_type == SCOPE_PROJECT:
+            rebuilt.add(scope_id)
+
+    for (project_id, day), (total, completed) in daily.items():
+        if project_id not in rebuilt and (total or completed):
+            _apply_daily_delta(project_id, day, total, completed)
+
+
+def _apply_delta(scope_type, scope_id, bucket_deltas):
+    """累加计数行；计数行不存在时按当前数据写入并返回 False"""
+    values = {bucket: getattr(TaskCounter, bucket) + delta for bucket, delta in bucket_deltas.items()}
+    values['total'] = TaskCounter.total + sum(bucket_deltas.values())
+    values['updated_at'] = datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
+    statement = update(TaskCounter).where(
+        TaskCounter.scope_type == scope_type,
+        TaskCounter.scope_id == scope_id
+    ).values(**values).execution_options(synchronize_session=False)
+    if db.session.execute(statement).rowcount:
+        return True
+
+    # 计数行不存在：按当前事务中的数据（已包含本次修改）计算并写入
+    counts = Task.status_counts(_scope_criterion(scope_type, scope_id))
+    try:
+        with db.session.begin_nested():
+            db.session.add(TaskCounter(scope_type, scope_id, counts))
+            if scope_type == SCOPE_PROJECT:
+                _rebuild_daily(scope_id)
+    except IntegrityError:
+        # 并发事务刚写入了计数行（不含本次修改），改为在其上累加
+        db.session.execute(statement)
+        return True
+    return False
+
+
+def _apply_daily_delta(project_id, day, total, completed):
+    statement = update(TaskDailyCount).where(
+        TaskDailyCount.project_id == project_id,
+        TaskDailyCount.day == day
+    ).values(
+        total=TaskDailyCount.total + total,
+        completed=TaskDailyCount.completed + completed
+    ).execution_options(synchronize_session=False)
+    if db.session.execute(statement).rowcount:
+        return
+    try:
+        with db.session.begin_nested():
+            db.session.add(TaskDailyCount(project_id, day, total, completed))
+    except IntegrityError:
+        db.session.execute(statement)
+
+
+def _daily_query(project_id):
+    """按 end_date 汇总项目组未删除任务的 (day, total, completed)，走 idx_tasks_project_end 覆盖索引"""
+    return db.session.query(
+        Task.end_date,
+        db.func.count(Task.id),
+        db.func.sum(db.case((Task.status == 'completed', 1), else_=0))
+    ).filter(
+        Task.project_id == project_id,
+        Task.is_deleted == False,
+        Task.end_date.isnot(None),
+        Task.end_date != ''
+    ).group_by(Task.end_date)
+
+
+def _rebuild_daily(project_id):
+    TaskDailyCount.query.filter_by(project_id=project_id).delete(synchronize_session=False)
+    rows = [{'project_id': project_id, 'day': day, 'total': total, 'completed': completed or 0}
+            for day, total, completed in _daily_query(project_id)]
+    if rows:
+        db.session.execute(TaskDailyCount.__table__.insert(), rows)
+
+
+def task_counts(scope_type, scope_id):
+    """
+    读取作用域内未删除任务的状态计数 {status: count}
+
+    计数行存在时为一次主键查询；不存在时回退为 Task.status_counts（不在读请求中写入计数行，
+    避免用只读副本上可能滞后的数据生成计数）
+    """
+    counter = db.session.get(TaskCounter, (scope_type, scope_id))
+    if counter is not None:
+        return counter.counts()
+    return Task.status_counts(_scope_criterion(scope_type, scope_id))
+
+
+def daily_distribution(project_id, date_from=None, date_to=None):
+    """
+    项目组按 end_date 的每日分布 {day: {'total': n, 'completed': n}}，可按 [date_from, date_to] 截取
+
+    项目组计数行存在时读取 task_daily_counts 汇总行，否则对任务表做一次 GROUP BY
+    """
+    if db.session.get(TaskCounter, (SCOPE_PROJECT, project_id)) is not None:
+        day = TaskDailyCount.day
+        query = db.session.query(day, TaskDailyCount.total, TaskDailyCount.completed).filter(
+            TaskDailyCount.project_id == project_id,
+            TaskDailyCount.total > 0
+        )
+    else:
+        day = Task.end_date
+        query = _daily_query(project_id)
+    if date_from:
+        query = query.filter(day >= date_from)
+    if date_to:
+        query = query.filter(day <= date_to)
+    return {d: {'total': total, 'completed': completed or 0} for d, total, completed in query.order_by(day)}
+
+
+def delete_scope(scope_type, scope_id):
+    """删除作用域的计数行（项目组删除时调用，同时删除其每日汇总）"""
+    TaskCounter.query.filter_by(scope_type=scope_type, scope_id=scope_id).delete(synchronize_session=False)
+    if scope_type == SCOPE_PROJECT:
+        TaskDailyCount.query.filter_by(project_id=scope_id).delete(synchronize_session=False)
+
+
+def reconcile_counters(dry_run=False):
+    """
+    按任务表重新计算全部计数并与 task_counters 比较，修正有偏差的行
+
+    Returns:
+        偏差列表 [(scope_type, scope_id, {列名: (记录值, 实际值)})]，计数行缺失时记录值为 None；
+        每日汇总的偏差以 ('day', 'project_id:day', ...) 表示
+    """
+    actual = defaultdict(lambda: defaultdict(int))
+    rows = db.session.query(Task.user_id, Task.project_id, Task.status, db.func.count(Task.id))\
+        .filter(Task.is_deleted == False)\
+        .group_by(Task.user_id, Task.project_id, Task.status).all()
+    for user_id, project_id, status, count in rows:
+        actual[(SCOPE_USER, user_id)][status] += count
+        if project_id:
+            actual[(SCOPE_PROJECT, project_id)][status] += count
+
+    stored = {(c.scope_type, c.scope_id): c for c in TaskCounter.query.all()}
+    columns = TaskCounter.STATUS_BUCKETS + ('other', 'total')
+    drift = []
+    for key in set(actual) | set(stored):
+        expected = TaskCounter(key[0], key[1], actual.get(key, {}))
+        counter = stored.get(key)
+        if counter is None:
+            if not expected.total:
+                continue
+            drift.append((key[0], key[1], {c: (None, getattr(expected, c)) for c in columns}))
+            if not dry_run:
+                db.session.add(expected)
+            continue
+        diff = {c: (getattr(counter, c), getattr(expected, c)) for c in columns if getattr(counter, c) != getattr(expected, c)}
+        if diff:
+            drift.append((key[0], key[1], diff))
+            if not dry_run:
+                counter.set_counts(actual.get(key, {}))
+                counter.updated_at = datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
+
+    drift.extend(_reconcile_daily(dry_run))
+
+    if dry_run:
+        db.session.rollback()
+    else:
+        db.session.commit()
+    return drift
+
+
+def _reconcile_daily(dry_run):
+    actual = {}
+    rows = db.session.query(
+        Task.project_id,
+        Task.end_date,
+        db.func.count(Task.id),
+        db.func.sum(db.case((Task.status == 'completed', 1), else_=0))
+    ).filter(
+        Task.is_deleted == False,
+        Task.project_id.isnot(None),
+        Task.end_date.isnot(None),
+        Task.end_date != ''
+    ).group_by(Task.project_id, Task.end_date).all()
+    for project_id, day, total, completed in rows:
+        actual[(project_id, day)] = (total, completed or 0)
+
+    stored = {(r.project_id, r.day): r for r in TaskDailyCount.query.all()}
+    drift = []
+    for key in set(actual) | set(stored):
+        total, completed = actual.get(key, (0, 0))
+        row = stored.get(key)
+        current = (row.total, row.completed) if row is not None else (0, 0)
+        if current == (total, completed):
+            continue
+        drift.append(('day', f'{key[0]}:{key[1]}', {'total': (current[0], total), 'completed': (current[1], completed)}))
+        if dry_run:
+            continue
+        if row is None:
+            db.session.add(TaskDailyCount(key[0], key[1], total, completed))
+        else:
+            row.total = total
+            row.completed = completed
+    return drift
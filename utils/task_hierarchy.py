@@ -0,0 +1,152 @@
+"""
+任务层级模块
+提供任务祖先/子树查询，供更新/移动任务时的循环引用检查与按子树读取任务树共用
+
+启用 TASK_CLOSURE_ENABLED 后，层级关系由 task_closure 闭包表维护，
+祖先判断和子树查询都是一次索引查询；未启用时使用 WITH RECURSIVE 查询。
+启用前需先执行 `python manage.py backfill-task-closure` 回填已有数据。
+"""
+from flask import current_app
+from sqlalchemy import select, text
+from sqlalchemy.orm import aliased
+from models import db, Task, TaskClosure
+
+
+def closure_enabled():
+    """是否启用闭包表"""
+    return current_app.config.get('TASK_CLOSURE_ENABLED', False)
+
+
+def is_ancestor(ancestor_id, task_id):
+    """
+    判断 ancestor_id 是否位于 task_id 的父任务链上（含 task_id 自身）
+
+    闭包表模式下直接查询 (ancestor_id, descendant_id) 主键；
+    否则使用一条 WITH RECURSIVE 查询沿 parent_task_id 向上遍历，UNION 去重保证异常数据中存在环时查询也能终止。
+    两种方式都沿原始父任务链判断、不区分是否已软删除（与闭包表包含已删除任务一致），
+    都在当前会话的事务中执行。
+    """
+    if closure_enabled():
+        found = db.session.execute(
+            select(TaskClosure.depth).where(
+                TaskClosure.ancestor_id == ancestor_id,
+                TaskClosure.descendant_id == task_id
+            )
+        ).first()
+        return found is not None
+
+    chain = select(Task.id, Task.parent_task_id).where(Task.id == task_id).cte('task_ancestry', recursive=True)
+    parent = aliased(Task)
+    chain = chain.union(
+        select(parent.id, parent.parent_task_id).where(parent.id == chain.c.parent_task_id)
+    )
+    found = db.session.execute(
+        select(chain.c.id).where(chain.c.id == ancestor_id).limit(1)
+    ).first()
+    return found is not None
+
+
+def creates_cycle(task_id, new_parent_id):
+    """将 task_id 的父任务设为 new_parent_id 是否会形成循环引用"""
+    if not new_parent_id:
+        return False
+    return is_ancestor(task_id, new_parent_id)
+
+
+def subtree_query(task_id, include_deleted=False):
+    """
+    任务自身及其全部后代任务ID的查询（可作为 IN 子查询使用）
+
+    闭包表模式下按 ancestor_id 主键前缀一次查出；否则使用 WITH RECURSIVE 向下遍历。
+    两种方式都会经过已删除的中间任务继续查找其后代，include_deleted 只决定结果中是否包含已删除任务。
+    """
+    if closure_enabled():
+        query = select(TaskClosure.descendant_id).where(TaskClosure.ancestor_id == task_id)
+        if not include_deleted:
+            query = query.join(Task, Task.id == TaskClosure.descendant_id).where(Task.is_deleted == False)
+        return query
+
+    tree = select(Task.id).where(Task.id == task_id).cte('task_subtree', recursive=True)
+    child = aliased(Task)
+    tree = tree.union(select(child.id).where(child.parent_task_id == tree.c.id))
+    query = select(tree.c.id)
+    if not include_deleted:
+        query = query.join(Task, Task.id == tree.c.id).where(Task.is_deleted == False)
+    return query
+
+
+def subtree_ids(task_id, include_deleted=False):
+    """获取任务自身及其全部后代任务的ID"""
+    return [row[0] for row in db.session.execute(subtree_query(task_id, include_deleted))]
+
+
+def closure_add_task(task):
+    """新建任务后写入闭包行：自身一行，加上父任务的每个祖先各一行"""
+    if not closure_enabled():
+        return
+    db.session.execute(text(
+        'INSERT INTO task_closure (ancestor_id, descendant_id, depth) '
+        'SELECT ancestor_id, :task_id, depth + 1 FROM task_closure WHERE descendant_id = :parent_id '
+        'UNION ALL SELECT :task_id, :task_id, 0'
+    ), {'task_id': task.id, 'parent_id': task.parent_task_id})
+
+
+def closure_move_task(task_id, new_parent_id):
+    """
+    任务更换父任务后调整闭包行：
+    先断开整棵子树与原祖先的关系，再把子树挂到新父任务的每个祖先下
+    """
+    if not closure_enabled():
+        return
+    params = {'task_id': task_id, 'parent_id': new_parent_id}
+    db.session.execute(text(
+        'DELETE FROM task_closure '
+        'WHERE descendant_id IN (SELECT descendant_id FROM task_closure WHERE ancestor_id = :task_id) '
+        'AND ancestor_id NOT IN (SELECT descendant_id FROM task_closure WHERE ancestor_id = :task_id)'
+    ), params)
+    if new_parent_id:
+        db.session.execute(text(
+            'INSERT INTO task_closure (ancestor_id, descendant_id, depth) '
+            'SELECT super.ancestor_id, sub.descendant_id, super.depth + sub.depth + 1 '
+            'FROM task_closure AS super, task_closure AS sub '
+            'WHERE super.descendant_id = :parent_id AND sub.ancestor_id = :task_id'
+        ), params)
+
+
+def rebuild_closure(batch_size=5000):
+    """
+    根据 parent_task_id 重建整张闭包表（包括已软删除的任务）
+
+    Returns:
+        (写入行数, 处于循环引用中被跳过的任务ID列表)
+    """
+    parents = dict(db.session.query(Task.id, Task.parent_task_id).all())
+    db.session.query(TaskClosure).delete(synchronize_session=False)
+
+    rows_written = 0
+    cyclic = []
+    batch = []
+    for task_id in parents:
+        rows = [{'ancestor_id': task_id, 'descendant_id': task_id, 'depth': 0}]
+        seen = {task_id}
+        current = parents.get(task_id)
+        while current is not None and current in parents:
+            if current in seen:
+                cyclic.append(task_id)
+                rows = None
+                break
+            seen.add(current)
+            rows.append({'ancestor_id': current, 'descendant_id': task_id, 'depth': len(rows)})
+            current = parents.get(current)
+        if not rows:
+            continue
+        batch.extend(rows)
+        if len(batch) >= batch_size:
+            db.session.execute(TaskClosure.__table__.insert(), batch)
+            rows_written += len(batch)
+            batch = []
+    if batch:
+        db.session.execute(TaskClosure.__table__.insert(), batch)
+        rows_written += len(batch)
+    db.session.commit()
+    return rows_written, cyclic
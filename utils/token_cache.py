@@ -0,0 +1,146 @@
+"""
+Token缓存模块
+缓存 token -> 用户ID 的解析结果，以及签名token校验所需的用户状态（token版本、是否启用）（LRU + TTL），
+减少认证时的用户查询
+"""
+from collections import OrderedDict
+from threading import Lock
+import time
+
+
+class TokenCache:
+    """
+    进程内 token 解析缓存
+
+    旧版token只缓存用户ID而不缓存ORM对象；命中后仍按主键加载用户，
+    由调用方校验 token 与用户当前的 id/用户名/邮箱 是否仍然匹配。
+    签名token按用户ID缓存 (token_version, is_active)，版本一致时无需查询数据库。
+    """
+    def __init__(self, max_size=10000, ttl=300):
+        self.max_size = max_size
+        self.ttl = ttl
+        # {token: (user_id, expires_at)}，按最近使用排序
+        self._entries = OrderedDict()
+        # {user_id: {token, ...}}，用于按用户失效
+        self._user_tokens = {}
+        # {user_id: (token_version, is_active, expires_at)}，按最近使用排序
+        self._user_states = OrderedDict()
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def configure(self, max_size=None, ttl=None):
+        """根据应用配置调整容量和过期时间"""
+        with self._lock:
+            if max_size is not None:
+                self.max_size = max_size
+            if ttl is not None:
+                self.ttl = ttl
+            while len(self._entries) > self.max_size:
+                self._evict_oldest()
+            while len(self._user_states) > self.max_size:
+                self._user_states.popitem(last=False)
+
+    def get(self, token):
+        """获取 token 对应的用户ID，未命中或已过期返回 None"""
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None:
+                self.misses += 1
+                return None
+            user_id, expires_at = entry
+            if expires_at <= time.monotonic():
+                self._remove(token)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(token)
+            self.hits += 1
+            return user_id
+
+    def set(self, token, user_id):
+        """写入 token 解析结果"""
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            if token in self._entries:
+                self._remove(token)
+            self._entries[token] = (user_id, time.monotonic() + self.ttl)
+            self._user_tokens.setdefault(user_id, set()).add(token)
+            while len(self._entries) > self.max_size:
+                self._evict_oldest()
+
+    def get_user_state(self, user_id):
+        """获取用户的 (token_version, is_active)，未命中或已过期返回 None"""
+        with self._lock:
+            entry = self._user_states.get(user_id)
+            if entry is None or entry[2] <= time.monotonic():
+                self._user_states.pop(user_id, None)
+                self.misses += 1
+                return None
+            self._user_states.move_to_end(user_id)
+            self.hits += 1
+            return entry[0], entry[1]
+
+    def set_user_state(self, user_id, token_version, is_active):
+        """写入从数据库读取的用户状态"""
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._user_states[user_id] = (token_version, is_active, time.monotonic() + self.ttl)
+            self._user_states.move_to_end(user_id)
+            while len(self._user_states) > self.max_size:
+                self._user_states.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate_token(self, token):
+        """移除单个 token"""
+        with self._lock:
+            self._remove(token)
+
+    def invalidate_user(self, user_id):
+        """移除某个用户的全部 token 及用户状态（用户名/邮箱/密码/状态变更时调用）"""
+        with self._lock:
+            for token in self._user_tokens.pop(user_id, set()):
+                self._entries.pop(token, None)
+            self._user_states.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._user_tokens.clear()
+            self._user_states.clear()
+
+    def stats(self):
+        """命中统计"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'user_states': len(self._user_states),
+                'max_size': self.max_size,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_ratio': round(self.hits / total, 4) if total else 0.0
+            }
+
+    def _remove(self, token):
+        entry = self._entries.pop(token, None)
+        if entry is None:
+            return
+        tokens = self._user_tokens.get(entry[0])
+        if tokens is not None:
+            tokens.discard(token)
+            if not tokens:
+                del self._user_tokens[entry[0]]
+
+    def _evict_oldest(self):
+        token = next(iter(self._entries))
+        self._remove(token)
+        self.evictions += 1
+
+
+# Global instance
+token_cache = TokenCache()
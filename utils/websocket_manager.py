@@ -1,109 +1,339 @@
-import json
-from threading import Lock
+from collections import deque
+from threading import Condition, Lock, Thread
 from typing import Dict, Set, Optional
+from utils.message_frame import MessageFrame
+from utils.ws_backplane import InProcessBackplane, KIND_ROOM, KIND_USER
+
+OVERFLOW_DROP_OLDEST = 'drop_oldest'
+OVERFLOW_DISCONNECT = 'disconnect'
+
+
+class ConnectionOutbox:
+    """
+    Bounded outbound queue for one connection, drained by its own writer thread
+    (a greenlet under the gevent worker). A slow client only backs up its own queue.
+    """
+    def __init__(self, ws, max_size: int, overflow_policy: str, metrics: dict, metrics_lock: Lock):
+        self.ws = ws
+        self.max_size = max_size
+        self.overflow_policy = overflow_policy
+        self.frames = deque()
+        self.closed = False
+        self._close_socket = False
+        self._cond = Condition(Lock())
+        self._metrics = metrics
+        self._metrics_lock = metrics_lock
+        self._writer = Thread(target=self._run, name='ws-writer', daemon=True)
+        self._writer.start()
+
+    def put(self, frame: str) -> bool:
+        """Queue a frame; returns False if the connection is closed or was dropped as a slow consumer"""
+        dropped = 0
+        with self._cond:
+            if self.closed:
+                return False
+            if len(self.frames) >= self.max_size:
+                if self.overflow_policy == OVERFLOW_DISCONNECT:
+                    self.frames.clear()
+                    self.closed = True
+                    self._close_socket = True
+                    self._cond.notify()
+                    self._count('slow_consumers_disconnected')
+                    return False
+                while len(self.frames) >= self.max_size:
+                    self.frames.popleft()
+                    dropped += 1
+            self.frames.append(frame)
+            self._cond.notify()
+        if dropped:
+            self._count('frames_dropped', dropped)
+        return True
+
+    def close(self):
+        """Stop the writer; frames still queued are discarded"""
+        with self._cond:
+            self.closed = True
+            self.frames.clear()
+            self._cond.notify()
+
+    def depth(self) -> int:
+        return len(self.frames)
+
+    def _count(self, key: str, n: int = 1):
+        with self._metrics_lock:
+            self._metrics[key] += n
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self.frames and not self.closed:
+                    self._cond.wait()
+                if self.closed:
+                    close_socket = self._close_socket
+                    break
+                frame = self.frames.popleft()
+            try:
+                self.ws.send(frame)
+                self._count('frames_sent')
+            except Exception as e:
+                print(f"Error sending to WS: {e}")
+                # The connection's receive loop sees the failure and disconnects
+                with self._cond:
+                    self.closed = True
+                    self.frames.clear()
+                return
+        if close_socket:
+            # Closing makes the receive loop exit, which unregisters the connection
+            try:
+                self.ws.close()
+            except Exception:
+                pass
+
 
 class ConnectionManager:
     """
     WebSocket Connection Manager
     Manages active WebSocket connections and room subscriptions.
+
+    Room subscriptions are split across lock stripes keyed by room id, so
+    subscribe/unsubscribe/broadcast on unrelated rooms never contend. The
+    connection lock guards connection bookkeeping only, including the
+    ws -> rooms reverse map that lets disconnect touch just the rooms the
+    socket joined. The two kinds of lock are never held at the same time.
+    A room broadcast takes only its stripe lock: outboxes are looked up
+    without the connection lock (see _enqueue).
     """
-    def __init__(self):
+    def __init__(self, stripes: int = 64, queue_size: int = 256,
+                 overflow_policy: str = OVERFLOW_DROP_OLDEST):
         # Stores all active connections: {ws_obj: user_id}
         self.active_connections: Dict[object, str] = {}
-        
-        # Stores room subscriptions: {room_id: {ws_obj1, ws_obj2, ...}}
-        self.room_subscriptions: Dict[str, Set[object]] = {}
-        
+
         # Stores user connections: {user_id: {ws_obj1, ws_obj2, ...}}
         self.user_connections: Dict[str, Set[object]] = {}
-        
-        # Lock for thread safety
+
+        # Reverse map of room subscriptions: {ws_obj: {room_id, ...}}
+        self.connection_rooms: Dict[object, Set[str]] = {}
+
+        # Outbound queue per connection: {ws_obj: ConnectionOutbox}
+        self.outboxes: Dict[object, ConnectionOutbox] = {}
+        self.queue_size = queue_size
+        self.overflow_policy = overflow_policy
+        self._metrics = {'frames_sent': 0, 'frames_dropped': 0, 'slow_consumers_disconnected': 0,
+                         'frames_published': 0, 'frames_received': 0}
+        self._metrics_lock = Lock()
+
+        # Lock for connection bookkeeping
         self.lock = Lock()
 
+        # Room subscriptions striped by room id: stripe i holds {room_id: {ws_obj, ...}}
+        self._room_locks = [Lock() for _ in range(stripes)]
+        self._room_stripes: list = [{} for _ in range(stripes)]
+
+        # Fans broadcasts out to other worker processes
+        self.backplane = InProcessBackplane()
+
+    def configure(self, queue_size: Optional[int] = None, overflow_policy: Optional[str] = None,
+                  backplane=None):
+        """Apply app config; queue settings affect connections opened afterwards"""
+        if queue_size is not None:
+            self.queue_size = max(1, int(queue_size))
+        if overflow_policy is not None:
+            if overflow_policy not in (OVERFLOW_DROP_OLDEST, OVERFLOW_DISCONNECT):
+                raise ValueError(f"Unknown WebSocket overflow policy: {overflow_policy}")
+            self.overflow_policy = overflow_policy
+        if backplane is not None and backplane is not self.backplane:
+            self.backplane.close()
+            self.backplane = backplane
+            backplane.start(self._deliver_remote)
+
+    def _stripe(self, room_id: str):
+        index = hash(room_id) % len(self._room_locks)
+        return self._room_locks[index], self._room_stripes[index]
+
+    @property
+    def room_subscriptions(self) -> Dict[str, Set[object]]:
+        """Snapshot of all room subscriptions: {room_id: {ws_obj, ...}}"""
+        snapshot = {}
+        for lock, rooms in zip(self._room_locks, self._room_stripes):
+            with lock:
+                snapshot.update({room_id: set(conns) for room_id, conns in rooms.items()})
+        return snapshot
+
     def connect(self, ws, user_id: str):
         """Register a new connection"""
+        # Make this process reachable by broadcasts published from other workers
+        try:
+            self.backplane.bind()
+        except Exception as e:
+            print(f"WS backplane bind error: {e}")
+        outbox = ConnectionOutbox(ws, self.queue_size, self.overflow_policy,
+                                  self._metrics, self._metrics_lock)
         with self.lock:
+            previous = self.outboxes.pop(ws, None)
+            self.outboxes[ws] = outbox
             self.active_connections[ws] = user_id
-            
+            self.connection_rooms.setdefault(ws, set())
+
             if user_id not in self.user_connections:
                 self.user_connections[user_id] = set()
             self.user_connections[user_id].add(ws)
-            print(f"WS Connected: User {user_id}")
+        if previous is not None:
+            previous.close()
+        print(f"WS Connected: User {user_id}")
 
     def disconnect(self, ws):
         """Unregister a connection"""
         with self.lock:
             user_id = self.active_connections.pop(ws, None)
-            
+            room_ids = self.connection_rooms.pop(ws, set())
+            outbox = self.outboxes.pop(ws, None)
+
             # Remove from user connections
             if user_id and user_id in self.user_connections:
                 self.user_connections[user_id].discard(ws)
                 if not self.user_connections[user_id]:
                     del self.user_connections[user_id]
-            
-            # Remove from all rooms
-            for room_id in list(self.room_subscriptions.keys()):
-                if ws in self.room_subscriptions[room_id]:
-                    self.room_subscriptions[room_id].discard(ws)
-                    if not self.room_subscriptions[room_id]:
-                        del self.room_subscriptions[room_id]
-            
-            print(f"WS Disconnected: User {user_id}")
-
-    def subscribe(self, ws, room_id: str):
+
+        if outbox is not None:
+            outbox.close()
+
+        # Remove from the rooms this connection joined
+        for room_id in room_ids:
+            self._remove_from_room(ws, room_id)
+
+        print(f"WS Disconnected: User {user_id}")
+
+    def subscribe(self, ws, room_id: str) -> bool:
         """Subscribe a connection to a room"""
         with self.lock:
-            if room_id not in self.room_subscriptions:
-                self.room_subscriptions[room_id] = set()
-            self.room_subscriptions[room_id].add(ws)
-            print(f"WS Subscribed: Room {room_id}")
+            if ws not in self.active_connections:
+                return False
+            self.connection_rooms[ws].add(room_id)
+
+        lock, rooms = self._stripe(room_id)
+        with lock:
+            rooms.setdefault(room_id, set()).add(ws)
+
+        # The connection may have been closed between the two steps; disconnect
+        # only cleans up rooms it saw in the reverse map, so undo our own insert.
+        with self.lock:
+            still_connected = ws in self.active_connections
+        if not still_connected:
+            self._remove_from_room(ws, room_id)
+            return False
+
+        print(f"WS Subscribed: Room {room_id}")
+        return True
 
     def unsubscribe(self, ws, room_id: str):
         """Unsubscribe a connection from a room"""
         with self.lock:
-            if room_id in self.room_subscriptions:
-                self.room_subscriptions[room_id].discard(ws)
-                if not self.room_subscriptions[room_id]:
-                    del self.room_subscriptions[room_id]
-            print(f"WS Unsubscribed: Room {room_id}")
-
-    def broadcast_to_room(self, room_id: str, message: dict, exclude_ws=None):
-        """Broadcast a message to all connections in a room"""
-        # We copy the set to avoid modification during iteration
-        # Note: Sending over WS might be blocking depending on implementation, 
-        # but simple-websocket usually handles this well.
-        # For high concurrency, we might want to put this in a queue.
-        connections = set()
-        with self.lock:
-            if room_id in self.room_subscriptions:
-                connections = self.room_subscriptions[room_id].copy()
-        
-        json_msg = json.dumps(message)
-        
-        for ws in connections:
-            if ws == exclude_ws:
-                continue
-            try:
-                ws.send(json_msg)
-            except Exception as e:
-                print(f"Error broadcasting to WS: {e}")
-                # Ideally we should disconnect dead sockets here, 
-                # but the main loop handles that.
-                pass
+            room_ids = self.connection_rooms.get(ws)
+            if room_ids is not None:
+                room_ids.discard(room_id)
+        self._remove_from_room(ws, room_id)
+        print(f"WS Unsubscribed: Room {room_id}")
+
+    def _remove_from_room(self, ws, room_id: str):
+        lock, rooms = self._stripe(room_id)
+        with lock:
+            conns = rooms.get(room_id)
+            if conns is not None:
+                conns.discard(ws)
+                if not conns:
+                    del rooms[room_id]
+
+    def room_connections(self, room_id: str) -> Set[object]:
+        """Copy of the connections subscribed to a room"""
+        lock, rooms = self._stripe(room_id)
+        with lock:
+            return set(rooms.get(room_id, ()))
+
+    def send(self, ws, message) -> bool:
+        """
+        Send a message to one connection through its outbound queue.
+        All frames for a registered connection go through the queue so they are
+        written by a single writer in order; unregistered sockets are sent to directly.
+        """
+        return self._enqueue([ws], MessageFrame.of(message).text) > 0
 
-    def send_personal_message(self, user_id: str, message: dict):
+    def broadcast_to_room(self, room_id: str, message, exclude_ws=None):
+        """
+        Broadcast a message to all connections in a room without blocking on slow clients.
+        message may be a dict or a MessageFrame; it is encoded once for every
+        subscriber and the backplane.
+        """
+        frame = MessageFrame.of(message).text
+        self._publish(KIND_ROOM, room_id, frame)
+        connections = self.room_connections(room_id)
+        connections.discard(exclude_ws)
+        return self._enqueue(connections, frame)
+
+    def send_personal_message(self, user_id: str, message):
         """Send a message to a specific user"""
-        connections = set()
+        frame = MessageFrame.of(message).text
+        self._publish(KIND_USER, user_id, frame)
+        return self._enqueue(self._user_connections(user_id), frame)
+
+    def _user_connections(self, user_id: str) -> Set[object]:
         with self.lock:
-            if user_id in self.user_connections:
-                connections = self.user_connections[user_id].copy()
-        
-        json_msg = json.dumps(message)
+            return set(self.user_connections.get(user_id, ()))
+
+    def _publish(self, kind: str, target: str, frame: str):
+        """Hand the frame to the backplane for the other worker processes"""
+        try:
+            self.backplane.publish(kind, target, frame)
+        except Exception as e:
+            print(f"WS backplane publish error: {e}")
+            return
+        if not isinstance(self.backplane, InProcessBackplane):
+            with self._metrics_lock:
+                self._metrics['frames_published'] += 1
+
+    def _deliver_remote(self, kind: str, target: str, frame: str):
+        """Deliver a frame published by another process to local connections"""
+        with self._metrics_lock:
+            self._metrics['frames_received'] += 1
+        if kind == KIND_ROOM:
+            self._enqueue(self.room_connections(target), frame)
+        elif kind == KIND_USER:
+            self._enqueue(self._user_connections(target), frame)
+
+    def _enqueue(self, connections, frame: str) -> int:
+        # Read without the connection lock: dict.get is atomic and connect/disconnect
+        # only add or pop whole entries, so a concurrent change can at worst make
+        # us see the socket as just connected or just disconnected.
+        outboxes = self.outboxes
+        queued = 0
         for ws in connections:
-            try:
-                ws.send(json_msg)
-            except Exception as e:
-                print(f"Error sending personal message: {e}")
+            outbox = outboxes.get(ws)
+            if outbox is None:
+                try:
+                    ws.send(frame)
+                    queued += 1
+                except Exception as e:
+                    print(f"Error sending to WS: {e}")
+            elif outbox.put(frame):
+                queued += 1
+        return queued
+
+    def stats(self) -> dict:
+        """Queue depth and delivery metrics"""
+        with self.lock:
+            depths = [outbox.depth() for outbox in self.outboxes.values()]
+        with self._metrics_lock:
+            metrics = dict(self._metrics)
+        for key, value in self.backplane.stats().items():
+            metrics[f'backplane_{key}'] = value
+        metrics.update({
+            'connections': len(depths),
+            'queued_frames': sum(depths),
+            'max_queue_depth': max(depths, default=0),
+            'queue_size': self.queue_size,
+            'overflow_policy': self.overflow_policy,
+            'backplane': self.backplane.name
+        })
+        return metrics
 
 # Global instance
 ws_manager = ConnectionManager()
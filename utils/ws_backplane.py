@@ -0,0 +1,161 @@
+"""
+WebSocket broadcast backplane
+Fans room/user broadcasts out to the other worker processes on the same host,
+so subscribers connected to any gunicorn worker receive them.
+
+- InProcessBackplane: single process (default); publish is a no-op
+- UnixSocketBackplane: each process binds a Unix datagram socket in a shared
+  directory; publish sends the frame to every other socket in that directory
+  without blocking. Needs no outside service. A Redis or similar adapter only
+  has to implement start()/bind()/publish()/stats()/close().
+"""
+import glob
+import os
+import socket
+import uuid
+from threading import Lock, Thread
+
+KIND_ROOM = 'room'
+KIND_USER = 'user'
+
+# Unix datagrams are bounded by the kernel socket buffer (usually ~200KB)
+MAX_DATAGRAM_SIZE = 200 * 1024
+
+
+class InProcessBackplane:
+    """Single-process backplane: local delivery is all there is"""
+    name = 'inprocess'
+
+    def start(self, handler):
+        pass
+
+    def bind(self):
+        pass
+
+    def publish(self, kind, target, frame):
+        pass
+
+    def stats(self):
+        return {}
+
+    def close(self):
+        pass
+
+
+class UnixSocketBackplane:
+    """
+    Local multi-process backplane over Unix datagram sockets
+
+    Messages are encoded as b'<kind>\\0<target>\\0<frame>'. The socket is bound
+    lazily, when the process accepts its first connection or publishes, so each
+    gunicorn worker binds its own after the fork; socket files of dead processes
+    are removed when a send is refused.
+
+    Sends never block the publishing request: a frame is dropped for a peer whose
+    receive buffer is full (the peer is stuck or not reading) and counted in stats().
+    """
+    name = 'unix'
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._handler = None
+        self._sock = None
+        self._path = None
+        self._pid = None
+        self._lock = Lock()
+        self._stats_lock = Lock()
+        self._frames_dropped = 0
+        self._peers_removed = 0
+
+    def start(self, handler):
+        self._handler = handler
+
+    def bind(self):
+        """Bind this process's socket (once per process)"""
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            os.makedirs(self.directory, exist_ok=True)
+            path = os.path.join(self.directory, f'{os.getpid()}-{uuid.uuid4().hex[:8]}.sock')
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+            sock.bind(path)
+            self._sock, self._path, self._pid = sock, path, os.getpid()
+            Thread(target=self._listen, args=(sock,), name='ws-backplane', daemon=True).start()
+
+    def publish(self, kind, target, frame):
+        self.bind()
+        data = b'\0'.join((kind.encode(), str(target).encode('utf-8'), frame.encode('utf-8')))
+        peers = [path for path in glob.glob(os.path.join(self.directory, '*.sock')) if path != self._path]
+        if len(data) > MAX_DATAGRAM_SIZE:
+            print(f"WS backplane: frame too large to fan out ({len(data)} bytes)")
+            self._count(dropped=len(peers))
+            return
+        dropped = removed = 0
+        sender = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        sender.setblocking(False)
+        try:
+            for path in peers:
+                try:
+                    sender.sendto(data, path)
+                except BlockingIOError:
+                    # The peer's receive buffer is full
+                    dropped += 1
+                except (ConnectionRefusedError, FileNotFoundError) as e:
+                    # The owning process is gone
+                    dropped += isinstance(e, ConnectionRefusedError)
+                    try:
+                        os.unlink(path)
+                        removed += 1
+                    except OSError:
+                        pass
+                except OSError as e:
+                    dropped += 1
+                    print(f"WS backplane send error: {e}")
+        finally:
+            sender.close()
+        if dropped or removed:
+            self._count(dropped, removed)
+
+    def _count(self, dropped=0, removed=0):
+        with self._stats_lock:
+            self._frames_dropped += dropped
+            self._peers_removed += removed
+
+    def stats(self):
+        """Frames not delivered to a peer (full buffer, refused, oversized) and dead peers removed"""
+        with self._stats_lock:
+            return {'frames_dropped': self._frames_dropped, 'peers_removed': self._peers_removed}
+
+    def _listen(self, sock):
+        while True:
+            try:
+                data = sock.recv(MAX_DATAGRAM_SIZE + 1024)
+            except OSError:
+                return
+            try:
+                kind, target, frame = data.split(b'\0', 2)
+                self._handler(kind.decode(), target.decode('utf-8'), frame.decode('utf-8'))
+            except Exception as e:
+                print(f"WS backplane receive error: {e}")
+
+    def close(self):
+        with self._lock:
+            if self._sock is not None and self._pid == os.getpid():
+                self._sock.close()
+                try:
+                    os.unlink(self._path)
+                except OSError:
+                    pass
+            self._sock = self._path = self._pid = None
+
+
+def create_backplane(config):
+    """根据应用配置创建backplane（WS_BACKPLANE: inprocess / unix）"""
+    name = (config.get('WS_BACKPLANE') or 'inprocess').lower()
+    if name == InProcessBackplane.name:
+        return InProcessBackplane()
+    if name == UnixSocketBackplane.name:
+        return UnixSocketBackplane(config.get('WS_BACKPLANE_DIR'))
+    raise ValueError(f"Unknown WebSocket backplane: {name}")
@@ -1,21 +1,25 @@
 from flask import Blueprint, request, jsonify
 from models import db, User, Task, CalendarEvent, ProjectGroup, SharedFile
 from auth import token_required
+from utils.membership import is_project_member
+from utils.task_counters import task_counts, SCOPE_PROJECT, SCOPE_USER
+from utils.response_cache import widget_cache
 from datetime import datetime, date
 
 widget_bp = Blueprint('widget', __name__, url_prefix='/widget')
 
 @widget_bp.route('/today-tasks', methods=['GET'])
 @token_required
+@widget_cache.cached
 def get_today_tasks(current_user):
     """获取今日任务接口（用于Widget）"""
     try:
         today = datetime.utcnow().strftime('%Y-%m-%d')
         
-        # 获取今日到期的任务
+        # 获取今日到期的任务（end_date 为今天，due_date 已废弃）
         today_tasks = Task.query.filter(
             Task.user_id == current_user.id,
-            Task.due_date == today,
+            Task.end_date == today,
             Task.is_deleted == False,
             Task.status != 'completed',
             Task.status != 'cancelled'
@@ -27,10 +31,7 @@ def get_today_tasks(current_user):
         # 获取今日需要开始的任务（如果有start_date字段，这里简化处理）
         # 可以扩展Task模型添加start_date字段
         
-        tasks_data = []
-        for task in today_tasks:
-            task_dict = task.to_dict()
-            tasks_data.append(task_dict)
+        tasks_data = Task.to_dicts(today_tasks)
         
         return jsonify({
             'success': True,
@@ -48,6 +49,7 @@ def get_today_tasks(current_user):
 
 @widget_bp.route('/today-events', methods=['GET'])
 @token_required
+@widget_cache.cached
 def get_today_events(current_user):
     """获取今日日历事件接口（用于Widget）"""
     try:
@@ -84,33 +86,19 @@ def get_today_events(current_user):
 
 @widget_bp.route('/task-stats', methods=['GET'])
 @token_required
+@widget_cache.cached
 def get_task_stats(current_user):
     """获取任务统计数据接口（用于Widget）"""
     try:
-        # 获取当前用户的所有任务（不包括已删除的）
-        all_tasks = Task.query.filter(
-            Task.user_id == current_user.id,
-            Task.is_deleted == False
-        ).all()
+        # 按状态统计（读取 task_counters 计数行，不扫描任务）
+        counts = task_counts(SCOPE_USER, current_user.id)
+        total_tasks = sum(counts.values())
+        todo_tasks = counts.get('pending', 0)
+        in_progress_tasks = counts.get('in_progress', 0)
+        completed_tasks = counts.get('completed', 0)
         
-        # 统计各状态任务数
-        total_tasks = len(all_tasks)
-        todo_tasks = sum(1 for task in all_tasks if task.status == 'pending')
-        in_progress_tasks = sum(1 for task in all_tasks if task.status == 'in_progress')
-        completed_tasks = sum(1 for task in all_tasks if task.status == 'completed')
-        
-        # 统计过期任务（due_date < 当前日期 且 status != completed 且 status != cancelled）
-        today = datetime.utcnow().date()
-        overdue_tasks = 0
-        for task in all_tasks:
-            if task.due_date and task.status not in ['completed', 'cancelled']:
-                try:
-                    due_date_obj = datetime.strptime(task.due_date, '%Y-%m-%d').date()
-                    if due_date_obj < today:
-                        overdue_tasks += 1
-                except (ValueError, TypeError):
-                    # 如果日期格式不正确，跳过
-                    pass
+        # 统计过期任务（end_date < 当前日期 且 status != completed 且 status != cancelled），走 idx_tasks_user_end 覆盖索引
+        overdue_tasks = Task.overdue_count(Task.user_id == current_user.id)
         
         return jsonify({
             'success': True,
@@ -132,6 +120,7 @@ def get_task_stats(current_user):
 
 @widget_bp.route('/project-progress', methods=['GET'])
 @token_required
+@widget_cache.cached
 def get_project_progress(current_user):
     """获取项目进度数据接口（用于Widget）"""
     try:
@@ -148,7 +137,7 @@ def get_project_progress(current_user):
                 }), 200
             
             # 检查用户是否有权限访问该项目
-            if current_user not in project.members and project.leader_id != current_user.id:
+            if project.leader_id != current_user.id and not is_project_member(current_user.id, project.id):
                 return jsonify({
                     'success': False,
                     'message': '无权限访问该项目'
@@ -164,17 +153,13 @@ def get_project_progress(current_user):
                 }), 200
             project = user_projects[0]
         
-        # 获取项目的所有任务（不包括已删除的）
-        project_tasks = Task.query.filter(
-            Task.project_id == project.id,
-            Task.is_deleted == False
-        ).all()
-        
-        # 统计各状态任务数
-        total_tasks = len(project_tasks)
-        todo_tasks = sum(1 for task in project_tasks if task.status == 'pending')
-        in_progress_tasks = sum(1 for task in project_tasks if task.status == 'in_progress')
-        completed_tasks = sum(1 for task in project_tasks if task.status == 'completed')
+        # 按状态统计（读取 task_counters 计数行，不扫描任务）
+        widget_cache.track(SCOPE_PROJECT, project.id)
+        counts = task_counts(SCOPE_PROJECT, project.id)
+        total_tasks = sum(counts.values())
+        todo_tasks = counts.get('pending', 0)
+        in_progress_tasks = counts.get('in_progress', 0)
+        completed_tasks = counts.get('completed', 0)
         
         # 计算进度百分比
         if total_tasks > 0:
@@ -204,17 +189,16 @@ def get_project_progress(current_user):
 
 @widget_bp.route('/user-stats', methods=['GET'])
 @token_required
+@widget_cache.cached
 def get_user_stats(current_user):
     """获取用户综合统计数据接口（用于Widget）"""
     try:
-        # 统计已完成的任务数
-        tasks_completed = Task.query.filter(
-            Task.user_id == current_user.id,
-            Task.status == 'completed',
-            Task.is_deleted == False
-        ).count()
+        # 统计已完成的任务数（读取 task_counters 计数行）
+        tasks_completed = task_counts(SCOPE_USER, current_user.id).get('completed', 0)
         
-        # 统计用户加入的项目数
+        # 统计用户加入的项目数（项目组停用/删除时缓存随之失效）
+        for p in current_user.project_groups:
+            widget_cache.track(SCOPE_PROJECT, p.id)
         projects_joined = len([p for p in current_user.project_groups if p.is_active])
         
         # 统计用户上传的文件总数